@@ -0,0 +1,224 @@
+"""
+Batch message handlers and micro-batching.
+
+A batch handler takes a list of messages and returns the list of their
+replies, in the same order, so work with a fixed cost per call (a bulk
+store lookup, a vectorized transform) is paid once per batch instead of
+once per message. A scalar handler, one message in and one reply out,
+is adapted with scalar_batch().
+
+The server collects the messages of every connection that became
+readable in one wakeup into one batch. With a max delay, it keeps adding
+messages that arrive within that time, up to a max batch size:
+
+- epoll: the event loop holds batched replies until the batch is full or
+  its oldest message has waited max_delay, then calls the handler once
+- asyncio: AsyncMicroBatcher collects the messages submitted by
+  connection tasks and flushes on a timer
+- threaded: MicroBatcher groups the messages submitted by connection
+  threads; one thread calls the handler for the whole group while the
+  others wait, and the next group gathers meanwhile
+"""
+import asyncio
+import threading
+from typing import Callable, List, Optional, Union
+
+BatchHandler = Callable[[List[str]], List[str]]
+
+BATCH_HANDLERS = ('scalar', 'upper')
+
+DEFAULT_BATCH_SIZE = 256
+
+# Joins messages for bulk_upper(); upper() maps no other character to it
+_SEPARATOR = '\x00'
+
+
+def scalar_batch(handler: Callable[[str], str]) -> BatchHandler:
+    """Return a batch handler that calls a scalar handler on each message."""
+    def handle(messages: List[str]) -> List[str]:
+        return [handler(message) for message in messages]
+    return handle
+
+
+def bulk_upper(messages: List[str]) -> List[str]:
+    """
+    Uppercase a batch of messages with one str.upper() call.
+
+    Same replies as the server's default transform, including the error
+    for empty messages.
+    """
+    if not messages:
+        return []
+    joined = _SEPARATOR.join(messages)
+    if joined.count(_SEPARATOR) != len(messages) - 1:
+        # A message contains the separator itself
+        return [message.upper() if message else "ERROR: Empty message" for message in messages]
+    replies = joined.upper().split(_SEPARATOR)
+    if '' in replies:
+        return [reply or "ERROR: Empty message" for reply in replies]
+    return replies
+
+
+def get_batch_handler(handler: Union[str, BatchHandler], scalar: Callable[[str], str]) -> BatchHandler:
+    """
+    Return the batch handler with the given name; callables are passed through.
+
+    Args:
+        handler: 'scalar', 'upper' or a batch handler
+        scalar: Scalar handler adapted by 'scalar'
+    """
+    if callable(handler):
+        return handler
+    if handler == 'scalar':
+        return scalar_batch(scalar)
+    if handler == 'upper':
+        return bulk_upper
+    raise ValueError(f"Unknown batch handler '{handler}', expected one of {BATCH_HANDLERS}")
+
+
+def run_batch(handler: BatchHandler, messages: List[str]) -> List[str]:
+    """Call a batch handler and check it answered every message."""
+    replies = handler(messages)
+    if len(replies) != len(messages):
+        raise ValueError(f"Batch handler returned {len(replies)} replies for {len(messages)} messages")
+    return replies
+
+
+class _Batch:
+    """Messages of one group, and its replies once the handler has run."""
+
+    __slots__ = ('messages', 'full', 'done', 'replies', 'error')
+
+    def __init__(self):
+        self.messages: List[str] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.replies: Optional[List[str]] = None
+        self.error: Optional[BaseException] = None
+
+
+class MicroBatcher:
+    """Groups messages submitted by many threads into batches for one handler call."""
+
+    def __init__(self, handler: BatchHandler, max_size: int = DEFAULT_BATCH_SIZE, max_delay: float = 0.0):
+        """
+        Initialize the batcher.
+
+        Args:
+            handler: Batch handler
+            max_size: Messages at which a batch is closed at once
+            max_delay: Seconds the first message of a batch waits for
+                others; 0 still groups what arrives while the previous
+                batch is being handled
+        """
+        if max_size < 1 or max_delay < 0:
+            raise ValueError("max_size must be at least 1 and max_delay non-negative")
+        self.handler = handler
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        # Held while a batch is handled, so one batch runs at a time
+        self._running = threading.Lock()
+        self._batch: Optional[_Batch] = None
+
+    def submit(self, messages: List[str]) -> List[str]:
+        """
+        Add messages to the open batch and wait for their replies.
+
+        The first thread to submit to a batch handles it, after max_delay
+        or once it is full.
+
+        Raises:
+            Whatever the handler raised for the batch
+        """
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            start = len(batch.messages)
+            batch.messages.extend(messages)
+            if len(batch.messages) >= self.max_size:
+                self._batch = None
+                batch.full.set()
+
+        if leader:
+            if self.max_delay:
+                batch.full.wait(self.max_delay)
+            with self._running:
+                with self._lock:
+                    if self._batch is batch:
+                        self._batch = None
+                self._handle(batch)
+        else:
+            batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.replies[start:start + len(messages)]
+
+    def _handle(self, batch: _Batch):
+        """Run the handler on a closed batch and wake its submitters."""
+        try:
+            batch.replies = run_batch(self.handler, batch.messages)
+        except Exception as e:
+            batch.error = e
+        batch.done.set()
+
+
+class AsyncMicroBatcher:
+    """Groups messages submitted by the tasks of one event loop into batches for one handler call."""
+
+    def __init__(self, handler: BatchHandler, max_size: int = DEFAULT_BATCH_SIZE, max_delay: float = 0.0):
+        """
+        Initialize the batcher.
+
+        Args:
+            handler: Batch handler, called on the event loop
+            max_size: Messages at which a batch is handled at once
+            max_delay: Seconds the first message of a batch waits for
+                others; 0 groups what is submitted in one loop iteration
+        """
+        if max_size < 1 or max_delay < 0:
+            raise ValueError("max_size must be at least 1 and max_delay non-negative")
+        self.handler = handler
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._pending: List[str] = []
+        # (future, first message index, message count) per submission
+        self._waiters: list = []
+        self._timer: Optional[asyncio.Handle] = None
+
+    async def submit(self, messages: List[str]) -> List[str]:
+        """Add messages to the open batch and wait for their replies."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiters.append((future, len(self._pending), len(messages)))
+        self._pending.extend(messages)
+        if len(self._pending) >= self.max_size:
+            self.flush()
+        elif self._timer is None:
+            if self.max_delay:
+                self._timer = loop.call_later(self.max_delay, self.flush)
+            else:
+                self._timer = loop.call_soon(self.flush)
+        return await future
+
+    def flush(self):
+        """Handle the open batch now."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        messages, waiters = self._pending, self._waiters
+        if not waiters:
+            return
+        self._pending, self._waiters = [], []
+        try:
+            replies = run_batch(self.handler, messages)
+        except Exception as e:
+            for future, _, _ in waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, start, count in waiters:
+            if not future.done():
+                future.set_result(replies[start:start + count])
@@ -0,0 +1,1398 @@
+"""
+Benchmarks for the socket server.
+
+Each benchmark starts the server in a subprocess, drives it from this
+process and prints a comparison table.
+
+Usage:
+    python benchmark.py engines --connections 10000 --active 8
+    python benchmark.py prefork --workers 1 2 4 8
+    python benchmark.py buffers --sizes 64 65536
+    python benchmark.py writes --batch 32
+    python benchmark.py logging --active 8
+    python benchmark.py pool --callers 1 16 128
+    python benchmark.py fanout --connections 10000
+    python benchmark.py restart --rate 400
+    python benchmark.py stats --engines threaded epoll asyncio
+    python benchmark.py compression --sizes 64 512 4096 65536
+    python benchmark.py transport --sizes 64 4096 65536
+    python benchmark.py tuning --profiles default latency throughput
+    python benchmark.py cache --capacities 100 1000 --skew 0.8 1.1
+    python benchmark.py fairness --engines threaded epoll asyncio --noisy 2
+    python benchmark.py stream --sizes 1 16 64
+    python benchmark.py batch --clients 8 --call-cost 0.0002
+    python benchmark.py tls --callers 1 8
+"""
+import array
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py')
+LOADGEN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loadgen.py')
+
+# Runs server.py with per-message INFO logging disabled, so data-path
+# benchmarks measure the data path rather than the log handler
+QUIET_LAUNCHER = ("import logging, runpy, sys; logging.disable(logging.INFO); "
+                  "sys.argv = sys.argv[1:]; runpy.run_path(sys.argv[0], run_name='__main__')")
+
+
+def raise_fd_limit():
+    """Raise the soft open-file limit to the hard limit (inherited by children)."""
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def start_server(port, *server_args, quiet=False, log_file=None):
+    """
+    Start server.py in a subprocess and wait until it accepts connections.
+
+    Args:
+        port: Port to listen on
+        server_args: Extra command-line arguments for server.py
+        quiet: Disable the server's per-message INFO logging
+        log_file: File object receiving the server's log output
+            (default: discarded)
+
+    Returns:
+        The server Popen object
+    """
+    launcher = ['-c', QUIET_LAUNCHER] if quiet else []
+    process = subprocess.Popen(
+        [sys.executable, *launcher, SERVER_SCRIPT, '--port', str(port), *server_args],
+        stdout=subprocess.DEVNULL,
+        stderr=log_file or subprocess.DEVNULL
+    )
+    for _ in range(50):
+        try:
+            socket.create_connection(('localhost', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Server on port {port} failed to start")
+
+
+def stop_server(process):
+    """Terminate a server subprocess started by start_server()."""
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def process_status(pid):
+    """
+    Read resident memory and thread count of a process from /proc.
+
+    Returns:
+        Tuple (rss_kb, threads), values are None when /proc is unavailable
+    """
+    rss_kb = threads = None
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    rss_kb = int(line.split()[1])
+                elif line.startswith('Threads:'):
+                    threads = int(line.split()[1])
+    except OSError:
+        pass
+    return rss_kb, threads
+
+
+def open_idle_connections(port, count):
+    """
+    Open idle connections to the server.
+
+    Returns:
+        List of connected sockets (may be shorter than count on failure)
+    """
+    connections = []
+    for i in range(count):
+        try:
+            connections.append(socket.create_connection(('localhost', port), timeout=5.0))
+        except OSError as e:
+            print(f"  stopped after {i} idle connections: {e}")
+            break
+    return connections
+
+
+def round_trips(port, messages, latencies, errors):
+    """Send messages one at a time on a single connection, recording latency."""
+    try:
+        with socket.create_connection(('localhost', port), timeout=10.0) as sock:
+            for i in range(messages):
+                payload = f'message_{i}'.encode('utf-8')
+                start = time.perf_counter()
+                sock.sendall(payload)
+                response = sock.recv(1024)
+                latencies.append(time.perf_counter() - start)
+                if response != payload.upper():
+                    errors.append(response)
+    except OSError as e:
+        errors.append(e)
+
+
+def run_active_clients(port, clients, messages):
+    """
+    Run concurrent request/response clients.
+
+    Returns:
+        Tuple (messages_per_second, latencies, errors)
+    """
+    latencies = []
+    errors = []
+    threads = [
+        threading.Thread(target=round_trips, args=(port, messages, latencies, errors))
+        for _ in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+    return len(latencies) / duration, latencies, errors
+
+
+def percentile(values, fraction):
+    """Return the given percentile (0..1) of a list of values."""
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(fraction * len(ordered)))
+    return ordered[index]
+
+
+def benchmark_engines(args):
+    """Compare connection handling engines while holding idle connections."""
+    limit = raise_fd_limit()
+    if limit is not None:
+        print(f"Open file limit: {limit}")
+
+    results = []
+    for offset, engine in enumerate(args.engines):
+        port = args.port + offset
+        print(f"\n[{engine}] starting server on port {port}")
+        server = start_server(port, '--engine', engine, '--backlog', str(args.backlog))
+        try:
+            start = time.perf_counter()
+            idle = open_idle_connections(port, args.connections)
+            connect_time = time.perf_counter() - start
+            # Give the server time to register all connections
+            time.sleep(1.0)
+            rss_kb, threads = process_status(server.pid)
+            print(f"  {len(idle)} idle connections in {connect_time:.2f}s")
+
+            throughput, latencies, errors = run_active_clients(port, args.active, args.messages)
+            results.append({
+                'engine': engine,
+                'idle': len(idle),
+                'rss_mb': rss_kb / 1024 if rss_kb else float('nan'),
+                'threads': threads,
+                'throughput': throughput,
+                'p50_ms': statistics.median(latencies) * 1000 if latencies else float('nan'),
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+                'errors': len(errors),
+            })
+            for sock in idle:
+                sock.close()
+        finally:
+            stop_server(server)
+
+    print(f"\n{'Engine':<10}{'Idle':>8}{'RSS MB':>10}{'Threads':>9}"
+          f"{'Msg/s':>12}{'p50 ms':>9}{'p99 ms':>9}{'Errors':>8}")
+    for r in results:
+        print(f"{r['engine']:<10}{r['idle']:>8}{r['rss_mb']:>10.1f}{str(r['threads']):>9}"
+              f"{r['throughput']:>12.0f}{r['p50_ms']:>9.3f}{r['p99_ms']:>9.3f}{r['errors']:>8}")
+
+
+def timed_round_trips(port, duration):
+    """
+    Run request/response round trips on one connection for a fixed time.
+
+    Returns:
+        Number of successful round trips
+    """
+    completed = 0
+    deadline = time.perf_counter() + duration
+    with socket.create_connection(('localhost', port), timeout=10.0) as sock:
+        while time.perf_counter() < deadline:
+            sock.sendall(b'message')
+            if sock.recv(1024) == b'MESSAGE':
+                completed += 1
+    return completed
+
+
+def benchmark_prefork(args):
+    """Measure messages/sec as the number of pre-forked worker processes grows."""
+    raise_fd_limit()
+    print(f"CPU cores: {os.cpu_count()}, client processes: {args.clients}, "
+          f"duration: {args.duration}s per run")
+
+    results = []
+    for offset, workers in enumerate(args.workers):
+        port = args.port + offset
+        server = start_server(port, '--workers', str(workers), '--engine', args.engine,
+                              '--backlog', '1024')
+        try:
+            # Let every worker bind before load starts
+            time.sleep(0.5)
+            with multiprocessing.Pool(args.clients) as pool:
+                counts = pool.starmap(timed_round_trips, [(port, args.duration)] * args.clients)
+            throughput = sum(counts) / args.duration
+            results.append((workers, throughput))
+            print(f"  {workers} workers: {throughput:.0f} msg/s")
+        finally:
+            stop_server(server)
+
+    baseline = results[0][1] if results else 0
+    print(f"\n{'Workers':<10}{'Msg/s':>12}{'Speedup':>10}")
+    for workers, throughput in results:
+        speedup = throughput / baseline if baseline else float('nan')
+        print(f"{workers:<10}{throughput:>12.0f}{speedup:>9.2f}x")
+
+
+def measure_allocations(buffer_pool, size, messages):
+    """
+    Measure Python heap allocations of the server data path with tracemalloc.
+
+    The server's message handling is called in-process on a pre-filled
+    receive buffer, so only the per-message work is traced.
+
+    Returns:
+        Tuple (peak bytes per message, bytes retained after all messages)
+    """
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from framing import encode_frame, make_codec
+    from server import SocketServer
+
+    server = SocketServer(protocol='framed', buffer_pool=buffer_pool)
+    address = ('127.0.0.1', 0)
+    frame = encode_frame(b'x' * size)
+    if buffer_pool:
+        slab = server._slab_pool.acquire()
+        slab[:len(frame)] = frame
+        handle = lambda: server._process_slab(slab, len(frame), address)
+    else:
+        codec = make_codec('framed')
+        handle = lambda: server._handle_data(codec, frame, address)
+    handle()  # warm up caches before tracing
+
+    # Preallocated so recording a sample does not itself allocate
+    peaks = array.array('q', bytes(8 * messages))
+    tracemalloc.start()
+    start_current, _ = tracemalloc.get_traced_memory()
+    for i in range(messages):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        result = handle()
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+        peaks[i] = peak - before
+    retained = tracemalloc.get_traced_memory()[0] - start_current
+    tracemalloc.stop()
+    return statistics.median(peaks), retained
+
+
+def framed_throughput(port, size, duration, window=32, host='localhost'):
+    """
+    Stream framed messages of one size over one connection for a fixed time.
+
+    Returns:
+        Number of messages answered
+    """
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from client import SocketClient
+
+    payload = 'x' * size
+    completed = 0
+    client = SocketClient(host, port, timeout=10.0, protocol='framed')
+    if not client.connect():
+        return 0
+    try:
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            for response in client.send_many([payload] * window, window=window):
+                if response is not None:
+                    completed += 1
+    finally:
+        client.disconnect()
+    return completed
+
+
+def benchmark_buffers(args):
+    """Compare the default data path with the zero-copy buffer-pool path."""
+    logging.disable(logging.INFO)
+
+    print(f"{'Size':>8}  {'Mode':<12}{'Peak B/msg':>12}{'Retained B':>12}{'Msg/s':>12}{'MB/s':>10}")
+    for size in args.sizes:
+        for offset, (mode, buffer_pool) in enumerate((('default', False), ('buffer-pool', True))):
+            peak, retained = measure_allocations(buffer_pool, size, args.messages)
+            server_args = ['--protocol', 'framed'] + (['--buffer-pool'] if buffer_pool else [])
+            port = args.port + offset
+            server = start_server(port, *server_args, quiet=True)
+            try:
+                completed = framed_throughput(port, size, args.duration)
+            finally:
+                stop_server(server)
+            rate = completed / args.duration
+            print(f"{size:>8}  {mode:<12}{peak:>12.0f}{retained:>12}"
+                  f"{rate:>12.0f}{rate * size / 1e6:>10.1f}")
+
+
+def drain_socket(sock):
+    """Read and discard data until the peer closes."""
+    buffer = bytearray(1 << 20)
+    while sock.recv_into(buffer):
+        pass
+
+
+def write_batches(strategy, size, batch, duration):
+    """
+    Write batches of framed replies to a loopback TCP peer for a fixed time.
+
+    Strategies:
+        send-each: one sendall() of encode_frame() per reply
+        join: concatenate the batch and send it with one sendall()
+        sendmsg: queue header and payload buffers and flush with sendmsg()
+
+    Returns:
+        Tuple (replies per second, write syscalls per batch)
+    """
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from buffers import OutputBuffer
+    from framing import encode_frame, frame_parts
+
+    listener = socket.create_server(('127.0.0.1', 0))
+    writer = socket.create_connection(listener.getsockname())
+    reader, _ = listener.accept()
+    listener.close()
+    drainer = threading.Thread(target=drain_socket, args=(reader,), daemon=True)
+    drainer.start()
+
+    payload = b'x' * size
+    output = OutputBuffer()
+    batches = calls = 0
+    deadline = time.perf_counter() + duration
+    try:
+        while time.perf_counter() < deadline:
+            if strategy == 'send-each':
+                for _ in range(batch):
+                    writer.sendall(encode_frame(payload))
+                calls += batch
+            elif strategy == 'join':
+                writer.sendall(b''.join([encode_frame(payload) for _ in range(batch)]))
+                calls += 1
+            else:
+                replies = []
+                for _ in range(batch):
+                    replies.extend(frame_parts(payload))
+                output.extend(replies)
+                while len(output):
+                    output.send(writer)
+                    calls += 1
+            batches += 1
+    finally:
+        writer.close()
+        drainer.join()
+        reader.close()
+    return batches * batch / duration, calls / batches
+
+
+def benchmark_writes(args):
+    """Compare per-reply sends, joined sends and coalesced sendmsg() writes."""
+    print(f"Batch of {args.batch} framed replies, {args.duration}s per run")
+    print(f"{'Size':>8}  {'Strategy':<11}{'Replies/s':>12}{'MB/s':>10}{'Calls/batch':>13}")
+    for size in args.sizes:
+        for strategy in ('send-each', 'join', 'sendmsg'):
+            rate, calls = write_batches(strategy, size, args.batch, args.duration)
+            print(f"{size:>8}  {strategy:<11}{rate:>12.0f}{rate * size / 1e6:>10.1f}{calls:>13.2f}")
+
+
+def benchmark_logging(args):
+    """Compare server throughput under each --log-mode, logging to a real file."""
+    print(f"{args.active} clients x {args.messages} messages, engine: {args.engine}")
+    print(f"{'Mode':<10}{'Msg/s':>12}{'p50 ms':>9}{'p99 ms':>9}{'Log lines':>11}")
+    for offset, mode in enumerate(args.modes):
+        port = args.port + offset
+        with tempfile.TemporaryFile() as log_file:
+            server = start_server(port, '--engine', args.engine, '--backlog', '1024',
+                                  '--log-mode', mode, '--log-sample', str(args.sample),
+                                  log_file=log_file)
+            try:
+                throughput, latencies, errors = run_active_clients(port, args.active, args.messages)
+            finally:
+                stop_server(server)
+            log_file.seek(0)
+            lines = sum(1 for _ in log_file)
+        print(f"{mode:<10}{throughput:>12.0f}{statistics.median(latencies) * 1000:>9.3f}"
+              f"{percentile(latencies, 0.99) * 1000:>9.3f}{lines:>11}")
+
+
+def count_time_wait(port):
+    """
+    Count TCP sockets in TIME_WAIT to or from a local port, from /proc/net/tcp.
+
+    Returns:
+        Number of sockets, or None when /proc is unavailable
+    """
+    count = 0
+    try:
+        for path in ('/proc/net/tcp', '/proc/net/tcp6'):
+            with open(path) as table:
+                next(table)
+                for line in table:
+                    fields = line.split()
+                    local_port = int(fields[1].rsplit(':', 1)[1], 16)
+                    remote_port = int(fields[2].rsplit(':', 1)[1], 16)
+                    if fields[3] == '06' and port in (local_port, remote_port):
+                        count += 1
+    except OSError:
+        return None
+    return count
+
+
+def pooled_calls(port, callers, calls, pool, ssl_context=None, resumed=None):
+    """
+    Run concurrent single-message callers, with or without a connection pool.
+
+    Args:
+        ssl_context: Client TLS context of connect-per-call callers
+        resumed: List receiving whether each connect-per-call handshake
+            resumed a TLS session
+
+    Returns:
+        Tuple (calls_per_second, latencies, errors)
+    """
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from client import SocketClient
+
+    latencies = []
+    errors = []
+
+    def caller():
+        client = SocketClient('localhost', port, timeout=10.0, ssl_context=ssl_context)
+        for i in range(calls):
+            start = time.perf_counter()
+            response = client.send_single_message(f'message_{i}', pool=pool)
+            latencies.append(time.perf_counter() - start)
+            if response != f'MESSAGE_{i}':
+                errors.append(response)
+            if resumed is not None and pool is None:
+                resumed.append(client.tls_resumed)
+
+    threads = [threading.Thread(target=caller) for _ in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / (time.perf_counter() - start), latencies, errors
+
+
+def benchmark_pool(args):
+    """Compare connect-per-call with pooled connections as concurrent callers grow."""
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from client import SocketClientPool
+
+    raise_fd_limit()
+    logging.disable(logging.INFO)
+    print(f"{args.calls} calls per caller, pool max size {args.max_size}, engine: {args.engine}")
+    print(f"{'Callers':>8}  {'Mode':<10}{'Calls/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'Connects':>10}{'TIME_WAIT':>11}{'Errors':>8}")
+
+    server = start_server(args.port, '--engine', args.engine, '--backlog', '4096', quiet=True)
+    try:
+        for callers in args.callers:
+            for mode in ('connect', 'pooled'):
+                # Count only the TIME_WAIT entries left by this run
+                before = count_time_wait(args.port)
+                pool = SocketClientPool(max_size=args.max_size, checkout_timeout=30.0) if mode == 'pooled' else None
+                rate, latencies, errors = pooled_calls(args.port, callers, args.calls, pool)
+                connects = pool.stats['created'] if pool else callers * args.calls
+                if pool:
+                    pool.close()
+                after = count_time_wait(args.port)
+                time_wait = after - before if after is not None and before is not None else 'n/a'
+                print(f"{callers:>8}  {mode:<10}{rate:>10.0f}{statistics.median(latencies) * 1000:>9.3f}"
+                      f"{percentile(latencies, 0.99) * 1000:>9.3f}{connects:>10}{str(time_wait):>11}"
+                      f"{len(errors):>8}")
+    finally:
+        stop_server(server)
+
+
+async def fan_out(port, connections, messages, connect_concurrency):
+    """
+    Drive many concurrent AsyncSocketClient connections from one event loop.
+
+    Returns:
+        Tuple (connected, connect_seconds, messages_per_second, latencies, errors)
+    """
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from client import AsyncSocketClient
+
+    clients = [AsyncSocketClient('localhost', port, timeout=30.0) for _ in range(connections)]
+    # Bound simultaneous handshakes so the listen backlog does not overflow
+    gate = asyncio.Semaphore(connect_concurrency)
+
+    async def connect(client):
+        async with gate:
+            return await client.connect()
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(connect(client) for client in clients))
+    connect_seconds = time.perf_counter() - start
+    connected = [client for client, ok in zip(clients, results) if ok]
+
+    latencies = []
+    errors = []
+
+    async def converse(client):
+        for i in range(messages):
+            sent = time.perf_counter()
+            response = await client.send_message(f'message_{i}')
+            latencies.append(time.perf_counter() - sent)
+            if response != f'MESSAGE_{i}':
+                errors.append(response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(converse(client) for client in connected))
+    rate = len(latencies) / (time.perf_counter() - start)
+    await asyncio.gather(*(client.close() for client in connected))
+    return len(connected), connect_seconds, rate, latencies, errors
+
+
+def benchmark_fanout(args):
+    """Hold thousands of concurrent connections from one AsyncSocketClient process."""
+    limit = raise_fd_limit()
+    logging.disable(logging.INFO)
+    print(f"Open file limit: {limit}, engine: {args.engine}")
+
+    server = start_server(args.port, '--engine', args.engine, '--backlog', '4096', quiet=True)
+    try:
+        connected, connect_seconds, rate, latencies, errors = asyncio.run(
+            fan_out(args.port, args.connections, args.messages, args.connect_concurrency)
+        )
+        rss_kb, threads = process_status(os.getpid())
+    finally:
+        stop_server(server)
+
+    print(f"Connected {connected}/{args.connections} in {connect_seconds:.2f}s")
+    print(f"{'Msg/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'Client RSS MB':>15}{'Threads':>9}{'Errors':>8}")
+    print(f"{rate:>10.0f}{statistics.median(latencies) * 1000:>9.2f}{percentile(latencies, 0.99) * 1000:>9.2f}"
+          f"{(rss_kb or 0) / 1024:>15.1f}{str(threads):>9}{len(errors):>8}")
+
+
+def probe_connections(port, stop, latencies, refused, interval=0.01):
+    """Open a new connection for every request until stop is set, counting failures."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            with socket.create_connection(('localhost', port), timeout=5.0) as sock:
+                sock.sendall(b'probe')
+                if sock.recv(1024) != b'PROBE':
+                    raise ConnectionError('bad reply')
+            latencies.append(time.perf_counter() - start)
+        except OSError:
+            refused.append(time.perf_counter() - start)
+        stop.wait(interval)
+
+
+def benchmark_restart(args):
+    """Restart the server under load, with and without listening-socket takeover."""
+    logging.disable(logging.INFO)
+    print(f"Engine: {args.engine}, load: {args.connections} connections at {args.rate} msg/s "
+          f"for {args.duration:g}s, restart after {args.restart_after:g}s")
+    print(f"{'Mode':<10}{'Messages':>10}{'Errors':>8}{'p99 ms':>9}{'Max ms':>9}"
+          f"{'Probes':>8}{'Failed':>8}{'Probe max ms':>14}{'Old exit':>10}")
+
+    handoff_path = os.path.join(tempfile.mkdtemp(), 'handoff.sock')
+    for index, mode in enumerate(('restart', 'takeover')):
+        port = args.port + index
+        server_args = ['--engine', args.engine, '--backlog', '1024']
+        if mode == 'takeover':
+            server_args += ['--handoff-socket', handoff_path, '--drain-timeout', str(args.duration)]
+        old = start_server(port, *server_args, quiet=True)
+        new = None
+        load = subprocess.Popen(
+            [sys.executable, LOADGEN_SCRIPT, '--port', str(port), '-c', str(args.connections),
+             '-r', str(args.rate), '-d', str(args.duration), '--json'],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        stop = threading.Event()
+        probes, failed = [], []
+        prober = threading.Thread(target=probe_connections, args=(port, stop, probes, failed))
+        prober.start()
+        try:
+            time.sleep(args.restart_after)
+            if mode == 'restart':
+                stop_server(old)
+                new = start_server(port, *server_args, quiet=True)
+            else:
+                new = subprocess.Popen(
+                    [sys.executable, '-c', QUIET_LAUNCHER, SERVER_SCRIPT, '--port', str(port),
+                     *server_args, '--takeover'],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+            report = json.loads(load.communicate(timeout=args.duration + 30)[0])
+            stop.set()
+            prober.join()
+            try:
+                old_exit = old.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                old_exit = 'running'
+        finally:
+            stop.set()
+            for process in (load, old, new):
+                if process is not None and process.poll() is None:
+                    stop_server(process)
+
+        print(f"{mode:<10}{report['messages']:>10}{report['errors']:>8}"
+              f"{report['latency_ms']['p99'] or 0:>9.2f}{report['latency_ms']['max'] or 0:>9.2f}"
+              f"{len(probes) + len(failed):>8}{len(failed):>8}"
+              f"{max(probes, default=0) * 1000:>14.2f}{str(old_exit):>10}")
+
+
+def benchmark_stats(args):
+    """Measure the throughput cost of live metrics on each engine."""
+    print(f"{args.active} clients x {args.messages} messages")
+    print(f"{'Engine':<10}{'Stats':<7}{'Msg/s':>12}{'p50 ms':>9}{'p99 ms':>9}")
+    port = args.port
+    for engine in args.engines:
+        for enabled in (False, True):
+            stats_args = ['--stats-port', str(port + 1)] if enabled else []
+            server = start_server(port, '--engine', engine, '--backlog', '1024', *stats_args, quiet=True)
+            try:
+                throughput, latencies, errors = run_active_clients(port, args.active, args.messages)
+            finally:
+                stop_server(server)
+            port += 2
+            print(f"{engine:<10}{'on' if enabled else 'off':<7}{throughput:>12.0f}"
+                  f"{statistics.median(latencies) * 1000:>9.3f}{percentile(latencies, 0.99) * 1000:>9.3f}")
+
+
+def text_blob(size, seed):
+    """Return a JSON-like text payload of about size bytes."""
+    import random
+    rng = random.Random(seed)
+    words = ('status', 'message', 'order', 'shipped', 'customer', 'account', 'the', 'and', 'with',
+             'request', 'payment', 'pending', 'address', 'street', 'delivery', 'error', 'retry')
+    records = []
+    length = 0
+    while length < size:
+        record = (f'{{"id": {rng.randint(1, 99999)}, "status": "{rng.choice(words)}", '
+                  f'"message": "{" ".join(rng.choice(words) for _ in range(rng.randint(3, 12)))}"}}')
+        records.append(record)
+        length += len(record) + 2
+    return ', '.join(records)[:size]
+
+
+def text_blobs(size):
+    """
+    Return distinct text payloads of one size.
+
+    There are enough of them to span more than zlib's 32 KiB window, so
+    streaming compression cannot simply refer back to an earlier copy.
+    """
+    return [text_blob(size, seed) for seed in range(max(16, min(256, (1 << 22) // size)))]
+
+
+def codec_cost(mode, size, messages, threshold):
+    """
+    Measure the codec work of a compressed round trip in-process.
+
+    Returns:
+        Tuple (CPU microseconds per message, wire bytes of the first
+        request, mean wire bytes per request)
+    """
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from compression import CompressingCodec
+
+    client = CompressingCodec(modes=[mode], threshold=threshold)
+    server = CompressingCodec(modes=[mode], threshold=threshold)
+    server.decode(client.hello())
+    client.decode(server.handshake_reply)
+    payloads = [payload.encode('utf-8') for payload in text_blobs(size)]
+    wire_bytes = first = 0
+    start = time.process_time()
+    for i in range(messages):
+        request = b''.join(client.encode_parts(payloads[i % len(payloads)]))
+        wire_bytes += len(request)
+        first = first or len(request)
+        (received,) = server.decode(request)
+        client.decode(b''.join(server.encode_parts(received.upper())))
+    cpu = time.process_time() - start
+    return cpu / messages * 1e6, first, wire_bytes / messages
+
+
+def compressed_throughput(port, mode, size, duration, window=16):
+    """
+    Stream text payloads of one size over one compressed connection for a fixed time.
+
+    Returns:
+        Number of messages answered
+    """
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from client import SocketClient
+
+    payloads = text_blobs(size)
+    completed = 0
+    client = SocketClient('localhost', port, timeout=10.0, protocol='framed', compression=[mode])
+    if not client.connect():
+        return 0
+    try:
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            for response in client.send_many(payloads[:window], window=window):
+                if response is not None:
+                    completed += 1
+            payloads.append(payloads.pop(0))
+    finally:
+        client.disconnect()
+    return completed
+
+
+def benchmark_compression(args):
+    """Compare compression modes by payload size: wire bytes, codec CPU and loopback throughput."""
+    logging.disable(logging.INFO)
+    modes = ('none', 'zlib', 'zlib-dict')
+    server = start_server(args.port, '--engine', args.engine, '--protocol', 'framed',
+                          '--compression', *modes, '--compression-threshold', '0', quiet=True)
+    try:
+        print(f"{'Size':>8}  {'Mode':<11}{'First B':>9}{'Wire B':>9}{'Ratio':>7}{'CPU us/msg':>12}{'Msg/s':>9}")
+        for size in args.sizes:
+            for mode in modes:
+                cpu, first, wire = codec_cost(mode, size, args.messages, threshold=0)
+                rate = compressed_throughput(args.port, mode, size, args.duration) / args.duration
+                print(f"{size:>8}  {mode:<11}{first:>9}{wire:>9.0f}{wire / (size + 4):>7.2f}"
+                      f"{cpu:>12.1f}{rate:>9.0f}")
+    finally:
+        stop_server(server)
+
+
+def framed_latencies(host, port, size, messages):
+    """
+    Send framed messages of one size one at a time on a single connection.
+
+    Returns:
+        Round-trip latencies in seconds
+    """
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from client import SocketClient
+
+    payload = 'x' * size
+    latencies = []
+    client = SocketClient(host, port, timeout=10.0, protocol='framed')
+    if not client.connect():
+        return latencies
+    try:
+        for _ in range(messages):
+            start = time.perf_counter()
+            if client.send_message(payload) is None:
+                break
+            latencies.append(time.perf_counter() - start)
+    finally:
+        client.disconnect()
+    return latencies
+
+
+def benchmark_transport(args):
+    """Compare loopback TCP with a Unix domain socket on one server listening on both."""
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'server.sock')
+        server = start_server(args.port, '--engine', args.engine, '--protocol', 'framed',
+                              '--unix', f'unix://{path}', quiet=True)
+        try:
+            # The Unix socket is bound just after the TCP port
+            for _ in range(50):
+                if os.path.exists(path):
+                    break
+                time.sleep(0.1)
+            print(f"{'Size':>8}  {'Transport':<11}{'p50 us':>9}{'p99 us':>9}{'Msg/s':>10}{'MB/s':>9}")
+            for size in args.sizes:
+                for transport, host in (('tcp', 'localhost'), ('unix', f'unix://{path}')):
+                    latencies = framed_latencies(host, args.port, size, args.messages)
+                    rate = framed_throughput(args.port, size, args.duration, host=host) / args.duration
+                    print(f"{size:>8}  {transport:<11}{statistics.median(latencies) * 1e6:>9.1f}"
+                          f"{percentile(latencies, 0.99) * 1e6:>9.1f}{rate:>10.0f}{rate * size / 1e6:>9.1f}")
+        finally:
+            stop_server(server)
+
+
+def run_loadgen(port, *loadgen_args, timeout=120):
+    """
+    Run loadgen.py against a port and return its JSON report.
+
+    Returns:
+        Report dictionary, or None if the load generator failed
+    """
+    result = subprocess.run(
+        [sys.executable, LOADGEN_SCRIPT, '--port', str(port), '--json', *loadgen_args],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=timeout
+    )
+    try:
+        return json.loads(result.stdout)
+    except ValueError:
+        return None
+
+
+def benchmark_tuning(args):
+    """Sweep tuning profiles with the load generator, tuning server and client alike."""
+    print(f"Engine: {args.engine}, protocol: {args.protocol}, {args.duration:g}s per run")
+    print(f"{'Profile':<12}{'Payload':>9}{'Connected':>11}{'Msg/s':>10}{'MB/s':>8}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'p99.9 ms':>10}{'Errors':>8}")
+    port = args.port
+    for payload in args.payloads:
+        for connections in args.connections:
+            for profile in args.profiles:
+                server = start_server(port, '--engine', args.engine, '--protocol', args.protocol,
+                                      '--tuning', profile, quiet=True)
+                try:
+                    report = run_loadgen(port, '--tuning', profile, '--protocol', args.protocol,
+                                         '-c', str(connections), '-d', str(args.duration), '-p', payload,
+                                         timeout=args.duration + 60)
+                finally:
+                    stop_server(server)
+                # Fresh port per run, so no TIME_WAIT or leftover backlog skews the next one
+                port += 1
+                if report is None:
+                    print(f"{profile:<12}{payload:>9}{connections:>11}  load generator failed")
+                    continue
+                latency = report['latency_ms']
+                connected = f"{report['connected']}/{connections}"
+                print(f"{profile:<12}{payload:>9}{connected:>11}"
+                      f"{report['messages_per_sec']:>10.0f}"
+                      f"{report['bytes_per_sec'] / 1e6:>8.2f}{latency['p50'] or 0:>9.2f}"
+                      f"{latency['p99'] or 0:>9.2f}{latency['p99.9'] or 0:>10.2f}{report['errors']:>8}")
+
+
+def zipf_keys(keys, skew, count, seed=1):
+    """Return count message keys drawn from keys distinct ones, the i-th most popular with weight 1 / i^skew."""
+    import itertools
+    import random
+    cum_weights = list(itertools.accumulate(1 / rank ** skew for rank in range(1, keys + 1)))
+    return [f'message {rank}' for rank in random.Random(seed).choices(range(keys), cum_weights=cum_weights, k=count)]
+
+
+def expensive_handler(rounds):
+    """Return a handler that hashes its message rounds times, standing in for real work."""
+    import hashlib
+
+    def handle(message):
+        digest = message.encode('utf-8')
+        for _ in range(rounds):
+            digest = hashlib.sha256(digest).digest()
+        return digest.hex()
+    return handle
+
+
+def benchmark_cache(args):
+    """Replay a Zipf-distributed workload through each cache policy and capacity in-process."""
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from cache import ResultCache, SynchronizedResultCache
+
+    handler = expensive_handler(args.rounds)
+    print(f"{args.requests} requests over {args.keys} keys, handler of {args.rounds} SHA-256 rounds")
+    print(f"{'Skew':>5}{'Cache':>14}{'Capacity':>10}{'Hit %':>8}{'Req/s':>10}{'Evictions':>11}"
+          f"{'Rejected':>10}{'KiB':>8}")
+    for skew in args.skew:
+        keys = zipf_keys(args.keys, skew, args.requests)
+        start = time.perf_counter()
+        for key in keys:
+            handler(key)
+        elapsed = time.perf_counter() - start
+        print(f"{skew:>5g}{'none':>14}{'-':>10}{0:>8.1f}{len(keys) / elapsed:>10.0f}")
+        for capacity in args.capacities:
+            for policy in args.policies:
+                for cache_class, label in ((ResultCache, policy), (SynchronizedResultCache, f'{policy}+lock')):
+                    cache = cache_class(capacity, policy=policy)
+                    start = time.perf_counter()
+                    for key in keys:
+                        cache.get_or_compute(key, handler)
+                    elapsed = time.perf_counter() - start
+                    stats = cache.stats()
+                    print(f"{skew:>5g}{label:>14}{capacity:>10}"
+                          f"{100 * stats['hits'] / len(keys):>8.1f}{len(keys) / elapsed:>10.0f}"
+                          f"{stats['evictions']:>11}{stats['rejections']:>10}{stats['bytes'] / 1024:>8.0f}")
+
+
+def paced_latencies(port, interval, duration):
+    """
+    Send one small framed message every interval seconds, as a well-behaved client would.
+
+    Returns:
+        Round-trip latencies in seconds
+    """
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from client import SocketClient
+
+    latencies = []
+    client = SocketClient('localhost', port, timeout=10.0, protocol='framed')
+    if not client.connect():
+        return latencies
+    try:
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if client.send_message('ping') is None:
+                break
+            latencies.append(time.perf_counter() - start)
+            time.sleep(max(0.0, interval - (time.perf_counter() - start)))
+    finally:
+        client.disconnect()
+    return latencies
+
+
+def benchmark_fairness(args):
+    """Measure a well-behaved client's latency while noisy clients flood the server, with and without rate limits."""
+    logging.disable(logging.INFO)
+    limits = ['--conn-msg-rate', str(args.msg_rate), '--conn-byte-rate', str(args.byte_rate)]
+    print(f"{args.noisy} noisy connection(s) pipelining {args.size}-byte messages, one client sending "
+          f"every {args.interval * 1000:g} ms; limits {args.msg_rate:g} msg/s, {args.byte_rate:g} B/s per connection")
+    print(f"{'Engine':<10}{'Limits':<8}{'Noisy msg/s':>12}{'Polite p50 ms':>15}{'p99 ms':>9}{'max ms':>9}"
+          f"{'Samples':>9}")
+    port = args.port
+    for engine in args.engines:
+        for limited in (False, True):
+            server = start_server(port, '--engine', engine, '--protocol', 'framed', *(limits if limited else []),
+                                  quiet=True)
+            try:
+                with multiprocessing.Pool(args.noisy) as pool:
+                    noisy = pool.starmap_async(framed_throughput, [(port, args.size, args.duration)] * args.noisy)
+                    # Measure once the flood is under way and stop before it ends
+                    time.sleep(0.5)
+                    latencies = paced_latencies(port, args.interval, args.duration - 1.0)
+                    flood = sum(noisy.get())
+            finally:
+                stop_server(server)
+            port += 1
+            if not latencies:
+                print(f"{engine:<10}{'on' if limited else 'off':<8}  polite client failed")
+                continue
+            print(f"{engine:<10}{'on' if limited else 'off':<8}{flood / args.duration:>12.0f}"
+                  f"{statistics.median(latencies) * 1e3:>15.2f}{percentile(latencies, 0.99) * 1e3:>9.2f}"
+                  f"{max(latencies) * 1e3:>9.2f}{len(latencies):>9}")
+
+
+def peak_rss_kb(pid):
+    """Return the peak resident memory of a process from /proc, or None where unavailable."""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def large_round_trip(port, payload, streamed, chunk_size):
+    """
+    Send one large payload, as a stream of chunks or as a single frame.
+
+    Returns:
+        Tuple (seconds, whether the response was correct)
+    """
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from client import SocketClient
+
+    client = SocketClient('localhost', port, timeout=30.0, protocol='framed', max_frame_size=len(payload))
+    if not client.connect():
+        return None, False
+    try:
+        start = time.perf_counter()
+        if streamed:
+            pieces = (payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size))
+            response = b''.join(client.send_stream(pieces, chunk_size))
+        else:
+            response = (client.send_message(payload.decode('ascii')) or '').encode('ascii')
+        elapsed = time.perf_counter() - start
+    finally:
+        client.disconnect()
+    # Single messages are stripped by the server, streams are not
+    return elapsed, response.strip() == payload.upper().strip()
+
+
+def benchmark_stream(args):
+    """Compare server memory and throughput of streamed and single-frame large messages."""
+    logging.disable(logging.INFO)
+    print(f"Chunk size {args.chunk_size} bytes; server peak RSS is measured in a fresh server per run")
+    print(f"{'Engine':<10}{'Size MiB':>9}{'Mode':>8}{'MiB/s':>9}{'Peak RSS MiB':>14}{'Correct':>9}")
+    payloads = {size_mib: text_blob(size_mib << 20, seed=size_mib).encode('ascii') for size_mib in args.sizes}
+    port = args.port
+    for engine in args.engines:
+        for size_mib, payload in payloads.items():
+            for streamed in (False, True):
+                # Single frames need a frame limit as large as the message
+                server = start_server(port, '--engine', engine, '--protocol', 'framed',
+                                      '--max-frame-size', str(len(payload)), quiet=True)
+                try:
+                    elapsed, correct = large_round_trip(port, payload, streamed, args.chunk_size)
+                    peak = peak_rss_kb(server.pid)
+                finally:
+                    stop_server(server)
+                port += 1
+                mode = 'stream' if streamed else 'frame'
+                rate = f"{size_mib / elapsed:.1f}" if elapsed else 'n/a'
+                peak = f"{peak / 1024:.1f}" if peak is not None else 'n/a'
+                print(f"{engine:<10}{size_mib:>9}{mode:>8}{rate:>9}{peak:>14}{'yes' if correct else 'NO':>9}")
+
+
+def fixed_cost_handlers(cost):
+    """
+    Return scalar and batch uppercase handlers that pay cost seconds per call.
+
+    The sleep stands in for a fixed per-call cost such as a store round
+    trip, which a batch handler pays once for the whole batch.
+    """
+    def scalar(message):
+        time.sleep(cost)
+        return message.upper()
+
+    def batch(messages):
+        time.sleep(cost)
+        return [message.upper() for message in messages]
+    return scalar, batch
+
+
+def benchmark_batch(args):
+    """Compare per-message handling with batch handlers across connections, in-process."""
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from batching import scalar_batch
+    from server import AsyncSocketServer, SocketServer
+
+    logging.disable(logging.INFO)
+    scalar, batch = fixed_cost_handlers(args.call_cost)
+    handlers = [
+        ('none', None, 0.0),
+        ('upper', 'upper', 0.0),
+        ('cost/msg', scalar_batch(scalar), 0.0),
+        ('cost/batch', batch, 0.0),
+        ('cost/batch', batch, args.delay),
+    ]
+    print(f"{args.clients} client processes pipelining {args.size}-byte messages; "
+          f"cost handlers pay {args.call_cost * 1e6:g} us per call")
+    print(f"{'Engine':<10}{'Handler':<12}{'Delay ms':>9}{'Msg/s':>10}{'Avg batch':>11}")
+    port = args.port
+    for engine in args.engines:
+        for label, handler, delay in handlers:
+            options = dict(protocol='framed', batch_handler=handler, batch_delay=delay)
+            if engine == 'asyncio':
+                server = AsyncSocketServer('localhost', port, **options)
+            else:
+                server = SocketServer('localhost', port, engine=engine, **options)
+            thread = threading.Thread(target=server.start, daemon=True)
+            thread.start()
+            while not server.running:
+                time.sleep(0.05)
+            try:
+                with multiprocessing.Pool(args.clients) as pool:
+                    completed = sum(pool.starmap(framed_throughput,
+                                                 [(port, args.size, args.duration)] * args.clients))
+            finally:
+                server.shutdown()
+                thread.join(timeout=5.0)
+            port += 1
+            batches = server.stats['batches']
+            average = f"{server.stats['batched_messages'] / batches:.1f}" if batches else '-'
+            print(f"{engine:<10}{label:<12}{delay * 1e3:>9g}{completed / args.duration:>10.0f}{average:>11}")
+
+
+def benchmark_tls(args):
+    """Compare plaintext, full-handshake TLS and resumed TLS for connect-per-call and pooled callers."""
+    sys.path.insert(0, os.path.dirname(SERVER_SCRIPT))
+    from client import SocketClientPool
+    from tls import client_context, generate_self_signed
+
+    raise_fd_limit()
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as directory:
+        certfile, keyfile = generate_self_signed(directory, key_type=args.key_type)
+        context = client_context(certfile)
+        # Without session tickets every handshake is a full one
+        modes = [
+            ('plaintext', ()),
+            ('tls-full', ('--tls-cert', certfile, '--tls-key', keyfile, '--tls-tickets', '0')),
+            ('tls-resumed', ('--tls-cert', certfile, '--tls-key', keyfile)),
+        ]
+        print(f"{args.calls} calls per caller, pool max size {args.max_size}, engine: {args.engine}, "
+              f"{args.key_type} certificate")
+        print(f"{'Callers':>8}  {'Pattern':<9}{'Mode':<13}{'Calls/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+              f"{'Handshakes':>12}{'Resumed':>9}{'Errors':>8}")
+        servers = []
+        try:
+            for offset, (_, server_args) in enumerate(modes):
+                servers.append(start_server(args.port + offset, '--engine', args.engine, '--backlog', '4096',
+                                            *server_args, quiet=True))
+            for callers in args.callers:
+                for pattern in ('connect', 'pooled'):
+                    for offset, (mode, _) in enumerate(modes):
+                        port = args.port + offset
+                        tls = mode != 'plaintext'
+                        pool = None
+                        if pattern == 'pooled':
+                            pool = SocketClientPool(max_size=args.max_size, checkout_timeout=30.0,
+                                                    ssl_context=context if tls else None)
+                        resumed = []
+                        rate, latencies, errors = pooled_calls(port, callers, args.calls, pool,
+                                                               context if tls else None, resumed)
+                        if pool:
+                            handshakes = pool.stats['created']
+                            resumed_count = pool.stats['tls_resumed']
+                            pool.close()
+                        else:
+                            handshakes = len(resumed)
+                            resumed_count = sum(resumed)
+                        if not tls:
+                            handshakes = resumed_count = '-'
+                        print(f"{callers:>8}  {pattern:<9}{mode:<13}{rate:>10.0f}"
+                              f"{statistics.median(latencies) * 1000:>9.3f}{percentile(latencies, 0.99) * 1000:>9.3f}"
+                              f"{handshakes:>12}{resumed_count:>9}{len(errors):>8}")
+        finally:
+            for server in servers:
+                stop_server(server)
+
+
+def main():
+    """Main entry point."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Socket server benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    engines = subparsers.add_parser('engines', help='Compare connection handling engines')
+    engines.add_argument('--engines', nargs='+', default=['threaded', 'epoll', 'asyncio'],
+                         help='Engines to compare (default: threaded epoll asyncio)')
+    engines.add_argument('--port', type=int, default=9000, help='First server port (default: 9000)')
+    engines.add_argument('--connections', type=int, default=2000,
+                         help='Idle connections held open during the run (default: 2000)')
+    engines.add_argument('--backlog', type=int, default=4096,
+                         help='Server listen backlog (default: 4096)')
+    engines.add_argument('--active', type=int, default=8,
+                         help='Concurrent request/response clients (default: 8)')
+    engines.add_argument('--messages', type=int, default=1000,
+                         help='Messages per active client (default: 1000)')
+    engines.set_defaults(func=benchmark_engines)
+
+    default_workers = sorted({1, 2, 4, os.cpu_count() or 1})
+    prefork = subparsers.add_parser('prefork', help='Measure scaling of pre-forked worker processes')
+    prefork.add_argument('--workers', type=int, nargs='+', default=default_workers,
+                         help=f'Worker process counts to compare (default: {default_workers})')
+    prefork.add_argument('--engine', default='epoll', help='Engine run by each worker (default: epoll)')
+    prefork.add_argument('--port', type=int, default=9100, help='First server port (default: 9100)')
+    prefork.add_argument('--clients', type=int, default=2 * (os.cpu_count() or 1),
+                         help='Concurrent client processes (default: 2 x cores)')
+    prefork.add_argument('--duration', type=float, default=5.0,
+                         help='Seconds of load per run (default: 5)')
+    prefork.set_defaults(func=benchmark_prefork)
+
+    buffers = subparsers.add_parser('buffers', help='Compare the default and buffer-pool data paths')
+    buffers.add_argument('--sizes', type=int, nargs='+', default=[64, 65536],
+                         help='Payload sizes in bytes (default: 64 65536)')
+    buffers.add_argument('--port', type=int, default=9200, help='First server port (default: 9200)')
+    buffers.add_argument('--messages', type=int, default=1000,
+                         help='Messages traced per allocation measurement (default: 1000)')
+    buffers.add_argument('--duration', type=float, default=3.0,
+                         help='Seconds of load per throughput run (default: 3)')
+    buffers.set_defaults(func=benchmark_buffers)
+
+    writes = subparsers.add_parser('writes', help='Compare reply write strategies')
+    writes.add_argument('--sizes', type=int, nargs='+', default=[64, 1024, 65536],
+                        help='Reply payload sizes in bytes (default: 64 1024 65536)')
+    writes.add_argument('--batch', type=int, default=32,
+                        help='Replies produced per handler batch (default: 32)')
+    writes.add_argument('--duration', type=float, default=2.0,
+                        help='Seconds per run (default: 2)')
+    writes.set_defaults(func=benchmark_writes)
+
+    log_modes = subparsers.add_parser('logging', help='Compare server logging modes')
+    log_modes.add_argument('--modes', nargs='+', default=['sync', 'queue', 'sampled'],
+                           help='Log modes to compare (default: sync queue sampled)')
+    log_modes.add_argument('--engine', default='threaded', help='Server engine (default: threaded)')
+    log_modes.add_argument('--port', type=int, default=9300, help='First server port (default: 9300)')
+    log_modes.add_argument('--active', type=int, default=8,
+                           help='Concurrent request/response clients (default: 8)')
+    log_modes.add_argument('--messages', type=int, default=2000,
+                           help='Messages per client (default: 2000)')
+    log_modes.add_argument('--sample', type=int, default=100,
+                           help='Sample rate for sampled mode (default: 100)')
+    log_modes.set_defaults(func=benchmark_logging)
+
+    pool = subparsers.add_parser('pool', help='Compare connect-per-call with a client connection pool')
+    pool.add_argument('--callers', type=int, nargs='+', default=[1, 16, 128],
+                      help='Concurrent caller threads (default: 1 16 128)')
+    pool.add_argument('--calls', type=int, default=100, help='Calls per caller (default: 100)')
+    pool.add_argument('--max-size', type=int, default=16,
+                      help='Pool connections per endpoint (default: 16)')
+    pool.add_argument('--engine', default='epoll', help='Server engine (default: epoll)')
+    pool.add_argument('--port', type=int, default=9400, help='Server port (default: 9400)')
+    pool.set_defaults(func=benchmark_pool)
+
+    fanout = subparsers.add_parser('fanout', help='Drive many connections from one asyncio client process')
+    fanout.add_argument('--connections', type=int, default=10000,
+                        help='Concurrent client connections (default: 10000)')
+    fanout.add_argument('--messages', type=int, default=10,
+                        help='Messages per connection (default: 10)')
+    fanout.add_argument('--connect-concurrency', type=int, default=512,
+                        help='Handshakes in progress at once (default: 512)')
+    fanout.add_argument('--engine', default='epoll', help='Server engine (default: epoll)')
+    fanout.add_argument('--port', type=int, default=9500, help='Server port (default: 9500)')
+    fanout.set_defaults(func=benchmark_fanout)
+
+    restart = subparsers.add_parser('restart', help='Restart the server under load, with and without takeover')
+    restart.add_argument('--engine', default='epoll', help='Server engine (default: epoll)')
+    restart.add_argument('--connections', type=int, default=8,
+                         help='Load generator connections (default: 8)')
+    restart.add_argument('--rate', type=float, default=400, help='Load in messages/sec (default: 400)')
+    restart.add_argument('--duration', type=float, default=4.0,
+                         help='Seconds of load per run (default: 4)')
+    restart.add_argument('--restart-after', type=float, default=1.5,
+                         help='Seconds into the run to restart the server (default: 1.5)')
+    restart.add_argument('--port', type=int, default=9600, help='First server port (default: 9600)')
+    restart.set_defaults(func=benchmark_restart)
+
+    stats = subparsers.add_parser('stats', help='Compare throughput with live metrics off and on')
+    stats.add_argument('--engines', nargs='+', default=['threaded', 'epoll', 'asyncio'],
+                       help='Server engines to compare (default: threaded epoll asyncio)')
+    stats.add_argument('--active', type=int, default=8,
+                       help='Concurrent request/response clients (default: 8)')
+    stats.add_argument('--messages', type=int, default=2000,
+                       help='Messages per client (default: 2000)')
+    stats.add_argument('--port', type=int, default=9700, help='First server port (default: 9700)')
+    stats.set_defaults(func=benchmark_stats)
+
+    compression = subparsers.add_parser('compression', help='Compare compression modes by payload size')
+    compression.add_argument('--sizes', type=int, nargs='+', default=[64, 256, 512, 1024, 4096, 16384, 65536],
+                             help='Payload sizes in bytes (default: 64 256 512 1024 4096 16384 65536)')
+    compression.add_argument('--messages', type=int, default=2000,
+                             help='Messages per in-process CPU measurement (default: 2000)')
+    compression.add_argument('--duration', type=float, default=1.0,
+                             help='Seconds of loopback traffic per size and mode (default: 1)')
+    compression.add_argument('--engine', default='epoll', help='Server engine (default: epoll)')
+    compression.add_argument('--port', type=int, default=9800, help='Server port (default: 9800)')
+    compression.set_defaults(func=benchmark_compression)
+
+    transport = subparsers.add_parser('transport', help='Compare loopback TCP with a Unix domain socket')
+    transport.add_argument('--sizes', type=int, nargs='+', default=[64, 1024, 4096, 65536],
+                           help='Payload sizes in bytes (default: 64 1024 4096 65536)')
+    transport.add_argument('--messages', type=int, default=2000,
+                           help='Sequential round trips per latency measurement (default: 2000)')
+    transport.add_argument('--duration', type=float, default=2.0,
+                           help='Seconds of pipelined traffic per size and transport (default: 2)')
+    transport.add_argument('--engine', default='epoll', help='Server engine (default: epoll)')
+    transport.add_argument('--port', type=int, default=9900, help='Server TCP port (default: 9900)')
+    transport.set_defaults(func=benchmark_transport)
+
+    tuning = subparsers.add_parser('tuning', help='Sweep socket tuning profiles with the load generator')
+    tuning.add_argument('--profiles', nargs='+', default=['default', 'latency', 'throughput'],
+                        help='Tuning profiles to compare (default: default latency throughput)')
+    tuning.add_argument('--payloads', nargs='+', default=['64', '4096'],
+                        help='loadgen.py payload specs (default: 64 4096)')
+    tuning.add_argument('--connections', type=int, nargs='+', default=[1, 200],
+                        help='Concurrent connections per run (default: 1 200)')
+    tuning.add_argument('--duration', type=float, default=5.0,
+                        help='Seconds of closed-loop load per run (default: 5)')
+    tuning.add_argument('--engine', default='epoll', help='Server engine (default: epoll)')
+    tuning.add_argument('--protocol', default='framed', help='Wire protocol (default: framed)')
+    tuning.add_argument('--port', type=int, default=10000, help='First server port (default: 10000)')
+    tuning.set_defaults(func=benchmark_tuning)
+
+    cache = subparsers.add_parser('cache', help='Compare result cache policies on a Zipf-distributed workload')
+    cache.add_argument('--policies', nargs='+', default=['lru', 'tinylfu'],
+                       help='Cache policies to compare (default: lru tinylfu)')
+    cache.add_argument('--capacities', type=int, nargs='+', default=[100, 1000, 10000],
+                       help='Cache sizes in entries (default: 100 1000 10000)')
+    cache.add_argument('--skew', type=float, nargs='+', default=[0.8, 1.1],
+                       help='Zipf exponents of the key popularity (default: 0.8 1.1)')
+    cache.add_argument('--keys', type=int, default=100000, help='Distinct messages (default: 100000)')
+    cache.add_argument('--requests', type=int, default=200000, help='Requests per run (default: 200000)')
+    cache.add_argument('--rounds', type=int, default=100,
+                       help='SHA-256 rounds per handler call (default: 100)')
+    cache.set_defaults(func=benchmark_cache)
+
+    fairness = subparsers.add_parser('fairness', help='Measure latency next to a noisy neighbor, '
+                                                      'with and without per-connection rate limits')
+    fairness.add_argument('--engines', nargs='+', default=['threaded', 'epoll', 'asyncio'],
+                          help='Server engines to compare (default: threaded epoll asyncio)')
+    fairness.add_argument('--noisy', type=int, default=2,
+                          help='Noisy client processes, one connection each (default: 2)')
+    fairness.add_argument('--size', type=int, default=4096,
+                          help='Payload size of the noisy clients in bytes (default: 4096)')
+    fairness.add_argument('--interval', type=float, default=0.01,
+                          help='Seconds between messages of the well-behaved client (default: 0.01)')
+    fairness.add_argument('--msg-rate', type=float, default=500,
+                          help='Per-connection message limit when limits are on (default: 500)')
+    fairness.add_argument('--byte-rate', type=float, default=1e6,
+                          help='Per-connection byte limit when limits are on (default: 1000000)')
+    fairness.add_argument('--duration', type=float, default=5.0,
+                          help='Seconds of flooding per run (default: 5)')
+    fairness.add_argument('--port', type=int, default=10200, help='First server port (default: 10200)')
+    fairness.set_defaults(func=benchmark_fairness)
+
+    stream = subparsers.add_parser('stream', help='Compare streamed and single-frame large messages')
+    stream.add_argument('--engines', nargs='+', default=['threaded', 'epoll', 'asyncio'],
+                        help='Server engines to compare (default: threaded epoll asyncio)')
+    stream.add_argument('--sizes', nargs='+', type=int, default=[1, 16, 64],
+                        help='Message sizes in MiB (default: 1 16 64)')
+    stream.add_argument('--chunk-size', type=int, default=64 * 1024,
+                        help='Bytes per streamed chunk (default: 65536)')
+    stream.add_argument('--port', type=int, default=10300, help='First server port (default: 10300)')
+    stream.set_defaults(func=benchmark_stream)
+
+    batch = subparsers.add_parser('batch', help='Compare per-message and batch handlers')
+    batch.add_argument('--engines', nargs='+', default=['threaded', 'epoll', 'asyncio'],
+                       help='Server engines to compare (default: threaded epoll asyncio)')
+    batch.add_argument('--clients', type=int, default=8,
+                       help='Client processes, one pipelining connection each (default: 8)')
+    batch.add_argument('--size', type=int, default=64, help='Payload size in bytes (default: 64)')
+    batch.add_argument('--call-cost', type=float, default=0.0002,
+                       help='Seconds each call of the cost handlers takes (default: 0.0002)')
+    batch.add_argument('--delay', type=float, default=0.001,
+                       help='Batch delay in seconds for the delayed run (default: 0.001)')
+    batch.add_argument('--duration', type=float, default=3.0, help='Seconds per run (default: 3)')
+    batch.add_argument('--port', type=int, default=10400, help='First server port (default: 10400)')
+    batch.set_defaults(func=benchmark_batch)
+
+    tls = subparsers.add_parser('tls', help='Compare plaintext, full-handshake and resumed TLS, '
+                                            'connect-per-call and pooled')
+    tls.add_argument('--callers', type=int, nargs='+', default=[1, 8],
+                     help='Concurrent caller threads (default: 1 8)')
+    tls.add_argument('--calls', type=int, default=200, help='Calls per caller (default: 200)')
+    tls.add_argument('--max-size', type=int, default=8, help='Pool connections per endpoint (default: 8)')
+    tls.add_argument('--engine', default='epoll', help='Server engine (default: epoll)')
+    tls.add_argument('--key-type', choices=['rsa', 'ec'], default='rsa',
+                     help='Certificate key: rsa (2048 bits) or ec (P-256) (default: rsa)')
+    tls.add_argument('--port', type=int, default=10500, help='First server port (default: 10500)')
+    tls.set_defaults(func=benchmark_tls)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
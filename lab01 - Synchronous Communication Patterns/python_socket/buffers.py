@@ -0,0 +1,221 @@
+"""
+Reusable receive buffers for the socket server hot path.
+
+In buffer-pool mode the server reads with recv_into() into preallocated
+bytearray slabs, transforms ASCII payloads in place and sends replies
+straight from memoryviews of the slab, avoiding the bytes -> str -> bytes
+round trip of the default path.
+
+OutputBuffer queues outgoing replies without joining them and flushes
+them with scatter-gather sendmsg(), one syscall per batch. TLS sockets
+have no sendmsg(), so their batches are always joined.
+"""
+import os
+import socket
+import ssl
+import threading
+from collections import deque
+from itertools import islice
+from typing import List
+
+# Default slab size: room for a 64 KiB payload plus its frame header
+DEFAULT_SLAB_SIZE = 64 * 1024 + 1024
+
+# Bytes stripped by str.strip() that are also ASCII
+ASCII_WHITESPACE = frozenset(b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f')
+
+# In-place transforms work on bounded chunks so temporaries stay small
+TRANSFORM_CHUNK_SIZE = 4096
+
+# Most buffers a single sendmsg() call accepts
+try:
+    IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+if IOV_MAX <= 0:
+    IOV_MAX = 1024
+
+# Batches smaller than this are joined and sent with send(); below it a
+# copy is cheaper than the per-buffer overhead of sendmsg()
+COALESCE_THRESHOLD = 64 * 1024
+
+# sendmsg() is missing on Windows
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+
+class SlabPool:
+    """Thread-safe free list of fixed-size bytearray slabs."""
+
+    def __init__(self, slab_size: int = DEFAULT_SLAB_SIZE, max_free: int = 64):
+        """
+        Initialize the pool.
+
+        Args:
+            slab_size: Size of every slab in bytes
+            max_free: Maximum number of idle slabs kept for reuse
+        """
+        self.slab_size = slab_size
+        self.max_free = max_free
+        self._free: List[bytearray] = []
+        self._lock = threading.Lock()
+        self.allocated = 0
+
+    def acquire(self) -> bytearray:
+        """Return an idle slab, allocating a new one if none is free."""
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+            self.allocated += 1
+        return bytearray(self.slab_size)
+
+    def release(self, slab: bytearray):
+        """
+        Return a slab to the pool.
+
+        Args:
+            slab: Slab previously returned by acquire()
+        """
+        if len(slab) != self.slab_size:
+            return
+        with self._lock:
+            if len(self._free) < self.max_free:
+                self._free.append(slab)
+
+
+def upper_ascii_in_place(buffer: bytearray, start: int, end: int) -> bool:
+    """
+    Uppercase buffer[start:end] in place if it is pure ASCII.
+
+    The range is processed in TRANSFORM_CHUNK_SIZE pieces. When a non-ASCII
+    byte is found the function returns False; chunks already processed stay
+    uppercased, which is harmless because str.upper() maps ASCII letters the
+    same way regardless of context.
+
+    Args:
+        buffer: Buffer holding the payload
+        start: Payload start offset
+        end: Payload end offset
+
+    Returns:
+        True if the whole range was ASCII and has been uppercased
+    """
+    for chunk_start in range(start, end, TRANSFORM_CHUNK_SIZE):
+        chunk_end = min(chunk_start + TRANSFORM_CHUNK_SIZE, end)
+        upper = buffer[chunk_start:chunk_end].upper()
+        if not upper.isascii():
+            return False
+        buffer[chunk_start:chunk_end] = upper
+    return True
+
+
+def is_stripped(buffer: bytearray, start: int, end: int) -> bool:
+    """Return True if buffer[start:end] is non-empty with no surrounding ASCII whitespace."""
+    return (end > start
+            and buffer[start] not in ASCII_WHITESPACE
+            and buffer[end - 1] not in ASCII_WHITESPACE)
+
+
+class OutputBuffer:
+    """
+    Per-connection queue of outgoing buffers flushed with sendmsg().
+
+    Buffers are queued by reference and a whole batch goes out in one
+    syscall: small batches are joined, large ones are passed to sendmsg()
+    as a scatter-gather list so big replies are never copied. Partial
+    writes are tracked and the unsent tail is kept for the next flush.
+    """
+
+    def __init__(self):
+        """Initialize an empty buffer."""
+        self._chunks = deque()
+        self.pending = 0
+
+    def __len__(self) -> int:
+        """Number of bytes waiting to be sent."""
+        return self.pending
+
+    def append(self, data):
+        """
+        Queue one buffer.
+
+        Args:
+            data: bytes, bytearray or memoryview to send
+        """
+        if len(data):
+            self._chunks.append(data)
+            self.pending += len(data)
+
+    def extend(self, chunks: List):
+        """
+        Queue several buffers in order.
+
+        Args:
+            chunks: Buffers to send
+        """
+        self._chunks.extend(chunks)
+        self.pending += sum(map(len, chunks))
+
+    def own(self):
+        """Copy queued memoryviews of mutable buffers, so those buffers can be reused."""
+        if any(isinstance(chunk, memoryview) and not isinstance(chunk.obj, bytes)
+               for chunk in self._chunks):
+            self._chunks = deque(
+                bytes(chunk) if isinstance(chunk, memoryview) and not isinstance(chunk.obj, bytes)
+                else chunk
+                for chunk in self._chunks
+            )
+
+    def send(self, sock: socket.socket) -> int:
+        """
+        Write as much queued data as one syscall accepts.
+
+        Args:
+            sock: Connected socket
+
+        Returns:
+            Number of bytes sent
+
+        Raises:
+            BlockingIOError: If a non-blocking socket cannot accept data;
+                ssl.SSLWantWriteError on TLS sockets
+        """
+        if len(self._chunks) == 1:
+            sent = sock.send(self._chunks[0])
+        elif self.pending < COALESCE_THRESHOLD or not HAS_SENDMSG or isinstance(sock, ssl.SSLSocket):
+            sent = sock.send(b''.join(islice(self._chunks, IOV_MAX)))
+        else:
+            sent = sock.sendmsg(list(islice(self._chunks, IOV_MAX)))
+        self._consume(sent)
+        return sent
+
+    def flush(self, sock: socket.socket) -> bool:
+        """
+        Write queued data until the buffer is empty or the socket would block.
+
+        Args:
+            sock: Connected socket
+
+        Returns:
+            True if everything was sent
+        """
+        try:
+            while self._chunks:
+                self.send(sock)
+        except (BlockingIOError, InterruptedError, ssl.SSLWantWriteError, ssl.SSLWantReadError):
+            return False
+        return True
+
+    def _consume(self, sent: int):
+        """Drop sent bytes from the front of the queue, keeping a partial tail."""
+        self.pending -= sent
+        chunks = self._chunks
+        if not self.pending:
+            chunks.clear()
+            return
+        while sent:
+            size = len(chunks[0])
+            if sent < size:
+                chunks[0] = memoryview(chunks[0])[sent:]
+                return
+            chunks.popleft()
+            sent -= size
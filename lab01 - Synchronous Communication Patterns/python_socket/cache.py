@@ -0,0 +1,276 @@
+"""
+Bounded result cache for expensive message handlers.
+
+Identical requests are answered from memory instead of running the
+handler again. Entries are kept in recency order in an OrderedDict and the
+least recently used one is evicted when the cache is over its entry or
+byte budget.
+
+- lru: every new result is admitted, evicting the least recently used
+- tinylfu: a new result is only admitted if its key was requested more
+  often than the entry it would evict, going by a count-min sketch of
+  recent request frequencies. One-off requests then cannot flush popular
+  entries out. The sketch halves its counters every SAMPLE_FACTOR x
+  max_entries requests, so it follows shifting popularity.
+
+Each entry is charged sys.getsizeof() of its key and value plus
+ENTRY_OVERHEAD for the bookkeeping, and can expire after a TTL; expired
+entries are dropped when next looked up or when they reach the LRU end.
+
+ResultCache takes no locks and is meant for a single event loop.
+SynchronizedResultCache serializes access for the threaded engine.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+CACHE_POLICIES = ('lru', 'tinylfu')
+
+# Estimated bytes per entry beyond key and value: OrderedDict node and the entry tuple
+ENTRY_OVERHEAD = 160
+
+# Sketch requests between halvings, per cache entry
+SAMPLE_FACTOR = 10
+
+# Sketch counters per row, per cache entry; fewer make unrelated keys share counters
+WIDTH_FACTOR = 4
+
+# Sketch counters saturate here, as 4-bit counters would
+MAX_FREQUENCY = 15
+
+# Halves every counter of a sketch row with one bytes.translate()
+_HALVE = bytes(count >> 1 for count in range(256))
+
+# Counter rows per sketch; each takes its index from a different slice of one hash
+SKETCH_DEPTH = 4
+
+# Widest sketch row, so the row indexes fit in the 96 mixed hash bits
+MAX_SKETCH_WIDTH = 1 << 24
+
+# Odd multiplier that mixes a key's hash before it is sliced into row indexes
+_HASH_MIX = 0x9E3779B97F4A7C15
+
+_MASK64 = (1 << 64) - 1
+
+_MISSING = object()
+
+
+def entry_size(key: Any, value: Any) -> int:
+    """Return the bytes charged for caching a key and value."""
+    return sys.getsizeof(key) + sys.getsizeof(value) + ENTRY_OVERHEAD
+
+
+class FrequencySketch:
+    """Count-min sketch of recent key frequencies, aged by periodic halving."""
+
+    def __init__(self, width: int, sample_size: int):
+        """
+        Initialize the sketch.
+
+        Args:
+            width: Counters per row, rounded up to a power of two
+            sample_size: Increments between halvings of every counter
+        """
+        width = min(1 << max(4, (width - 1).bit_length()), MAX_SKETCH_WIDTH)
+        self._bits = width.bit_length() - 1
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in range(SKETCH_DEPTH)]
+        self.sample_size = sample_size
+        self._additions = 0
+
+    def _indexes(self, key: Hashable):
+        """Return the counter index of a key in each row."""
+        h = ((hash(key) & _MASK64) * _HASH_MIX) >> 32
+        bits = self._bits
+        mask = self._mask
+        return h & mask, (h >> bits) & mask, (h >> 2 * bits) & mask, (h >> 3 * bits) & mask
+
+    def increment(self, key: Hashable):
+        """Count one request for a key."""
+        a, b, c, d = self._indexes(key)
+        first, second, third, fourth = self._rows
+        if first[a] < MAX_FREQUENCY:
+            first[a] += 1
+        if second[b] < MAX_FREQUENCY:
+            second[b] += 1
+        if third[c] < MAX_FREQUENCY:
+            third[c] += 1
+        if fourth[d] < MAX_FREQUENCY:
+            fourth[d] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            for row in self._rows:
+                row[:] = row.translate(_HALVE)
+            self._additions //= 2
+
+    def estimate(self, key: Hashable) -> int:
+        """Return the estimated recent request count of a key."""
+        a, b, c, d = self._indexes(key)
+        first, second, third, fourth = self._rows
+        return min(first[a], second[b], third[c], fourth[d])
+
+
+class ResultCache:
+    """Bounded LRU or TinyLFU cache with byte accounting and TTLs; not thread-safe."""
+
+    thread_safe = False
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None, ttl: Optional[float] = None,
+                 policy: str = 'lru', sizeof: Callable[[Any, Any], int] = entry_size,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Most entries held at once
+            max_bytes: Most bytes held at once, as charged by sizeof; None
+                bounds the cache by entries only
+            ttl: Seconds an entry stays valid; None keeps entries until evicted
+            policy: 'lru' or 'tinylfu', see the module docstring
+            sizeof: Returns the bytes charged for a key and value
+            clock: Monotonic time source for TTLs
+        """
+        if policy not in CACHE_POLICIES:
+            raise ValueError(f"Unknown cache policy '{policy}', expected one of {CACHE_POLICIES}")
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.policy = policy
+        self.sizeof = sizeof
+        self.clock = clock
+        # key -> (value, size, expiry or None), least recently used first
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._sketch = FrequencySketch(WIDTH_FACTOR * max_entries, SAMPLE_FACTOR * max_entries) if policy == 'tinylfu' else None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value of a key, or default on a miss."""
+        if self._sketch is not None:
+            self._sketch.increment(key)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        if entry[2] is not None and entry[2] <= self.clock():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> bool:
+        """
+        Cache a value, evicting least recently used entries to make room.
+
+        Returns:
+            False if the value was not admitted: larger than max_bytes, or
+            less popular than the entry it would evict under tinylfu
+        """
+        size = self.sizeof(key, value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            self.rejections += 1
+            return False
+        entries = self._entries
+        if key in entries:
+            self._remove(key)
+        elif self._sketch is not None and len(entries) >= self.max_entries:
+            victim = next(iter(entries))
+            if self._sketch.estimate(key) <= self._sketch.estimate(victim):
+                self.rejections += 1
+                return False
+
+        while entries and (len(entries) >= self.max_entries or
+                           (self.max_bytes is not None and self.bytes + size > self.max_bytes)):
+            victim, (_, _, expiry) = next(iter(entries.items()))
+            self._remove(victim)
+            if expiry is not None and expiry <= self.clock():
+                self.expirations += 1
+            else:
+                self.evictions += 1
+
+        expiry = self.clock() + self.ttl if self.ttl is not None else None
+        entries[key] = (value, size, expiry)
+        self.bytes += size
+        return True
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[Hashable], Any]) -> Any:
+        """Return the cached value of a key, computing and caching it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute(key)
+            self.put(key, value)
+        return value
+
+    def _remove(self, key: Hashable):
+        """Drop an entry and release its bytes."""
+        self.bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """Drop every entry; counters are kept."""
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the counters and current size."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'rejections': self.rejections,
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+        }
+
+
+class SynchronizedResultCache(ResultCache):
+    """
+    ResultCache safe to share between threads.
+
+    The lock is not held while get_or_compute() runs the handler, so two
+    threads missing the same key at once may both compute it.
+    """
+
+    thread_safe = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return super().get(key, default)
+
+    def put(self, key: Hashable, value: Any) -> bool:
+        with self._lock:
+            return super().put(key, value)
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return super().stats()
+
+
+def memoize(handler: Callable[[Hashable], Any], cache: ResultCache) -> Callable[[Hashable], Any]:
+    """Return handler wrapped so that its results are served from cache."""
+    def cached(key):
+        return cache.get_or_compute(key, handler)
+    cached.cache = cache
+    return cached
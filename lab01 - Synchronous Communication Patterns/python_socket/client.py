@@ -1,7 +1,33 @@
+import asyncio
+import io
+import os
 import socket
 import sys
 import logging
-from typing import Optional
+import select
+import ssl
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Add the client directory to the path so sibling modules import as packages too
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from buffers import OutputBuffer
+from compression import COMPRESSION_MODES, DEFAULT_COMPRESSION_THRESHOLD, DEFAULT_DICTIONARY, CompressingCodec
+from framing import (
+    DEFAULT_MAX_FRAME_SIZE, DEFAULT_STREAM_CHUNK_SIZE, FRAME_HEADER, PROTOCOLS, FrameTooLargeError, StreamChunk,
+    make_codec
+)
+from opcodes import BINARY_HEADER, FLAG_ERROR, BinaryMessage, parse_opcode
+from tls import client_context, set_nodelay
+from transport import format_address, parse_unix_address
+from tuning import TUNING_PROFILES, TuningProfile, get_profile, set_buffers, tune_connection
+from logsetup import (
+    DEFAULT_SAMPLE_RATE, DEFAULT_SUMMARY_INTERVAL, LOG_MODES, TrafficLog, configure_logging, stop_logging
+)
 
 # Configure logging
 logging.basicConfig(
@@ -11,22 +37,126 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class Pipeline:
+    """Buffers messages and sends them to the server in a single syscall."""
+    
+    def __init__(self, client: 'SocketClient'):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            client: Connected framed-protocol client the pipeline writes to
+        """
+        self.client = client
+        self.responses: List[Optional[str]] = []
+        self._count = 0
+        
+    def send(self, message: str):
+        """
+        Queue a message; nothing is written until the pipeline is flushed.
+        
+        Args:
+            message: Message to send to server
+        """
+        self.client._output.extend(self.client._codec.encode_parts(message.encode('utf-8')))
+        self._count += 1
+        
+    def execute(self) -> List[Optional[str]]:
+        """
+        Flush all queued messages in one write and collect their responses.
+        
+        Returns:
+            Responses in send order; missing responses are None
+        """
+        count, self._count = self._count, 0
+        if not count:
+            return self.responses
+            
+        try:
+            self.client._output.flush(self.client.client_socket)
+            logger.info(f"Sent pipeline of {count} messages")
+            for _ in range(count):
+                payload = self.client._receive_payload()
+                if payload is None:
+                    logger.error("Server closed connection")
+                    break
+                self.responses.append(payload.decode('utf-8'))
+        except socket.timeout:
+            logger.error("Response timeout from server")
+        except Exception as e:
+            logger.error(f"Error sending pipeline: {e}")
+            
+        self.responses.extend([None] * (count - len(self.responses)))
+        return self.responses
+        
+    def discard(self):
+        """Drop the queued messages unsent, so the connection stays in sync for later requests."""
+        if self._count:
+            self.client._output = OutputBuffer()
+            self._count = 0
+
+
 class SocketClient:
     """TCP Socket Client for communicating with server."""
     
-    def __init__(self, host: str = 'localhost', port: int = 8080, timeout: float = 5.0):
+    def __init__(self, host: str = 'localhost', port: int = 8080, timeout: float = 5.0,
+                 protocol: str = 'text', max_frame_size: int = DEFAULT_MAX_FRAME_SIZE,
+                 traffic_log: Optional[TrafficLog] = None, compression: Optional[Sequence[str]] = None,
+                 compression_threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+                 compression_dict: bytes = DEFAULT_DICTIONARY,
+                 tuning: Optional[Union[str, TuningProfile]] = None,
+                 ssl_context: Optional[ssl.SSLContext] = None, server_hostname: Optional[str] = None):
         """
         Initialize the socket client.
         
+        With an ssl_context, each connect() offers the TLS session of the
+        previous connection, so reconnecting resumes it instead of repeating
+        the full handshake.
+        
         Args:
-            host: Server host address
-            port: Server port number
+            host: Server host address, or unix:///path for a Unix domain socket
+            port: Server port number, ignored for Unix domain sockets
             timeout: Connection timeout in seconds
+            protocol: Wire protocol, 'text', 'framed' or 'binary' (must match the server)
+            max_frame_size: Largest frame payload in bytes sent or accepted
+            traffic_log: Sample per-message logs and log periodic throughput
+                summaries instead of logging every message
+            compression: Compression modes to offer the server on connect,
+                most preferred first (framed protocol); None sends no handshake
+            compression_threshold: Smallest request in bytes that is compressed
+            compression_dict: Preset dictionary for the zlib-dict mode
+            tuning: Name of a tuning profile or a TuningProfile whose socket
+                options are set on each TCP connection
+            ssl_context: Wrap each connection in TLS with this client
+                context (see tls.client_context()); None connects in plaintext
+            server_hostname: Name the server certificate is checked
+                against; defaults to host
         """
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown protocol '{protocol}', expected one of {PROTOCOLS}")
+        if compression is not None and protocol != 'framed':
+            raise ValueError("Compression requires the framed protocol")
+            
         self.host = host
         self.port = port
+        self.unix_path = parse_unix_address(host)
         self.timeout = timeout
+        self.protocol = protocol
+        self.max_frame_size = max_frame_size
+        self.traffic_log = traffic_log
+        self.compression = tuple(compression) if compression is not None else None
+        self.compression_threshold = compression_threshold
+        self.compression_dict = compression_dict
+        self.tuning = get_profile(tuning) if tuning is not None else None
+        self.ssl_context = ssl_context
+        self.server_hostname = server_hostname
+        self.tls_session: Optional[ssl.SSLSession] = None  # offered on the next connect()
+        self.tls_resumed = False  # whether the last TLS handshake resumed a session
+        self._session_checks = 0  # times the open connection's TLS session was looked at
         self.client_socket: Optional[socket.socket] = None
+        self._codec = None
+        self._responses = deque()
+        self._output = OutputBuffer()
         
     def connect(self) -> bool:
         """
@@ -36,28 +166,95 @@ class SocketClient:
             True if connection successful, False otherwise
         """
         try:
-            # Create TCP socket
-            self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            # Create TCP or Unix domain socket
+            if self.unix_path is not None:
+                self.client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                address = self.unix_path
+            else:
+                self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                address = (self.host, self.port)
             self.client_socket.settimeout(self.timeout)
+            if self.tuning is not None:
+                set_buffers(self.client_socket, self.tuning)
             
             # Connect to server
-            self.client_socket.connect((self.host, self.port))
-            logger.info(f"Connected to server at {self.host}:{self.port}")
+            self.client_socket.connect(address)
+            if self.tuning is not None:
+                tune_connection(self.client_socket, self.tuning)
+            if self.ssl_context is not None:
+                self._start_tls()
+            self._responses.clear()
+            self._output = OutputBuffer()
+            if self.compression is not None:
+                self._negotiate_compression()
+            else:
+                # Chunks of streamed responses are accepted up to a frame in size
+                self._codec = make_codec(self.protocol, self.max_frame_size, self.max_frame_size)
+            logger.info(f"Connected to server at {format_address(self.host, self.port)}")
             return True
             
         except socket.timeout:
-            logger.error(f"Connection timeout to {self.host}:{self.port}")
+            logger.error(f"Connection timeout to {format_address(self.host, self.port)}")
             return False
-        except ConnectionRefusedError:
-            logger.error(f"Connection refused by {self.host}:{self.port}")
+        except (ConnectionRefusedError, FileNotFoundError):
+            logger.error(f"Connection refused by {format_address(self.host, self.port)}")
             return False
         except socket.gaierror as e:
             logger.error(f"Name resolution error: {e}")
             return False
+        except ssl.SSLError as e:
+            logger.error(f"TLS handshake with {format_address(self.host, self.port)} failed: {e}")
+            return False
         except Exception as e:
             logger.error(f"Connection error: {e}")
             return False
             
+    def _start_tls(self):
+        """Wrap the connected socket in TLS, offering the session of the previous connection."""
+        hostname = self.server_hostname
+        if hostname is None and self.unix_path is None:
+            hostname = self.host
+        if self.tuning is None:
+            set_nodelay(self.client_socket)
+        try:
+            self.client_socket = self.ssl_context.wrap_socket(self.client_socket, server_hostname=hostname,
+                                                              session=self.tls_session)
+        except ssl.SSLError:
+            # A rejected session is not offered again
+            self.tls_session = None
+            self.client_socket.close()
+            raise
+        self.tls_resumed = self.client_socket.session_reused
+        self._session_checks = 0
+        if self.tls_resumed:
+            logger.debug("Resumed TLS session")
+            
+    def _remember_session(self):
+        """Keep the TLS session of the open connection for the next connect()."""
+        # Reading SSLSocket.session is costly. The server sends its tickets
+        # right after the handshake, so they have been read along with the
+        # first response; a pooled connection may be returned once before that.
+        if not isinstance(self.client_socket, ssl.SSLSocket) or self._session_checks >= 2:
+            return
+        self._session_checks += 1
+        session = self.client_socket.session
+        # TLS 1.3 sessions become resumable once the server's ticket has been read
+        if session is not None and session.has_ticket:
+            self.tls_session = session
+            self._session_checks = 2
+            
+    def _negotiate_compression(self):
+        """Offer the configured compression modes and wait for the server's choice."""
+        self._codec = CompressingCodec(self.max_frame_size, self.compression,
+                                       self.compression_threshold, self.compression_dict)
+        self.client_socket.sendall(self._codec.hello())
+        while self._codec.mode is None:
+            data = self.client_socket.recv(65536)
+            if not data:
+                raise ConnectionError("Server closed connection during compression handshake")
+            self._responses.extend(self._codec.decode(data))
+        logger.info(f"Negotiated compression: {self._codec.mode}")
+        
     def send_message(self, message: str) -> Optional[str]:
         """
         Send message to server and wait for response.
@@ -73,18 +270,26 @@ class SocketClient:
             return None
             
         try:
-            # Send message to server
-            self.client_socket.send(message.encode('utf-8'))
-            logger.info(f"Sent: {message}")
+            # Send message to server; header and payload go out in one sendmsg()
+            request_data = message.encode('utf-8')
+            self._output.extend(self._codec.encode_parts(request_data))
+            self._output.flush(self.client_socket)
+            if self.traffic_log is None:
+                logger.info(f"Sent: {message}")
             
             # Receive response from server
-            response_data = self.client_socket.recv(1024)
-            if not response_data:
+            response_data = self._receive_payload()
+            if response_data is None:
                 logger.error("Server closed connection")
                 return None
                 
             response = response_data.decode('utf-8')
-            logger.info(f"Received: {response}")
+            if self.traffic_log is None:
+                logger.info(f"Received: {response}")
+            elif self.traffic_log.record((self.host, self.port), len(response_data), len(request_data)):
+                # Sampled: log the pair together, 1 in N
+                logger.info(f"Sent: {message}")
+                logger.info(f"Received: {response}")
             return response
             
         except socket.timeout:
@@ -97,9 +302,353 @@ class SocketClient:
             logger.error(f"Error sending message: {e}")
             return None
             
+    def send_many(self, messages: Iterable[str], window: int = 32) -> Iterator[str]:
+        """
+        Pipeline messages on one connection, keeping up to window requests in flight.
+        
+        Requires the framed protocol. Messages are written in batches as the
+        window frees up, so a full window costs one sendmsg() call. The window
+        should be small enough that window * message size fits in the socket
+        buffers, otherwise both peers can block on send.
+        
+        Args:
+            messages: Messages to send (any iterable, consumed lazily)
+            window: Maximum number of unanswered requests
+            
+        Yields:
+            Server responses in request order; a message too large to frame
+            is not sent and answered with "ERROR: Frame too large" in its
+            place. Iteration stops early if an error occurs
+        """
+        if not self.client_socket:
+            logger.error("Not connected to server")
+            return
+        if not self._codec.framed:
+            raise ValueError("Pipelining requires the framed protocol")
+        if window < 1:
+            raise ValueError("window must be at least 1")
+            
+        pending_messages = iter(messages)
+        # One slot per unanswered message in order: None while the server
+        # owes the response, or the error reply for a message never sent
+        slots = deque()
+        in_flight = 0
+        exhausted = False
+        
+        try:
+            while True:
+                # Top up the window with as many messages as it allows
+                queued = 0
+                while not exhausted and in_flight + queued < window:
+                    try:
+                        message = next(pending_messages)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    try:
+                        parts = self._codec.encode_parts(message.encode('utf-8'))
+                    except FrameTooLargeError as e:
+                        logger.error(f"Not sending message: {e}")
+                        slots.append("ERROR: Frame too large")
+                        continue
+                    self._output.extend(parts)
+                    slots.append(None)
+                    queued += 1
+                    
+                if queued:
+                    self._output.flush(self.client_socket)
+                    in_flight += queued
+                    logger.debug(f"Sent {queued} pipelined messages")
+                    
+                while slots and slots[0] is not None:
+                    yield slots.popleft()
+                if not in_flight:
+                    if exhausted:
+                        return
+                    continue
+                    
+                # Wait for one response, then hand out any others already received
+                payload = self._receive_payload()
+                if payload is None:
+                    logger.error("Server closed connection")
+                    return
+                slots.popleft()
+                in_flight -= 1
+                yield payload.decode('utf-8')
+                
+                while slots and (slots[0] is not None or self._responses):
+                    reply = slots.popleft()
+                    if reply is None:
+                        in_flight -= 1
+                        reply = self._receive_payload().decode('utf-8')
+                    yield reply
+                    
+        except GeneratorExit:
+            # Caller stopped early: consume outstanding responses so the
+            # connection stays in sync for later requests
+            try:
+                for _ in range(in_flight):
+                    if self._receive_payload() is None:
+                        break
+            except socket.error as e:
+                logger.error(f"Error draining pipelined responses: {e}")
+            raise
+        except socket.timeout:
+            logger.error("Response timeout from server")
+        except UnicodeDecodeError as e:
+            logger.error(f"Invalid UTF-8 response from server: {e}")
+        except socket.error as e:
+            logger.error(f"Error sending messages: {e}")
+            
+    @contextmanager
+    def pipeline(self):
+        """
+        Buffer sends and flush them in one syscall when the block exits.
+        
+        Example:
+            with client.pipeline() as pipe:
+                pipe.send("a")
+                pipe.send("b")
+            print(pipe.responses)  # ['A', 'B']
+            
+        If the block raises, the queued messages are dropped unsent.
+        
+        Yields:
+            Pipeline collecting the responses in its responses attribute
+        """
+        if not self.client_socket:
+            raise ConnectionError("Not connected to server")
+        if not self._codec.framed:
+            raise ValueError("Pipelining requires the framed protocol")
+            
+        pipe = Pipeline(self)
+        try:
+            yield pipe
+        except BaseException:
+            # Nothing queued has been written, so dropping it keeps requests and responses paired
+            pipe.discard()
+            raise
+        pipe.execute()
+        
+    def _receive_payload(self) -> Optional[bytes]:
+        """
+        Receive the next response payload.
+        
+        In text mode this is a single recv(); in framed mode data is read
+        until a complete frame is available. Frames beyond the first are kept
+        for later calls.
+        
+        Returns:
+            Response payload, or None if the server closed the connection
+        """
+        if not self._codec.framed:
+            return self.client_socket.recv(1024) or None
+            
+        response = self._receive_frame()
+        if response is not None and self._codec.binary:
+            return response.payload
+        return response
+        
+    def _receive_frame(self):
+        """Receive the next decoded frame: payload bytes, or a BinaryMessage in binary mode."""
+        while not self._responses:
+            data = self.client_socket.recv(65536)
+            if not data:
+                return None
+            self._responses.extend(self._codec.decode(data))
+        return self._responses.popleft()
+        
+    def request(self, opcode: int, payload: bytes = b'') -> Optional[BinaryMessage]:
+        """
+        Send one binary protocol request and wait for its response.
+        
+        Args:
+            opcode: Operation, see opcodes.OPCODE_NAMES
+            payload: Request payload
+            
+        Returns:
+            Response message, with FLAG_ERROR set in flags if the server
+            rejected the request, or None if an error occurred
+        """
+        if not self.client_socket:
+            logger.error("Not connected to server")
+            return None
+        if not self._codec.binary:
+            raise ValueError("Opcode requests require the binary protocol")
+            
+        try:
+            request_id = self._codec.next_request_id()
+            self._output.extend(self._codec.encode_message(opcode, request_id, payload))
+            self._output.flush(self.client_socket)
+            response = self._receive_frame()
+            if response is None:
+                logger.error("Server closed connection")
+            elif response.request_id != request_id:
+                logger.error(f"Response to request {response.request_id}, expected {request_id}")
+                return None
+            return response
+        except socket.timeout:
+            logger.error("Response timeout from server")
+            return None
+        except (OSError, FrameTooLargeError) as e:
+            logger.error(f"Error sending request: {e}")
+            return None
+            
+    def send_stream(self, chunks: Iterable[Union[bytes, str]],
+                    chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Stream one large message to the server, yielding the response as it arrives.
+        
+        Requires the framed protocol without compression. The message is
+        sent as chunks of at most chunk_size bytes and the server answers
+        each chunk as it is processed, so neither side holds the whole
+        message. Responses are read while sending, which keeps both peers
+        from blocking on full socket buffers.
+        
+        Example:
+            with open('big.txt', 'rb') as source, open('BIG.txt', 'wb') as target:
+                for part in client.send_stream(iter(lambda: source.read(65536), b'')):
+                    target.write(part)
+                    
+        Args:
+            chunks: Pieces of the message (any iterable, consumed lazily);
+                str pieces are UTF-8 encoded, characters may be split
+                across pieces
+            chunk_size: Largest chunk sent, at most max_frame_size
+            
+        Yields:
+            Pieces of the response; a single error message if the server
+            rejected the stream
+            
+        Raises:
+            ConnectionError: If the server closed the connection mid-stream
+            socket.timeout: If the server made no progress for timeout seconds
+        """
+        if not self.client_socket:
+            raise ConnectionError("Not connected to server")
+        if self.protocol != 'framed' or self.compression is not None:
+            raise ValueError("Streaming requires the framed protocol without compression")
+        if not 0 < chunk_size <= self.max_frame_size:
+            raise ValueError(f"chunk_size must be between 1 and {self.max_frame_size}")
+            
+        sent = 0
+        for piece in chunks:
+            if isinstance(piece, str):
+                piece = piece.encode('utf-8')
+            for start in range(0, len(piece), chunk_size):
+                self._output.extend(self._codec.encode_chunk(piece[start:start + chunk_size], False))
+                sent += 1
+                while len(self._output):
+                    self._exchange()
+                    if (yield from self._received_stream()):
+                        # Answered before the end: the server rejected the stream
+                        return
+                        
+        if not sent:
+            # An unflagged frame on its own is an ordinary message, so open the stream first
+            self._output.extend(self._codec.encode_chunk(b'', False))
+        self._output.extend(self._codec.encode_chunk(b'', True))
+        while len(self._output):
+            self._exchange()
+            if (yield from self._received_stream()):
+                return
+        logger.debug(f"Streamed {sent} chunks")
+        yield from self.recv_stream()
+        
+    def recv_stream(self) -> Iterator[bytes]:
+        """
+        Yield the pieces of a streamed response until its last chunk.
+        
+        A response sent as a single frame is yielded whole.
+        
+        Raises:
+            ConnectionError: If the server closed the connection mid-stream
+            socket.timeout: If nothing arrived for timeout seconds
+        """
+        if not self.client_socket:
+            raise ConnectionError("Not connected to server")
+        while not (yield from self._received_stream()):
+            data = self.client_socket.recv(65536)
+            if not data:
+                raise ConnectionError("Server closed connection during stream")
+            self._responses.extend(self._codec.decode(data))
+            
+    def _received_stream(self):
+        """Yield the received pieces of a streamed response; return True once it has ended."""
+        responses = self._responses
+        while responses:
+            response = responses.popleft()
+            if response.__class__ is not StreamChunk:
+                # A stream whose only chunk is the last arrives as a plain frame
+                if response:
+                    yield response
+                return True
+            if response.data:
+                yield response.data
+            if response.last:
+                return True
+        return False
+        
+    def _exchange(self):
+        """Send what the socket accepts of the queued output, and decode what it has received."""
+        sock = self.client_socket
+        if self.ssl_context is not None and sock.pending():
+            # Decrypted data waiting in the TLS layer leaves the socket unreadable for select()
+            readable, writable = True, False
+        else:
+            readable, writable, _ = select.select([sock], [sock] if len(self._output) else [], [], self.timeout)
+        if not readable and not writable:
+            raise socket.timeout("Stream stalled")
+        if readable:
+            data = sock.recv(65536)
+            if not data:
+                raise ConnectionError("Server closed connection during stream")
+            self._responses.extend(self._codec.decode(data))
+        if writable and self.ssl_context is not None:
+            # A TLS record may not fit in the free socket buffer; don't block on it
+            sock.setblocking(False)
+            try:
+                self._output.send(sock)
+            except (ssl.SSLWantWriteError, ssl.SSLWantReadError):
+                pass
+            finally:
+                sock.settimeout(self.timeout)
+        elif writable:
+            self._output.send(sock)
+            
+    def is_alive(self) -> bool:
+        """
+        Check without blocking that the connection is usable for a new request.
+        
+        A connection is unusable if the server closed it, or if it holds
+        unread data or unanswered pipelined responses, which would be
+        mistaken for the next response.
+        
+        Returns:
+            True if the connection is open and idle
+        """
+        if not self.client_socket or self._responses or len(self._output):
+            return False
+        sock = self.client_socket
+        if self.ssl_context is not None and sock.pending():
+            return False
+        try:
+            sock.setblocking(False)
+            try:
+                # TLS sockets cannot peek, so peek at the encrypted stream underneath
+                socket.socket.recv(sock, 1, socket.MSG_PEEK)
+            except BlockingIOError:
+                return True
+            finally:
+                sock.settimeout(self.timeout)
+        except OSError:
+            pass
+        return False
+        
     def disconnect(self):
         """Close connection to server."""
         if self.client_socket:
+            self._remember_session()
             try:
                 self.client_socket.close()
                 logger.info("Disconnected from server")
@@ -107,17 +656,24 @@ class SocketClient:
                 logger.error(f"Error closing connection: {e}")
             finally:
                 self.client_socket = None
+                self._codec = None
                 
-    def send_single_message(self, message: str) -> Optional[str]:
+    def send_single_message(self, message: str,
+                            pool: Optional['SocketClientPool'] = None) -> Optional[str]:
         """
         Connect, send a single message, get response, and disconnect.
         
         Args:
             message: Message to send
+            pool: Borrow a warm connection to this client's host and port
+                from the pool instead of connecting and disconnecting
             
         Returns:
             Server response or None if error occurred
         """
+        if pool is not None:
+            return pool.send_message(self.host, self.port, message)
+            
         try:
             if not self.connect():
                 return None
@@ -171,28 +727,695 @@ class SocketClient:
             self.disconnect()
 
 
+class _Endpoint:
+    """Connections of a SocketClientPool to one (host, port)."""
+    
+    __slots__ = ('idle', 'size', 'warmed', 'tls_session')
+    
+    def __init__(self):
+        self.idle: deque = deque()  # (client, time returned), most recent last
+        self.size = 0               # idle plus checked-out connections
+        self.warmed = False
+        self.tls_session: Optional[ssl.SSLSession] = None  # resumed by new connections
+
+
+class SocketClientPool:
+    """
+    Thread-safe pool of warm SocketClient connections per (host, port).
+    
+    Connections are checked out with acquire() or connection() and returned
+    with release(). Idle connections are health-checked on checkout,
+    replaced when dead, and closed after idle_timeout while the endpoint
+    has more than min_size connections. With TLS, new connections resume
+    the session of the endpoint's last returned connection.
+    """
+    
+    def __init__(self, min_size: int = 0, max_size: int = 8, idle_timeout: float = 60.0,
+                 checkout_timeout: float = 5.0, timeout: float = 5.0, protocol: str = 'text',
+                 max_frame_size: int = DEFAULT_MAX_FRAME_SIZE, ssl_context: Optional[ssl.SSLContext] = None):
+        """
+        Initialize the pool.
+        
+        Args:
+            min_size: Connections opened on first use of an endpoint and kept
+                through idle eviction
+            max_size: Most connections open to one endpoint at a time
+            idle_timeout: Seconds an idle connection is kept above min_size
+            checkout_timeout: Seconds acquire() waits for a free connection
+            timeout: Socket timeout of each connection
+            protocol: Wire protocol of each connection
+            max_frame_size: Largest frame payload in bytes
+            ssl_context: Wrap each connection in TLS with this client context
+        """
+        if max_size < 1 or not 0 <= min_size <= max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown protocol '{protocol}', expected one of {PROTOCOLS}")
+            
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.timeout = timeout
+        self.protocol = protocol
+        self.max_frame_size = max_frame_size
+        self.ssl_context = ssl_context
+        self.stats = Counter()
+        self._endpoints: Dict[Tuple[str, int], _Endpoint] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        
+    def acquire(self, host: str, port: int) -> SocketClient:
+        """
+        Check out a connected client, reusing an idle connection when possible.
+        
+        Args:
+            host: Server host address
+            port: Server port number
+            
+        Returns:
+            A connected SocketClient; give it back with release()
+            
+        Raises:
+            TimeoutError: If no connection frees up within checkout_timeout
+            ConnectionError: If a new connection cannot be established
+        """
+        key = (host, port)
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise ConnectionError("Connection pool is closed")
+                endpoint = self._endpoints.get(key)
+                if endpoint is None:
+                    endpoint = self._endpoints[key] = _Endpoint()
+                warm = not endpoint.warmed
+                endpoint.warmed = True
+                client = self._checkout(endpoint, deadline)
+                
+            if warm:
+                self._warm(key, endpoint)
+                
+            if client is None:
+                return self._connect(key, endpoint)
+            if client.is_alive():
+                self.stats['reused'] += 1
+                return client
+                
+            # Server closed it or it is out of sync: replace it
+            logger.info(f"Discarding dead pooled connection to {host}:{port}")
+            self.stats['unhealthy'] += 1
+            self._discard(endpoint, client)
+            
+    def _checkout(self, endpoint: _Endpoint, deadline: float) -> Optional[SocketClient]:
+        """
+        Take an idle client or reserve a slot for a new one; caller holds the lock.
+        
+        Returns:
+            An idle client, or None if the caller should open a new connection
+        """
+        while True:
+            self._evict_idle(endpoint)
+            if endpoint.idle:
+                return endpoint.idle.pop()[0]
+            if endpoint.size < self.max_size:
+                endpoint.size += 1
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stats['timeouts'] += 1
+                raise TimeoutError(f"No pooled connection available within {self.checkout_timeout}s")
+            self._condition.wait(remaining)
+            
+    def _connect(self, key: Tuple[str, int], endpoint: _Endpoint) -> SocketClient:
+        """Open a new connection in a slot already counted in endpoint.size."""
+        client = SocketClient(key[0], key[1], self.timeout, protocol=self.protocol,
+                              max_frame_size=self.max_frame_size, ssl_context=self.ssl_context)
+        client.tls_session = endpoint.tls_session
+        if not client.connect():
+            with self._condition:
+                endpoint.size -= 1
+                self._condition.notify()
+            raise ConnectionError(f"Could not connect to {key[0]}:{key[1]}")
+        self.stats['created'] += 1
+        if client.tls_resumed:
+            self.stats['tls_resumed'] += 1
+        return client
+        
+    def _warm(self, key: Tuple[str, int], endpoint: _Endpoint):
+        """Open connections until the endpoint has min_size of them."""
+        while True:
+            with self._condition:
+                if self._closed or endpoint.size >= self.min_size:
+                    return
+                endpoint.size += 1
+            try:
+                client = self._connect(key, endpoint)
+            except ConnectionError:
+                return
+            self.release(client)
+            
+    def _evict_idle(self, endpoint: _Endpoint):
+        """Close connections idle for longer than idle_timeout; caller holds the lock."""
+        cutoff = time.monotonic() - self.idle_timeout
+        # The oldest idle connections are at the left
+        while endpoint.idle and endpoint.idle[0][1] < cutoff and endpoint.size > self.min_size:
+            client, _ = endpoint.idle.popleft()
+            client.disconnect()
+            endpoint.size -= 1
+            self.stats['evicted'] += 1
+            
+    def _discard(self, endpoint: _Endpoint, client: SocketClient):
+        """Close a checked-out client and free its slot."""
+        client.disconnect()
+        with self._condition:
+            endpoint.size -= 1
+            self._condition.notify()
+            
+    def release(self, client: SocketClient, discard: bool = False):
+        """
+        Return a checked-out client to the pool.
+        
+        Args:
+            client: Client obtained from acquire()
+            discard: Close the connection instead of keeping it, e.g. after an error
+        """
+        with self._condition:
+            endpoint = self._endpoints.get((client.host, client.port))
+            if endpoint is None:
+                client.disconnect()
+                return
+            if client.client_socket:
+                client._remember_session()
+            if client.tls_session is not None:
+                endpoint.tls_session = client.tls_session
+            if discard or self._closed or not client.client_socket or client._responses:
+                client.disconnect()
+                endpoint.size -= 1
+                self.stats['discarded'] += 1
+            else:
+                endpoint.idle.append((client, time.monotonic()))
+            self._condition.notify()
+            
+    @contextmanager
+    def connection(self, host: str, port: int):
+        """
+        Borrow a connection for the duration of a with block.
+        
+        The connection is discarded instead of returned if the block raises.
+        
+        Example:
+            with pool.connection('localhost', 8080) as client:
+                client.send_message("hello")
+                
+        Yields:
+            A connected SocketClient
+        """
+        client = self.acquire(host, port)
+        try:
+            yield client
+        except BaseException:
+            self.release(client, discard=True)
+            raise
+        self.release(client)
+        
+    def send_message(self, host: str, port: int, message: str) -> Optional[str]:
+        """
+        Send one message on a pooled connection, reconnecting once on failure.
+        
+        Args:
+            host: Server host address
+            port: Server port number
+            message: Message to send
+            
+        Returns:
+            Server response or None if error occurred
+        """
+        for attempt in range(2):
+            try:
+                client = self.acquire(host, port)
+            except (TimeoutError, ConnectionError) as e:
+                logger.error(f"Could not get a pooled connection: {e}")
+                return None
+            response = client.send_message(message)
+            if response is not None:
+                self.release(client)
+                return response
+            # The connection may have died after its health check; retry on a new one
+            self.release(client, discard=True)
+            if attempt == 0:
+                self.stats['retries'] += 1
+        return None
+        
+    def close(self):
+        """Close every idle connection; checked-out ones are closed on release."""
+        with self._condition:
+            self._closed = True
+            for endpoint in self._endpoints.values():
+                while endpoint.idle:
+                    client, _ = endpoint.idle.pop()
+                    client.disconnect()
+                    endpoint.size -= 1
+            self._condition.notify_all()
+            
+    def __enter__(self) -> 'SocketClientPool':
+        return self
+        
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncSocketClient:
+    """
+    asyncio TCP client with the same protocol and semantics as SocketClient.
+    
+    A single event loop can drive many thousands of these concurrently,
+    where SocketClient would need one thread per connection.
+    """
+    
+    def __init__(self, host: str = 'localhost', port: int = 8080, timeout: float = 5.0,
+                 protocol: str = 'text', max_frame_size: int = DEFAULT_MAX_FRAME_SIZE,
+                 traffic_log: Optional[TrafficLog] = None,
+                 tuning: Optional[Union[str, TuningProfile]] = None):
+        """
+        Initialize the asyncio socket client.
+        
+        Args:
+            host: Server host address, or unix:///path for a Unix domain socket
+            port: Server port number, ignored for Unix domain sockets
+            timeout: Seconds allowed for each connect() and send_message()
+                call, and for each response of send_many()
+            protocol: Wire protocol, 'text', 'framed' or 'binary' (must match the server)
+            max_frame_size: Largest frame payload in bytes sent or accepted
+            traffic_log: Sample per-message logs and log periodic throughput
+                summaries instead of logging every message
+            tuning: Name of a tuning profile or a TuningProfile whose socket
+                options are set on each TCP connection
+        """
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown protocol '{protocol}', expected one of {PROTOCOLS}")
+            
+        self.host = host
+        self.port = port
+        self.unix_path = parse_unix_address(host)
+        self.timeout = timeout
+        self.protocol = protocol
+        self.max_frame_size = max_frame_size
+        self.traffic_log = traffic_log
+        self.tuning = get_profile(tuning) if tuning is not None else None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._codec = None
+        
+    @property
+    def connected(self) -> bool:
+        """True while a connection is open."""
+        return self._writer is not None
+        
+    async def connect(self) -> bool:
+        """
+        Establish connection to server.
+        
+        Returns:
+            True if connection successful, False otherwise
+        """
+        if self.unix_path is not None:
+            opening = asyncio.open_unix_connection(self.unix_path)
+        elif self.tuning is not None:
+            opening = self._open_tuned()
+        else:
+            opening = asyncio.open_connection(self.host, self.port)
+        try:
+            self._reader, self._writer = await asyncio.wait_for(opening, self.timeout)
+            self._codec = make_codec(self.protocol, self.max_frame_size)
+            logger.debug(f"Connected to server at {format_address(self.host, self.port)}")
+            return True
+            
+        except asyncio.TimeoutError:
+            logger.error(f"Connection timeout to {format_address(self.host, self.port)}")
+            return False
+        except (ConnectionRefusedError, FileNotFoundError):
+            logger.error(f"Connection refused by {format_address(self.host, self.port)}")
+            return False
+        except socket.gaierror as e:
+            logger.error(f"Name resolution error: {e}")
+            return False
+        except OSError as e:
+            logger.error(f"Connection error: {e}")
+            return False
+            
+    async def _open_tuned(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Open a TCP connection whose buffer sizes are set before connecting."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            set_buffers(sock, self.tuning)
+            sock.setblocking(False)
+            await asyncio.get_running_loop().sock_connect(sock, (self.host, self.port))
+            streams = await asyncio.open_connection(sock=sock)
+        except BaseException:
+            sock.close()
+            raise
+        # After asyncio's own TCP_NODELAY
+        tune_connection(sock, self.tuning)
+        return streams
+        
+    async def send_message(self, message: str) -> Optional[str]:
+        """
+        Send message to server and wait for response.
+        
+        Args:
+            message: Message to send to server
+            
+        Returns:
+            Server response or None if error occurred
+        """
+        if not self._writer:
+            logger.error("Not connected to server")
+            return None
+            
+        try:
+            request_data = message.encode('utf-8')
+            response_data = await asyncio.wait_for(self._exchange(request_data), self.timeout)
+            if response_data is None:
+                logger.error("Server closed connection")
+                return None
+                
+            response = response_data.decode('utf-8')
+            if self.traffic_log is None or self.traffic_log.record(
+                    (self.host, self.port), len(response_data), len(request_data)):
+                logger.info(f"Sent: {message}")
+                logger.info(f"Received: {response}")
+            return response
+            
+        except asyncio.TimeoutError:
+            logger.error("Response timeout from server")
+            return None
+        except UnicodeDecodeError as e:
+            logger.error(f"Invalid UTF-8 response from server: {e}")
+            return None
+        except (ConnectionError, OSError, FrameTooLargeError) as e:
+            logger.error(f"Error sending message: {e}")
+            return None
+            
+    async def _exchange(self, request_data: bytes) -> Optional[bytes]:
+        """Write one request and read its response payload."""
+        self._writer.writelines(self._codec.encode_parts(request_data))
+        await self._writer.drain()
+        return await self._read_payload()
+        
+    async def _read_payload(self) -> Optional[bytes]:
+        """
+        Read the next response payload.
+        
+        Returns:
+            Response payload, or None if the server closed the connection
+        """
+        if not self._codec.framed:
+            return await self._reader.read(1024) or None
+            
+        try:
+            if self._codec.binary:
+                header = await self._reader.readexactly(BINARY_HEADER.size)
+                length = BINARY_HEADER.unpack(header)[3]
+            else:
+                header = await self._reader.readexactly(FRAME_HEADER.size)
+                (length,) = FRAME_HEADER.unpack(header)
+            if length > self.max_frame_size:
+                raise FrameTooLargeError(f"Frame of {length} bytes exceeds limit of {self.max_frame_size}")
+            return await self._reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            return None
+            
+    async def send_many(self, messages: Iterable[str], window: int = 32) -> AsyncIterator[str]:
+        """
+        Pipeline messages on one connection, keeping up to window requests in flight.
+        
+        Requires the framed protocol. Each window top-up is written in one
+        batch and each response must arrive within timeout seconds.
+        
+        Args:
+            messages: Messages to send (any iterable, consumed lazily)
+            window: Maximum number of unanswered requests
+            
+        Yields:
+            Server responses in request order; iteration stops early if an
+            error occurs
+        """
+        if not self._writer:
+            logger.error("Not connected to server")
+            return
+        if not self._codec.framed:
+            raise ValueError("Pipelining requires the framed protocol")
+        if window < 1:
+            raise ValueError("window must be at least 1")
+            
+        pending_messages = iter(messages)
+        in_flight = 0
+        exhausted = False
+        
+        try:
+            while True:
+                # Top up the window with as many messages as it allows
+                parts = []
+                while not exhausted and in_flight < window:
+                    try:
+                        message = next(pending_messages)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    parts.extend(self._codec.encode_parts(message.encode('utf-8')))
+                    in_flight += 1
+                    
+                if parts:
+                    self._writer.writelines(parts)
+                    await asyncio.wait_for(self._writer.drain(), self.timeout)
+                    
+                if not in_flight:
+                    return
+                    
+                payload = await asyncio.wait_for(self._read_payload(), self.timeout)
+                if payload is None:
+                    logger.error("Server closed connection")
+                    return
+                in_flight -= 1
+                yield payload.decode('utf-8')
+                
+        except GeneratorExit:
+            # Caller stopped early: consume outstanding responses so the
+            # connection stays in sync for later requests
+            try:
+                for _ in range(in_flight):
+                    if await asyncio.wait_for(self._read_payload(), self.timeout) is None:
+                        break
+            except (asyncio.TimeoutError, OSError, FrameTooLargeError) as e:
+                logger.error(f"Error draining pipelined responses: {e}")
+            raise
+        except asyncio.TimeoutError:
+            logger.error("Response timeout from server")
+        except UnicodeDecodeError as e:
+            logger.error(f"Invalid UTF-8 response from server: {e}")
+        except (ConnectionError, OSError, FrameTooLargeError) as e:
+            logger.error(f"Error sending messages: {e}")
+            
+    async def close(self):
+        """Close connection to server."""
+        writer, self._writer, self._reader, self._codec = self._writer, None, None, None
+        if writer is None:
+            return
+        try:
+            writer.close()
+            await asyncio.wait_for(writer.wait_closed(), self.timeout)
+            logger.debug("Disconnected from server")
+        except (asyncio.TimeoutError, OSError) as e:
+            logger.error(f"Error closing connection: {e}")
+            
+    async def __aenter__(self) -> 'AsyncSocketClient':
+        if not await self.connect():
+            raise ConnectionError(f"Could not connect to {format_address(self.host, self.port)}")
+        return self
+        
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class BatchStats:
+    """Counters of a batch run over stdin."""
+    
+    __slots__ = ('sent', 'answered', 'errors', 'started')
+    
+    def __init__(self):
+        self.sent = 0
+        self.answered = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        
+    @property
+    def unanswered(self) -> int:
+        """Lines sent but not answered yet; after the run, lost to a failed connection."""
+        return self.sent - self.answered
+        
+    def summary(self, final: bool = True) -> str:
+        """Return a one-line report of throughput and error counts."""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (f"{self.answered} of {self.sent} lines answered in {elapsed:.1f}s, "
+                f"{self.answered / elapsed:.0f} lines/s, {self.errors} error responses, "
+                f"{self.unanswered} {'unanswered' if final else 'in flight'}")
+                
+                
+def run_batch(client: SocketClient, lines: Iterable[str], output, window: int = 32,
+              progress=None, interval: float = DEFAULT_SUMMARY_INTERVAL) -> BatchStats:
+    """
+    Send lines as messages over one connection and write each response as a line.
+    
+    Lines are read lazily and at most window of them are in flight, so
+    memory stays constant however long the input is. Responses are
+    written in input order, one per line, so output line N answers input
+    line N; empty lines are sent too and answered with an error.
+    
+    Args:
+        client: Connected client using the framed protocol
+        lines: Input lines, with or without line endings
+        output: Text stream receiving the responses
+        window: Maximum number of unanswered lines
+        progress: Text stream receiving a summary every interval seconds
+        interval: Seconds between progress summaries
+        
+    Returns:
+        Counters of the run; lines are left unanswered if the connection fails
+    """
+    stats = BatchStats()
+    
+    def messages():
+        for line in lines:
+            message = line.rstrip('\r\n')
+            stats.sent += 1
+            yield message
+            
+    next_report = stats.started + interval
+    for response in client.send_many(messages(), window=window):
+        output.write(response)
+        output.write('\n')
+        stats.answered += 1
+        if response.startswith('ERROR'):
+            stats.errors += 1
+        if progress is not None and time.monotonic() >= next_report:
+            progress.write(stats.summary(final=False) + '\n')
+            progress.flush()
+            next_report += interval
+    output.flush()
+    return stats
+    
+    
 def main():
     """Main entry point."""
     import argparse
     
     parser = argparse.ArgumentParser(description='TCP Socket Client')
-    parser.add_argument('--host', default='localhost', help='Server host (default: localhost)')
+    parser.add_argument('--host', default='localhost',
+                        help='Server host, or unix:///path for a Unix domain socket (default: localhost)')
     parser.add_argument('--port', type=int, default=8080, help='Server port (default: 8080)')
     parser.add_argument('--timeout', type=float, default=5.0, help='Connection timeout (default: 5.0)')
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='text',
+                        help='Wire protocol: text, 4-byte length-prefixed framed, or binary '
+                             'with opcode headers (default: text)')
+    parser.add_argument('--max-frame-size', type=int, default=DEFAULT_MAX_FRAME_SIZE,
+                        help=f'Largest frame payload in bytes (default: {DEFAULT_MAX_FRAME_SIZE})')
+    parser.add_argument('--compression', nargs='+', choices=COMPRESSION_MODES, default=None, metavar='MODE',
+                        help='Compression modes to offer the server, most preferred first: '
+                             'zlib-dict, zlib, none (framed protocol; default: no handshake)')
+    parser.add_argument('--compression-threshold', type=int, default=DEFAULT_COMPRESSION_THRESHOLD,
+                        help=f'Smallest request in bytes that is compressed (default: {DEFAULT_COMPRESSION_THRESHOLD})')
+    parser.add_argument('--compression-dict', default=None, metavar='PATH',
+                        help='File holding the preset dictionary for zlib-dict (default: built-in)')
+    parser.add_argument('--tuning', choices=TUNING_PROFILES, default=None,
+                        help='Socket tuning profile for the connection: latency, throughput or default')
+    parser.add_argument('--tls', action='store_true',
+                        help="Connect over TLS, trusting the system's certificate authorities")
+    parser.add_argument('--tls-ca', default=None, metavar='PEM',
+                        help='Connect over TLS, trusting the certificates in this file, such as a '
+                             'self-signed server certificate')
+    parser.add_argument('--tls-no-verify', action='store_true',
+                        help='Connect over TLS without checking the server certificate (testing only)')
+    parser.add_argument('--opcode', default=None,
+                        help='With --protocol binary, send the message as this operation, '
+                             'such as echo, upper or stats, or an opcode number')
     parser.add_argument('--message', '-m', help='Send single message and exit')
     parser.add_argument('--interactive', '-i', action='store_true', help='Run in interactive mode')
+    parser.add_argument('--batch', action='store_true',
+                        help='Send each line of stdin as a message over one connection and write the '
+                             'responses to stdout in order; progress goes to stderr (framed protocol)')
+    parser.add_argument('--window', type=int, default=32,
+                        help='With --batch, most lines in flight; window x line length should fit in '
+                             'the socket buffers (default: 32)')
+    parser.add_argument('--log-mode', choices=LOG_MODES, default='sync',
+                        help='sync: log on the calling thread; queue: log from a background thread; '
+                             'sampled: queue plus 1-in-N message logs and periodic summaries (default: sync)')
+    parser.add_argument('--log-sample', type=int, default=DEFAULT_SAMPLE_RATE,
+                        help=f'In sampled mode, log 1 in N messages (default: {DEFAULT_SAMPLE_RATE})')
+    parser.add_argument('--log-interval', type=float, default=DEFAULT_SUMMARY_INTERVAL,
+                        help=f'In sampled mode, seconds between throughput summaries (default: {DEFAULT_SUMMARY_INTERVAL:g})')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
     
     args = parser.parse_args()
+    if args.compression is not None and args.protocol != 'framed':
+        parser.error("--compression requires --protocol framed")
+    if args.batch and (args.protocol != 'framed' or args.window < 1):
+        parser.error("--batch requires --protocol framed and a window of at least 1")
+    opcode = None
+    if args.opcode is not None:
+        opcode = parse_opcode(args.opcode)
+        if args.protocol != 'binary' or opcode is None:
+            parser.error("--opcode requires --protocol binary and a known operation name or number")
+    compression_dict = DEFAULT_DICTIONARY
+    if args.compression_dict is not None:
+        with open(args.compression_dict, 'rb') as dict_file:
+            compression_dict = dict_file.read()
+    
+    ssl_context = None
+    if args.tls or args.tls_ca is not None or args.tls_no_verify:
+        ssl_context = client_context(args.tls_ca, verify=not args.tls_no_verify)
     
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
+    configure_logging(args.log_mode)
+    
+    traffic_log = None
+    if args.log_mode == 'sampled':
+        traffic_log = TrafficLog(args.log_sample, args.log_interval, name='Server')
+        traffic_log.start()
     
     # Create client
-    client = SocketClient(args.host, args.port, args.timeout)
+    client = SocketClient(args.host, args.port, args.timeout,
+                          protocol=args.protocol, max_frame_size=args.max_frame_size,
+                          traffic_log=traffic_log, compression=args.compression,
+                          compression_threshold=args.compression_threshold,
+                          compression_dict=compression_dict, tuning=args.tuning, ssl_context=ssl_context)
     
     try:
-        if args.message:
+        if opcode is not None:
+            # One binary request; the payload is sent as given
+            if not client.connect():
+                sys.exit(1)
+            response = client.request(opcode, (args.message or '').encode('utf-8'))
+            client.disconnect()
+            if response is None:
+                sys.exit(1)
+            print(response.payload.decode('utf-8', 'replace'))
+            sys.exit(1 if response.flags & FLAG_ERROR else 0)
+            
+        elif args.batch:
+            # Bulk mode: stdin line by line over one connection
+            if not client.connect():
+                sys.exit(1)
+            lines = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='replace')
+            try:
+                stats = run_batch(client, lines, sys.stdout, args.window, sys.stderr, args.log_interval)
+            finally:
+                client.disconnect()
+            print(stats.summary(), file=sys.stderr)
+            sys.exit(1 if stats.unanswered else 0)
+            
+        elif args.message:
             # Single message mode
             response = client.send_single_message(args.message)
             if response:
@@ -229,6 +1452,10 @@ def main():
     except Exception as e:
         logger.error(f"Client error: {e}")
         sys.exit(1)
+    finally:
+        if traffic_log:
+            traffic_log.stop()
+        stop_logging()
 
 
 if __name__ == '__main__':
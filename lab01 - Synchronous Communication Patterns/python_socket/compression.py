@@ -0,0 +1,197 @@
+"""
+Negotiated per-connection compression for the framed protocol.
+
+A client that wants compression sends a handshake as its first frame,
+listing the modes it accepts in order of preference, and waits for the
+server's choice before sending anything else:
+
+    client -> server  \\x00compress zlib-dict:1a2b3c4d zlib
+    server -> client  \\x00compress zlib-dict:1a2b3c4d
+
+- none: frames are sent unchanged
+- zlib: deflate with one compressor and decompressor per direction that
+  live as long as the connection, so later messages reuse the history of
+  earlier ones
+- zlib-dict: zlib primed with a preset dictionary shared by both sides;
+  the handshake carries the dictionary's Adler-32 so a mismatch falls
+  back to another mode instead of corrupting data
+
+Once a mode other than none is agreed, every frame payload starts with a
+flag byte: RAW for payloads below the size threshold, DEFLATED otherwise.
+A server without compression echoes the handshake in upper case, which a
+client reads as none.
+"""
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+from framing import DEFAULT_MAX_FRAME_SIZE, FRAME_HEADER, FramedCodec, FrameTooLargeError, encode_frame
+
+# Compression modes, in the server's default order of preference
+COMPRESSION_MODES = ('zlib-dict', 'zlib', 'none')
+
+# First frame of a connection negotiating compression
+HANDSHAKE = b'\x00compress '
+
+# Flag byte preceding every payload once compression is on
+RAW = b'\x00'
+DEFLATED = b'\x01'
+
+# Payloads shorter than this are not worth compressing
+DEFAULT_COMPRESSION_THRESHOLD = 512
+
+DEFAULT_COMPRESSION_LEVEL = 6
+
+# Raw deflate: the frame header already delimits messages, so skip the zlib wrapper
+WBITS = -zlib.MAX_WBITS
+
+# Preset dictionary for the text blobs the service echoes; zlib looks for
+# matches nearest the end first, so the most common strings come last
+DEFAULT_DICTIONARY = (
+    b'"timestamp": "2024-01-01T00:00:00Z", "status": "ok", "message": '
+    b'"TIMESTAMP": "STATUS": "OK", "MESSAGE": "ID": "NAME": "EMAIL": '
+    b'"id": "name": "email": "type": "value": "data": "error": null, true, false, '
+    b'which would there their about could other after first these people '
+    b'WHICH WOULD THERE THEIR ABOUT COULD OTHER AFTER FIRST THESE PEOPLE '
+    b'THE AND FOR THAT WITH THIS FROM HAVE ARE WAS NOT BUT ALL '
+    b'the and for that with this from have are was not but all '
+)
+
+
+class CorruptFrameError(ValueError):
+    """Raised when a compressed payload cannot be decompressed."""
+
+
+def dictionary_id(dictionary: bytes) -> str:
+    """Return the identifier of a preset dictionary used in handshakes."""
+    return f'{zlib.adler32(dictionary):08x}'
+
+
+class CompressingCodec(FramedCodec):
+    """
+    Framed codec that negotiates compression and keeps its streaming state.
+
+    On the server, the first frame is checked for a handshake by decode(),
+    which leaves the reply in handshake_reply. A client sends hello() and
+    decodes until mode is set; the server's reply is consumed by decode().
+    """
+
+    def __init__(self, max_frame_size: int = DEFAULT_MAX_FRAME_SIZE,
+                 modes: Sequence[str] = COMPRESSION_MODES,
+                 threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+                 dictionary: bytes = DEFAULT_DICTIONARY,
+                 level: int = DEFAULT_COMPRESSION_LEVEL):
+        """
+        Initialize the codec.
+
+        Args:
+            max_frame_size: Largest allowed payload in bytes, compressed or not
+            modes: Acceptable modes, most preferred first
+            threshold: Smallest payload in bytes that is compressed
+            dictionary: Preset dictionary for zlib-dict
+            level: zlib compression level
+        """
+        for mode in modes:
+            if mode not in COMPRESSION_MODES:
+                raise ValueError(f"Unknown compression mode '{mode}', expected one of {COMPRESSION_MODES}")
+        super().__init__(max_frame_size)
+        self.modes = tuple(modes)
+        self.threshold = threshold
+        self.dictionary = dictionary
+        self.level = level
+        # None until negotiated
+        self.mode: Optional[str] = None
+        self.handshake_reply: Optional[bytes] = None
+        self._hello_sent = False
+        self._compressor = None
+        self._decompressor = None
+
+    def _offers(self) -> List[str]:
+        """Return the handshake token of each acceptable mode."""
+        return [f'zlib-dict:{dictionary_id(self.dictionary)}' if mode == 'zlib-dict' else mode
+                for mode in self.modes]
+
+    def hello(self) -> bytes:
+        """Return the framed handshake a client sends first."""
+        self._hello_sent = True
+        return encode_frame(HANDSHAKE + ' '.join(self._offers()).encode('ascii'), self.max_frame_size)
+
+    def complete(self, reply: bytes):
+        """
+        Switch to the mode the server chose.
+
+        Args:
+            reply: Payload the server answered the handshake with
+        """
+        chosen = reply[len(HANDSHAKE):].decode('ascii', 'replace') if reply.startswith(HANDSHAKE) else 'none'
+        self._start(chosen if chosen in self._offers() else 'none')
+
+    def _start(self, token: str):
+        """Create the streaming state for a negotiated mode token."""
+        self.mode = token.split(':', 1)[0]
+        if self.mode == 'none':
+            return
+        zdict = (self.dictionary,) if self.mode == 'zlib-dict' else ()
+        self._compressor = zlib.compressobj(self.level, zlib.DEFLATED, WBITS, 8,
+                                            zlib.Z_DEFAULT_STRATEGY, *zdict)
+        self._decompressor = zlib.decompressobj(WBITS, *zdict)
+
+    def _answer(self, payload: bytes) -> bytes:
+        """Pick a mode for a client handshake and return the reply payload."""
+        offered = payload[len(HANDSHAKE):].decode('ascii', 'replace').split()
+        accepted = self._offers()
+        chosen = next((token for token in accepted if token in offered), 'none')
+        self._start(chosen)
+        return HANDSHAKE + chosen.encode('ascii')
+
+    def decode(self, data: bytes) -> List[bytes]:
+        """
+        Return the payloads of every frame completed by data, decompressed.
+
+        Raises:
+            FrameTooLargeError: If a frame, or a payload once decompressed,
+                exceeds the maximum frame size
+            CorruptFrameError: If a compressed payload is corrupt
+        """
+        payloads = self._decoder.feed(data)
+        if self.mode is None and payloads:
+            if self._hello_sent:
+                self.complete(payloads.pop(0))
+            elif payloads[0].startswith(HANDSHAKE):
+                self.handshake_reply = encode_frame(self._answer(payloads.pop(0)), self.max_frame_size)
+            else:
+                self._start('none')
+        if self._decompressor is None:
+            return payloads
+        return [self._inflate(payload) for payload in payloads]
+
+    def _inflate(self, payload: bytes) -> bytes:
+        """Strip the flag byte and decompress if needed."""
+        if payload[:1] != DEFLATED:
+            return payload[1:]
+        decompressor = self._decompressor
+        try:
+            result = decompressor.decompress(payload[1:], self.max_frame_size)
+        except zlib.error as e:
+            raise CorruptFrameError(f"Cannot decompress frame: {e}") from None
+        if decompressor.unconsumed_tail:
+            raise FrameTooLargeError(f"Decompressed frame exceeds limit of {self.max_frame_size}")
+        return result
+
+    def encode(self, payload: bytes) -> bytes:
+        """Return the payload, compressed if negotiated, with its length header."""
+        return b''.join(self.encode_parts(payload))
+
+    def encode_parts(self, payload: bytes) -> Tuple[bytes, ...]:
+        """Return the header, flag and payload as separate buffers, for scatter-gather writes."""
+        if self._compressor is None:
+            return super().encode_parts(payload)
+        if len(payload) < self.threshold:
+            if len(payload) + 1 > self.max_frame_size:
+                raise FrameTooLargeError(
+                    f"Frame of {len(payload) + 1} bytes exceeds limit of {self.max_frame_size}"
+                )
+            # Flag as its own buffer so the payload is not copied
+            return FRAME_HEADER.pack(len(payload) + 1), RAW, payload
+        compressor = self._compressor
+        body = compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        return super().encode_parts(DEFLATED + body)
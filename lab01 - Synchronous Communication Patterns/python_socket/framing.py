@@ -0,0 +1,290 @@
+"""
+Message framing for the socket protocol.
+
+Three wire protocols are supported:
+- text: every chunk returned by recv() is one message (legacy behaviour)
+- framed: every message is prefixed with a 4-byte big-endian length header,
+  so messages of any size can be pipelined on one connection
+- binary: a 10-byte header with opcode, flags, request ID and length, so one
+  connection can carry several operations (see opcodes.py)
+
+Framed messages too large to hold in memory can be streamed: every frame
+but the last has STREAM_FLAG set in its length header, and the first
+frame without it ends the stream. Peers that do not stream read the flag
+as an oversized frame and reject it.
+"""
+import struct
+from collections import namedtuple
+from typing import List, Optional, Tuple
+
+# Supported wire protocols
+PROTOCOLS = ('text', 'framed', 'binary')
+
+# 4-byte big-endian unsigned payload length
+FRAME_HEADER = struct.Struct('!I')
+
+# Largest payload accepted by default (1 MiB)
+DEFAULT_MAX_FRAME_SIZE = 1024 * 1024
+
+# High bit of the length header: a chunk of a streamed message, more follow
+STREAM_FLAG = 0x80000000
+
+# Chunk size a streamed message is split into by default (64 KiB)
+DEFAULT_STREAM_CHUNK_SIZE = 64 * 1024
+
+# One decoded chunk of a streamed message; last is set on the final chunk
+StreamChunk = namedtuple('StreamChunk', ('data', 'last'))
+
+
+class FrameTooLargeError(ValueError):
+    """Raised when a frame exceeds the configured maximum size."""
+
+
+def encode_frame(payload: bytes, max_frame_size: int = DEFAULT_MAX_FRAME_SIZE) -> bytes:
+    """
+    Prefix a payload with its length header.
+
+    Args:
+        payload: Message bytes
+        max_frame_size: Largest allowed payload in bytes
+
+    Returns:
+        Header and payload as one bytes object
+    """
+    if len(payload) > max_frame_size:
+        raise FrameTooLargeError(f"Frame of {len(payload)} bytes exceeds limit of {max_frame_size}")
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def frame_parts(payload: bytes, max_frame_size: int = DEFAULT_MAX_FRAME_SIZE) -> Tuple[bytes, bytes]:
+    """
+    Return the length header and payload as separate buffers.
+
+    Equivalent to encode_frame() without copying the payload, for writers
+    that send both buffers with one scatter-gather call.
+
+    Args:
+        payload: Message bytes
+        max_frame_size: Largest allowed payload in bytes
+
+    Returns:
+        Tuple of (header, payload)
+    """
+    if len(payload) > max_frame_size:
+        raise FrameTooLargeError(f"Frame of {len(payload)} bytes exceeds limit of {max_frame_size}")
+    return FRAME_HEADER.pack(len(payload)), payload
+
+
+def chunk_parts(payload: bytes, last: bool, max_frame_size: int = DEFAULT_MAX_FRAME_SIZE) -> Tuple[bytes, bytes]:
+    """
+    Return the length header and payload of one chunk of a streamed message.
+
+    Args:
+        payload: Chunk bytes
+        last: Whether the chunk ends the stream
+        max_frame_size: Largest allowed chunk in bytes
+
+    Returns:
+        Tuple of (header, payload)
+    """
+    if len(payload) > max_frame_size:
+        raise FrameTooLargeError(f"Chunk of {len(payload)} bytes exceeds limit of {max_frame_size}")
+    return FRAME_HEADER.pack(len(payload) if last else len(payload) | STREAM_FLAG), payload
+
+
+def utf8_boundary(data: bytes) -> int:
+    """
+    Return the length of the longest prefix of data that does not end inside a UTF-8 character.
+
+    Streamed text is cut into chunks without regard for characters; the
+    bytes after the boundary belong with the next chunk.
+    """
+    # A character is at most 4 bytes, so only the last 3 can be incomplete
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte < 0x80:
+            return len(data)
+        if byte >= 0xC0:
+            # Lead byte: its character needs 2, 3 or 4 bytes
+            needed = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return len(data) if back >= needed else len(data) - back
+    return len(data)
+
+
+class FrameDecoder:
+    """Incrementally reassembles length-prefixed frames from a byte stream."""
+
+    def __init__(self, max_frame_size: int = DEFAULT_MAX_FRAME_SIZE, max_chunk_size: Optional[int] = None):
+        """
+        Initialize the decoder.
+
+        Args:
+            max_frame_size: Largest allowed payload in bytes
+            max_chunk_size: Largest allowed chunk of a streamed message;
+                None rejects streamed messages
+        """
+        self.max_frame_size = max_frame_size
+        self.max_chunk_size = max_chunk_size
+        self._buffer = bytearray()
+        self._streaming = False
+
+    @property
+    def buffered(self) -> int:
+        """Number of received bytes not yet returned as a frame."""
+        return len(self._buffer)
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """
+        Add received bytes and return every frame completed by them.
+
+        Args:
+            data: Bytes read from the socket
+
+        Returns:
+            Payloads of the completed frames, in order; frames of a streamed
+            message are returned as StreamChunk
+
+        Raises:
+            FrameTooLargeError: If a frame header announces an oversized payload
+        """
+        buffer = self._buffer
+        buffer += data
+        frames = []
+        offset = 0
+        header_size = FRAME_HEADER.size
+
+        while len(buffer) - offset >= header_size:
+            (length,) = FRAME_HEADER.unpack_from(buffer, offset)
+            # The flag makes every chunk header look oversized
+            chunk = length > self.max_frame_size
+            if chunk:
+                length = self._chunk_length(length)
+            end = offset + header_size + length
+            if len(buffer) < end:
+                break
+            if chunk or self._streaming:
+                # Every chunk but the last is flagged
+                frames.append(StreamChunk(bytes(buffer[offset + header_size:end]), not chunk))
+                self._streaming = chunk
+            else:
+                frames.append(bytes(buffer[offset + header_size:end]))
+            offset = end
+
+        if offset:
+            del buffer[:offset]
+        return frames
+
+    def _chunk_length(self, length: int) -> int:
+        """
+        Return the payload length of an oversized header, which must belong to a chunk.
+
+        Raises:
+            FrameTooLargeError: If the header is not a chunk's, streams are
+                not accepted or the chunk is too large
+        """
+        if not length & STREAM_FLAG or self.max_chunk_size is None:
+            raise FrameTooLargeError(
+                f"Frame of {length} bytes exceeds limit of {self.max_frame_size}"
+            )
+        length &= ~STREAM_FLAG
+        if length > self.max_chunk_size:
+            raise FrameTooLargeError(f"Chunk of {length} bytes exceeds limit of {self.max_chunk_size}")
+        return length
+
+
+class TextCodec:
+    """Legacy protocol: each received chunk is one message, replies are raw bytes."""
+
+    framed = False
+    binary = False
+    # Never negotiates, so there is no handshake to answer
+    handshake_reply = None
+
+    def __init__(self, max_frame_size: int = DEFAULT_MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+
+    @property
+    def buffered(self) -> int:
+        """Always 0: text messages are never split across reads."""
+        return 0
+
+    def decode(self, data: bytes) -> List[bytes]:
+        """Return the received chunk as a single message."""
+        return [data] if data else []
+
+    def encode(self, payload: bytes) -> bytes:
+        """Return the payload unchanged."""
+        return payload
+
+    def encode_parts(self, payload: bytes) -> Tuple[bytes, ...]:
+        """Return the buffers to send for payload, for scatter-gather writes."""
+        return (payload,)
+
+
+class FramedCodec:
+    """Length-prefixed protocol with incremental reassembly."""
+
+    framed = True
+    binary = False
+    # Set by subclasses that negotiate to the frame to send before any reply
+    handshake_reply = None
+
+    def __init__(self, max_frame_size: int = DEFAULT_MAX_FRAME_SIZE, max_chunk_size: Optional[int] = None):
+        """
+        Initialize the codec.
+
+        Args:
+            max_frame_size: Largest allowed payload in bytes
+            max_chunk_size: Largest allowed chunk of a streamed message;
+                None rejects streamed messages
+        """
+        self.max_frame_size = max_frame_size
+        self._decoder = FrameDecoder(max_frame_size, max_chunk_size)
+        # Bytes of a character split across chunks of the stream being received
+        self.stream_tail = b''
+
+    @property
+    def buffered(self) -> int:
+        """Number of bytes of an incomplete frame held by the decoder."""
+        return self._decoder.buffered
+
+    def decode(self, data: bytes) -> List[bytes]:
+        """Return the payloads of every frame completed by data."""
+        return self._decoder.feed(data)
+
+    def encode(self, payload: bytes) -> bytes:
+        """Return the payload with its length header."""
+        return encode_frame(payload, self.max_frame_size)
+
+    def encode_parts(self, payload: bytes) -> Tuple[bytes, ...]:
+        """Return the header and payload as separate buffers, for scatter-gather writes."""
+        return frame_parts(payload, self.max_frame_size)
+
+    def encode_chunk(self, payload: bytes, last: bool) -> Tuple[bytes, ...]:
+        """Return the header and payload of a chunk of a streamed message."""
+        return chunk_parts(payload, last, self.max_frame_size)
+
+
+def make_codec(protocol: str = 'text', max_frame_size: int = DEFAULT_MAX_FRAME_SIZE,
+               max_chunk_size: Optional[int] = None):
+    """
+    Create the per-connection codec for a wire protocol.
+
+    Args:
+        protocol: One of PROTOCOLS
+        max_frame_size: Largest allowed payload in bytes
+        max_chunk_size: Largest allowed chunk of a streamed message on the
+            framed protocol; None rejects streamed messages
+
+    Returns:
+        A new TextCodec, FramedCodec or BinaryCodec
+    """
+    if protocol == 'text':
+        return TextCodec(max_frame_size)
+    if protocol == 'framed':
+        return FramedCodec(max_frame_size, max_chunk_size)
+    if protocol == 'binary':
+        # Imported here because opcodes builds on this module
+        from opcodes import BinaryCodec
+        return BinaryCodec(max_frame_size)
+    raise ValueError(f"Unknown protocol '{protocol}', expected one of {PROTOCOLS}")
@@ -0,0 +1,188 @@
+"""
+Zero-downtime restarts by handing the listening socket to a new process.
+
+A server started with a handoff path listens on a Unix domain socket at
+that path. A replacement process started with --takeover connects to it
+and the listening socket is passed over with SCM_RIGHTS, so the kernel
+keeps queueing connections the whole time and none are refused:
+
+    new -> old  TAKEOVER
+    old -> new  LISTENER + listening socket fd
+    new -> old  READY      (new process is about to accept)
+    old -> new  RELEASED   (old process stopped accepting, now drains)
+
+The new process then binds the handoff path itself so it can be replaced
+the same way.
+"""
+import logging
+import os
+import socket
+import threading
+from typing import Callable, Optional, Tuple
+
+from transport import remove_stale_socket
+
+logger = logging.getLogger(__name__)
+
+# send_fds()/recv_fds() need Python 3.9 and Unix domain sockets
+HAS_FD_PASSING = hasattr(socket, 'AF_UNIX') and hasattr(socket, 'send_fds')
+
+# Handshake messages
+TAKEOVER = b'TAKEOVER'
+LISTENER = b'LISTENER'
+READY = b'READY'
+RELEASED = b'RELEASED'
+
+# Seconds either side waits for the other during the handshake
+DEFAULT_HANDOFF_TIMEOUT = 5.0
+
+
+class HandoffError(Exception):
+    """Raised when the listening socket could not be handed over."""
+
+
+def take_over(path: str, timeout: float = DEFAULT_HANDOFF_TIMEOUT) -> Tuple[socket.socket, socket.socket]:
+    """
+    Receive the listening socket of the server owning a handoff path.
+
+    Args:
+        path: Handoff socket path of the running server
+        timeout: Seconds to wait for the running server
+
+    Returns:
+        Tuple of (listening socket, control connection); pass the control
+        connection to complete_takeover() once ready to accept
+
+    Raises:
+        OSError: If no server is listening on path
+        HandoffError: If the server did not send its listening socket
+    """
+    control = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    control.settimeout(timeout)
+    try:
+        control.connect(path)
+        control.sendall(TAKEOVER)
+        message, fds, _, _ = socket.recv_fds(control, 64, 1)
+        if message != LISTENER or len(fds) != 1:
+            for fd in fds:
+                os.close(fd)
+            raise HandoffError(f"Unexpected handoff reply {message!r}")
+        return socket.socket(fileno=fds[0]), control
+    except BaseException:
+        control.close()
+        raise
+
+
+def complete_takeover(control: socket.socket):
+    """
+    Tell the old server to stop accepting and wait until it has.
+
+    Args:
+        control: Control connection returned by take_over()
+
+    Raises:
+        HandoffError: If the old server did not confirm
+    """
+    with control:
+        control.sendall(READY)
+        reply = control.recv(64)
+    if reply != RELEASED:
+        raise HandoffError(f"Unexpected handoff reply {reply!r}")
+
+
+class HandoffListener:
+    """Serves takeover requests on a Unix domain socket from a background thread."""
+
+    def __init__(self, path: str, listener_fd: Callable[[], int], on_handoff: Callable[[], None],
+                 timeout: float = DEFAULT_HANDOFF_TIMEOUT):
+        """
+        Initialize the listener.
+
+        Args:
+            path: Filesystem path of the Unix domain socket
+            listener_fd: Returns the file descriptor of the listening socket
+            on_handoff: Called once the new process is ready; must stop
+                accepting connections without closing the shared socket
+            timeout: Seconds to wait for the new process during a handshake
+        """
+        self.path = path
+        self.listener_fd = listener_fd
+        self.on_handoff = on_handoff
+        self.timeout = timeout
+        self.handed_off = False
+        self._sock: Optional[socket.socket] = None
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Bind the handoff path, replacing a stale socket file, and start serving."""
+        try:
+            remove_stale_socket(self.path)
+        except OSError as e:
+            raise HandoffError(e.strerror) from None
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self._sock.listen(1)
+        # Poll so close() is noticed; closing does not interrupt accept()
+        self._sock.settimeout(0.5)
+        self._thread = threading.Thread(target=self._run, name='handoff-listener', daemon=True)
+        self._thread.start()
+        logger.info(f"Accepting takeover requests on {self.path}")
+
+    def close(self):
+        """Stop serving and remove the socket file unless it now belongs to the new process."""
+        self._closed.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            if not self.handed_off:
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
+
+    def _run(self):
+        """Accept takeover requests until one succeeds or close() is called."""
+        while not self._closed.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            with conn:
+                try:
+                    if self._serve(conn):
+                        return
+                except (OSError, HandoffError) as e:
+                    logger.warning(f"Takeover attempt failed, still serving: {e}")
+
+    def _serve(self, conn: socket.socket) -> bool:
+        """
+        Run one takeover handshake.
+
+        Args:
+            conn: Connection from the new process
+
+        Returns:
+            True if the listening socket was handed over
+        """
+        conn.settimeout(self.timeout)
+        if conn.recv(64) != TAKEOVER:
+            raise HandoffError("Unexpected takeover request")
+        socket.send_fds(conn, [LISTENER], [self.listener_fd()])
+        if conn.recv(64) != READY:
+            raise HandoffError("New process did not confirm the takeover")
+
+        logger.info("Listening socket handed over, draining connections")
+        self.handed_off = True
+        self.on_handoff()
+        # Free the path for the new process before confirming
+        self._sock.close()
+        conn.sendall(RELEASED)
+        return True
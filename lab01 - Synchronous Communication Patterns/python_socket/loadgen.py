@@ -0,0 +1,359 @@
+"""
+Load generator for the socket service.
+
+Opens N connections from one asyncio event loop and sends messages with a
+configurable payload size distribution, either closed-loop (each connection
+sends its next message as soon as the previous response arrives) or
+open-loop at a fixed aggregate rate. In open-loop mode latency is measured
+from the time a message was scheduled, not from when it was actually sent,
+so a slow server cannot hide its queueing delay.
+
+Usage:
+    python loadgen.py --connections 100 --messages 1000
+    python loadgen.py --connections 50 --duration 30 --rate 5000 --payload uniform:16:4096
+    python loadgen.py --protocol framed --payload choice:64,1024,65536 --json
+"""
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Add the loadgen directory to the path so sibling modules import as packages too
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from client import AsyncSocketClient
+from framing import DEFAULT_MAX_FRAME_SIZE, PROTOCOLS
+from transport import format_address
+from tuning import TUNING_PROFILES
+
+# Percentiles included in every report
+REPORT_PERCENTILES = (('p50', 0.50), ('p90', 0.90), ('p99', 0.99), ('p99.9', 0.999))
+
+logger = logging.getLogger(__name__)
+
+
+def parse_payload_spec(spec: str) -> Callable[[random.Random], int]:
+    """
+    Parse a payload size distribution.
+
+    Supported forms:
+        64                 fixed size
+        uniform:MIN:MAX    uniform between MIN and MAX bytes
+        exp:MEAN[:MAX]     exponential with the given mean, capped at MAX
+        choice:A,B,...     one of the listed sizes with equal probability
+
+    Args:
+        spec: Distribution specification
+
+    Returns:
+        Function drawing a size from a random.Random instance
+
+    Raises:
+        ValueError: If the specification is malformed
+    """
+    kind, _, rest = spec.partition(':')
+    try:
+        if not rest:
+            size = int(kind)
+            if size < 1:
+                raise ValueError
+            return lambda rng: size
+        if kind == 'uniform':
+            low, high = (int(v) for v in rest.split(':'))
+            if not 1 <= low <= high:
+                raise ValueError
+            return lambda rng: rng.randint(low, high)
+        if kind == 'exp':
+            values = [float(v) for v in rest.split(':')]
+            mean = values[0]
+            cap = int(values[1]) if len(values) > 1 else DEFAULT_MAX_FRAME_SIZE
+            if mean <= 0 or len(values) > 2:
+                raise ValueError
+            return lambda rng: max(1, min(cap, int(rng.expovariate(1.0 / mean))))
+        if kind == 'choice':
+            sizes = [int(v) for v in rest.split(',')]
+            if not sizes or min(sizes) < 1:
+                raise ValueError
+            return lambda rng: rng.choice(sizes)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid payload distribution '{spec}'")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Return the given percentile (0..1) of an already sorted list, None if empty."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class LoadGenerator:
+    """Drives a configurable request load and collects latency samples."""
+
+    def __init__(self, host: str = 'localhost', port: int = 8080, connections: int = 1,
+                 messages: Optional[int] = None, duration: Optional[float] = None,
+                 rate: Optional[float] = None, payload: str = '64', protocol: str = 'text',
+                 timeout: float = 5.0, connect_concurrency: int = 256, seed: Optional[int] = None,
+                 tuning: Optional[str] = None):
+        """
+        Initialize the load generator.
+
+        Args:
+            host: Server host address, or unix:///path for a Unix domain socket
+            port: Server port number, ignored for Unix domain sockets
+            connections: Concurrent connections
+            messages: Messages per connection (unlimited if None and a
+                duration is given; 1000 if neither is given)
+            duration: Stop after this many seconds
+            rate: Aggregate open-loop rate in messages/sec; None for closed loop
+            payload: Payload size distribution, see parse_payload_spec()
+            protocol: Wire protocol, 'text' or 'framed'
+            timeout: Per-call timeout of each connection
+            connect_concurrency: Handshakes in progress at once
+            seed: Seed for payload sizes, for reproducible runs
+            tuning: Socket tuning profile of every connection
+        """
+        if connections < 1:
+            raise ValueError("connections must be at least 1")
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown protocol '{protocol}', expected one of {PROTOCOLS}")
+        if messages is None and duration is None:
+            messages = 1000
+
+        self.host = host
+        self.port = port
+        self.connections = connections
+        self.messages = messages
+        self.duration = duration
+        self.rate = rate
+        self.payload = payload
+        self.protocol = protocol
+        self.timeout = timeout
+        self.connect_concurrency = connect_concurrency
+        self.seed = seed
+        self.tuning = tuning
+        self._draw_size = parse_payload_spec(payload)
+        self._payloads: Dict[int, str] = {}
+
+        self.latencies: List[float] = []
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.errors = 0
+
+    def _payload(self, size: int) -> str:
+        """Return a cached ASCII payload of the given size."""
+        payload = self._payloads.get(size)
+        if payload is None:
+            payload = self._payloads[size] = 'x' * size
+        return payload
+
+    async def _connect(self, client: AsyncSocketClient, gate: asyncio.Semaphore) -> bool:
+        """Connect one client, bounded by the handshake gate."""
+        async with gate:
+            return await client.connect()
+
+    async def _drive(self, client: AsyncSocketClient, index: int, deadline: Optional[float]):
+        """
+        Send messages on one connection until its budget or the deadline runs out.
+
+        Args:
+            client: Connected client
+            index: Connection number, used to stagger open-loop schedules
+            deadline: perf_counter() time to stop at, or None
+        """
+        rng = random.Random(None if self.seed is None else self.seed + index)
+        interval = self.connections / self.rate if self.rate else 0.0
+        next_send = time.perf_counter() + interval * index / self.connections
+        sent = 0
+
+        while self.messages is None or sent < self.messages:
+            if self.rate:
+                # Open loop: wait for the scheduled slot, then measure from it
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                start = next_send
+                next_send += interval
+            else:
+                start = time.perf_counter()
+            if deadline is not None and start >= deadline:
+                break
+
+            payload = self._payload(self._draw_size(rng))
+            response = await client.send_message(payload)
+            sent += 1
+            if response != payload.upper():
+                self.errors += 1
+                if response is None:
+                    # The connection is no longer usable
+                    break
+                continue
+            self.latencies.append(time.perf_counter() - start)
+            self.bytes_sent += len(payload)
+            self.bytes_received += len(response)
+
+    async def run(self) -> dict:
+        """
+        Run the load and return the report.
+
+        Returns:
+            Report dictionary, see report()
+        """
+        clients = [
+            AsyncSocketClient(self.host, self.port, timeout=self.timeout,
+                              protocol=self.protocol, max_frame_size=DEFAULT_MAX_FRAME_SIZE,
+                              tuning=self.tuning)
+            for _ in range(self.connections)
+        ]
+        gate = asyncio.Semaphore(self.connect_concurrency)
+        connected = await asyncio.gather(*(self._connect(client, gate) for client in clients))
+        active = [client for client, ok in zip(clients, connected) if ok]
+
+        start = time.perf_counter()
+        deadline = start + self.duration if self.duration is not None else None
+        try:
+            await asyncio.gather(*(self._drive(client, i, deadline) for i, client in enumerate(active)))
+        finally:
+            elapsed = time.perf_counter() - start
+            await asyncio.gather(*(client.close() for client in active))
+        return self.report(len(active), elapsed)
+
+    def report(self, connected: int, elapsed: float) -> dict:
+        """
+        Summarize the collected samples.
+
+        Args:
+            connected: Connections that were established
+            elapsed: Wall-clock seconds of the measured phase
+
+        Returns:
+            JSON-serializable report
+        """
+        ordered = sorted(self.latencies)
+        elapsed = max(elapsed, 1e-9)
+        latency_ms = {name: percentile(ordered, fraction) for name, fraction in REPORT_PERCENTILES}
+        latency_ms['mean'] = sum(ordered) / len(ordered) if ordered else None
+        latency_ms['max'] = percentile(ordered, 1.0)
+        latency_ms = {name: None if value is None else value * 1000 for name, value in latency_ms.items()}
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'config': {
+                'host': self.host,
+                'port': self.port,
+                'protocol': self.protocol,
+                'connections': self.connections,
+                'messages': self.messages,
+                'duration': self.duration,
+                'rate': self.rate,
+                'mode': 'open-loop' if self.rate else 'closed-loop',
+                'payload': self.payload,
+                'tuning': self.tuning,
+            },
+            'connected': connected,
+            'elapsed_s': elapsed,
+            'messages': len(ordered),
+            'errors': self.errors,
+            'messages_per_sec': len(ordered) / elapsed,
+            'bytes_per_sec': (self.bytes_sent + self.bytes_received) / elapsed,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'latency_ms': latency_ms,
+        }
+
+
+def format_report(report: dict) -> str:
+    """Render a report as human-readable text."""
+    config = report['config']
+    latency = report['latency_ms']
+    lines = [
+        f"Target:      {format_address(config['host'], config['port'])} ({config['protocol']}, {config['mode']})",
+        f"Connections: {report['connected']}/{config['connections']}",
+        f"Payload:     {config['payload']}",
+        f"Messages:    {report['messages']} in {report['elapsed_s']:.2f}s, {report['errors']} errors",
+        f"Throughput:  {report['messages_per_sec']:.0f} msg/s, {report['bytes_per_sec'] / 1e6:.2f} MB/s",
+        "Latency ms:  " + "  ".join(f"{name} {'n/a' if value is None else format(value, '.3f')}"
+                                   for name, value in latency.items()),
+    ]
+    return "\n".join(lines)
+
+
+def main():
+    """Main entry point."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Load generator for the socket service')
+    parser.add_argument('--host', default='localhost',
+                        help='Server host, or unix:///path for a Unix domain socket (default: localhost)')
+    parser.add_argument('--port', type=int, default=8080, help='Server port (default: 8080)')
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='text',
+                        help='Wire protocol (default: text)')
+    parser.add_argument('--connections', '-c', type=int, default=1,
+                        help='Concurrent connections (default: 1)')
+    parser.add_argument('--messages', '-n', type=int, default=None,
+                        help='Messages per connection (default: 1000, unlimited with --duration)')
+    parser.add_argument('--duration', '-d', type=float, default=None,
+                        help='Stop after this many seconds')
+    parser.add_argument('--rate', '-r', type=float, default=None,
+                        help='Open-loop aggregate rate in messages/sec (default: closed loop)')
+    parser.add_argument('--payload', '-p', default='64',
+                        help='Payload size: N, uniform:MIN:MAX, exp:MEAN[:MAX] or choice:A,B,... '
+                             '(default: 64; the text protocol carries at most 1024 bytes per message)')
+    parser.add_argument('--timeout', type=float, default=5.0, help='Per-call timeout (default: 5.0)')
+    parser.add_argument('--connect-concurrency', type=int, default=256,
+                        help='Handshakes in progress at once (default: 256)')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for payload sizes')
+    parser.add_argument('--tuning', choices=TUNING_PROFILES, default=None,
+                        help='Socket tuning profile of every connection (default: none)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--output', '-o', help='Also write the JSON report to this file')
+
+    args = parser.parse_args()
+
+    # Per-message client logging would dominate the measurement
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger('client').setLevel(logging.WARNING)
+
+    try:
+        generator = LoadGenerator(
+            args.host, args.port, connections=args.connections, messages=args.messages,
+            duration=args.duration, rate=args.rate, payload=args.payload, protocol=args.protocol,
+            timeout=args.timeout, connect_concurrency=args.connect_concurrency, seed=args.seed,
+            tuning=args.tuning
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    if resource is not None:
+        # Every connection needs a file descriptor
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    try:
+        report = asyncio.run(generator.run())
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    sys.exit(0 if report['connected'] and not report['errors'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""
+Logging modes for the socket server and client.
+
+- sync: every record is formatted and written on the calling thread
+  (the original behaviour)
+- queue: records are put on a queue by a QueueHandler and formatted and
+  written by a QueueListener thread, so request threads never block on I/O
+- sampled: queue mode, and per-message logs are sampled 1 in N per
+  connection and complemented by periodic per-client throughput summaries
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+# Supported logging modes
+LOG_MODES = ('sync', 'queue', 'sampled')
+
+# Format shared by the server and client
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Defaults for sampled mode
+DEFAULT_SAMPLE_RATE = 100
+DEFAULT_SUMMARY_INTERVAL = 10.0
+
+logger = logging.getLogger(__name__)
+
+# Listener of the active queue mode, if any
+_listener: Optional[QueueListener] = None
+_fork_hook_installed = False
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats the whole record (timestamp included) before
+    queueing it. Here only the message arguments are merged, which is
+    needed because they may change after the call returns.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks reference frames, render them while they exist
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(mode: str = 'sync'):
+    """
+    Switch the root logger to a logging mode.
+
+    In queue and sampled modes the handlers already installed on the root
+    logger (or a stderr handler) are moved behind a QueueListener.
+
+    Args:
+        mode: One of LOG_MODES
+    """
+    global _listener, _fork_hook_installed
+
+    if mode not in LOG_MODES:
+        raise ValueError(f"Unknown log mode '{mode}', expected one of {LOG_MODES}")
+    if mode == 'sync' or _listener is not None:
+        return
+
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    if not handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers = [handler]
+    for handler in handlers:
+        root.removeHandler(handler)
+
+    records = queue.SimpleQueue()
+    root.addHandler(DeferredQueueHandler(records))
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    if not _fork_hook_installed and hasattr(os, 'register_at_fork'):
+        # A forked child inherits the queue but not the listener thread
+        os.register_at_fork(after_in_child=_restart_listener)
+        _fork_hook_installed = True
+
+
+def _restart_listener():
+    """Start a fresh listener thread in a forked child."""
+    global _listener
+    if _listener is not None:
+        _listener = QueueListener(_listener.queue, *_listener.handlers,
+                                  respect_handler_level=_listener.respect_handler_level)
+        _listener.start()
+
+
+def stop_logging():
+    """Flush queued records, stop the listener thread and return to sync mode."""
+    global _listener
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, DeferredQueueHandler):
+            root.removeHandler(handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
+
+
+class TrafficLog:
+    """
+    Per-connection message sampling and periodic throughput summaries.
+
+    Each connection is only recorded from the thread or event loop serving
+    it, so counters are updated without a lock; the summary thread only
+    reads them and keeps its own copy of the previously reported totals.
+    """
+
+    def __init__(self, sample_rate: int = DEFAULT_SAMPLE_RATE,
+                 interval: float = DEFAULT_SUMMARY_INTERVAL, name: str = 'Peer'):
+        """
+        Initialize the traffic log.
+
+        Args:
+            sample_rate: Log 1 in this many messages of each connection
+            interval: Seconds between throughput summaries
+            name: Label for the peer in per-connection summary lines
+        """
+        if sample_rate < 1:
+            raise ValueError("sample_rate must be at least 1")
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.name = name
+        # address -> [messages, bytes in, bytes out]
+        self._clients: Dict[object, List[int]] = {}
+        self._reported: Dict[object, tuple] = {}
+        self._closed: List[object] = []
+        self._last_summary = time.monotonic()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, address, bytes_in: int, bytes_out: int) -> bool:
+        """
+        Count one message of a connection.
+
+        Args:
+            address: Peer address identifying the connection
+            bytes_in: Request payload size
+            bytes_out: Response payload size
+
+        Returns:
+            True if this message should be logged
+        """
+        counts = self._clients.get(address)
+        if counts is None:
+            counts = self._clients[address] = [0, 0, 0]
+        counts[0] += 1
+        counts[1] += bytes_in
+        counts[2] += bytes_out
+        return (counts[0] - 1) % self.sample_rate == 0
+
+    def forget(self, address):
+        """
+        Mark a connection as closed; it is dropped after its final summary.
+
+        Args:
+            address: Peer address identifying the connection
+        """
+        self._closed.append(address)
+
+    def summary(self):
+        """Log messages/sec and bytes/sec per client since the previous summary."""
+        now = time.monotonic()
+        elapsed = max(now - self._last_summary, 1e-9)
+        self._last_summary = now
+        closed, self._closed = self._closed, []
+
+        totals = [0, 0, 0]
+        active = 0
+        for address, counts in list(self._clients.items()):
+            current = tuple(counts)
+            previous = self._reported.get(address, (0, 0, 0))
+            delta = [c - p for c, p in zip(current, previous)]
+            self._reported[address] = current
+            if delta[0]:
+                active += 1
+                totals = [t + d for t, d in zip(totals, delta)]
+                logger.info(f"{self.name} {address}: {delta[0] / elapsed:.1f} msg/s, "
+                            f"{delta[1] / elapsed:.0f} B/s in, {delta[2] / elapsed:.0f} B/s out")
+
+        for address in closed:
+            self._clients.pop(address, None)
+            self._reported.pop(address, None)
+
+        if active:
+            logger.info(f"Traffic summary: {active} active connections, "
+                        f"{totals[0] / elapsed:.1f} msg/s, {totals[1] / elapsed:.0f} B/s in, "
+                        f"{totals[2] / elapsed:.0f} B/s out")
+
+    def start(self):
+        """Start the periodic summary thread."""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._last_summary = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='traffic-summary', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the summary thread and log a final summary."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self.summary()
+
+    def _run(self):
+        """Summary thread body."""
+        while not self._stop_event.wait(self.interval):
+            self.summary()
@@ -0,0 +1,341 @@
+"""
+Binary multi-opcode protocol.
+
+Every message starts with a fixed 10-byte header:
+
+    opcode      1 byte   operation, see OPCODE_NAMES
+    flags       1 byte   FLAG_RESPONSE, FLAG_ERROR
+    request_id  4 bytes  chosen by the client, echoed in the response
+    length      4 bytes  payload length
+
+all big-endian. Headers are parsed with precompiled struct.Struct objects
+and payloads are handed to handlers as bytes, so nothing on the dispatch
+path decodes text. Handlers are registered per opcode on an OpcodeRouter,
+so one connection can mix operations; responses come back in request order.
+
+User records are packed as USER_RECORD (id, name length, email length)
+followed by the UTF-8 name and email.
+"""
+import logging
+import struct
+import threading
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+from framing import DEFAULT_MAX_FRAME_SIZE, FrameTooLargeError
+
+logger = logging.getLogger(__name__)
+
+# opcode, flags, request_id, payload length
+BINARY_HEADER = struct.Struct('!BBII')
+
+# Built-in operations
+OP_ECHO = 0x01
+OP_UPPER = 0x02
+OP_STATS = 0x03
+OP_USER_CREATE = 0x10
+OP_USER_GET = 0x11
+OP_USER_UPDATE = 0x12
+OP_USER_DELETE = 0x13
+OP_USER_LIST = 0x14
+
+OPCODE_NAMES = {
+    OP_ECHO: 'echo',
+    OP_UPPER: 'upper',
+    OP_STATS: 'stats',
+    OP_USER_CREATE: 'user_create',
+    OP_USER_GET: 'user_get',
+    OP_USER_UPDATE: 'user_update',
+    OP_USER_DELETE: 'user_delete',
+    OP_USER_LIST: 'user_list',
+}
+
+# Header flags
+FLAG_RESPONSE = 0x01
+FLAG_ERROR = 0x02
+
+# id, name length, email length
+USER_RECORD = struct.Struct('!IHH')
+USER_ID = struct.Struct('!I')
+
+BinaryMessage = namedtuple('BinaryMessage', ('opcode', 'flags', 'request_id', 'payload'))
+
+
+class OpcodeError(Exception):
+    """Raised by handlers to answer a request with an error response."""
+
+
+class BinaryCodec:
+    """Binary protocol codec with incremental reassembly."""
+
+    framed = True
+    binary = True
+    handshake_reply = None
+
+    def __init__(self, max_frame_size: int = DEFAULT_MAX_FRAME_SIZE, reply: bool = False):
+        """
+        Initialize the codec.
+
+        Args:
+            max_frame_size: Largest allowed payload in bytes
+            reply: Encode bare payloads as error responses to request 0
+                (server side, for connection-level errors) instead of as
+                upper requests (client side)
+        """
+        self.max_frame_size = max_frame_size
+        self.reply = reply
+        self._buffer = bytearray()
+        self._next_id = 0
+
+    @property
+    def buffered(self) -> int:
+        """Number of received bytes not yet returned as a message."""
+        return len(self._buffer)
+
+    def decode(self, data: bytes) -> List[BinaryMessage]:
+        """
+        Add received bytes and return every message completed by them.
+
+        Raises:
+            FrameTooLargeError: If a header announces an oversized payload
+        """
+        buffer = self._buffer
+        buffer += data
+        messages = []
+        offset = 0
+        header_size = BINARY_HEADER.size
+        unpack_from = BINARY_HEADER.unpack_from
+        # Skips the Python-level namedtuple __new__
+        new_message = tuple.__new__
+
+        while len(buffer) - offset >= header_size:
+            opcode, flags, request_id, length = unpack_from(buffer, offset)
+            if length > self.max_frame_size:
+                raise FrameTooLargeError(f"Frame of {length} bytes exceeds limit of {self.max_frame_size}")
+            end = offset + header_size + length
+            if len(buffer) < end:
+                break
+            messages.append(new_message(BinaryMessage, (opcode, flags, request_id,
+                                                        bytes(buffer[offset + header_size:end]))))
+            offset = end
+
+        if offset:
+            del buffer[:offset]
+        return messages
+
+    def next_request_id(self) -> int:
+        """Return a new request ID for this connection."""
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        return self._next_id
+
+    def encode_message(self, opcode: int, request_id: int, payload: bytes, flags: int = 0) -> Tuple[bytes, bytes]:
+        """
+        Return the header and payload of a message as separate buffers.
+
+        Args:
+            opcode: Operation
+            request_id: Request the message belongs to
+            payload: Message bytes
+            flags: Header flags
+
+        Returns:
+            Tuple of (header, payload)
+        """
+        if len(payload) > self.max_frame_size:
+            raise FrameTooLargeError(f"Frame of {len(payload)} bytes exceeds limit of {self.max_frame_size}")
+        return BINARY_HEADER.pack(opcode, flags, request_id, len(payload)), payload
+
+    def encode_parts(self, payload: bytes) -> Tuple[bytes, bytes]:
+        """Return the buffers to send for a bare payload, see reply."""
+        if self.reply:
+            return self.encode_message(0, 0, payload, FLAG_RESPONSE | FLAG_ERROR)
+        return self.encode_message(OP_UPPER, self.next_request_id(), payload)
+
+    def encode(self, payload: bytes) -> bytes:
+        """Return a bare payload with its header, see reply."""
+        return b''.join(self.encode_parts(payload))
+
+
+Handler = Callable[[bytes], bytes]
+
+
+class OpcodeRouter:
+    """Maps opcodes to handlers taking a request payload and returning the response payload."""
+
+    def __init__(self):
+        self._handlers: Dict[int, Handler] = {}
+
+    def register(self, opcode: int, handler: Handler):
+        """
+        Route an opcode to a handler, replacing any previous one.
+
+        Args:
+            opcode: Operation, 0-255
+            handler: Called with the request payload; raise OpcodeError to
+                send an error response
+        """
+        if not 0 <= opcode <= 0xFF:
+            raise ValueError(f"Opcode {opcode} does not fit in one byte")
+        self._handlers[opcode] = handler
+
+    def __contains__(self, opcode: int) -> bool:
+        return opcode in self._handlers
+
+    def dispatch(self, opcode: int, payload: bytes) -> Tuple[int, bytes]:
+        """
+        Run the handler of an opcode.
+
+        Args:
+            opcode: Operation
+            payload: Request payload
+
+        Returns:
+            Tuple of (response flags, response payload)
+        """
+        handler = self._handlers.get(opcode)
+        if handler is None:
+            return FLAG_RESPONSE | FLAG_ERROR, f"ERROR: Unknown opcode {opcode}".encode('ascii')
+        try:
+            return FLAG_RESPONSE, handler(payload)
+        except OpcodeError as e:
+            return FLAG_RESPONSE | FLAG_ERROR, f"ERROR: {e}".encode('utf-8')
+        except Exception as e:
+            logger.error(f"Handler for opcode {opcode} failed: {e}")
+            return FLAG_RESPONSE | FLAG_ERROR, b"ERROR: Internal error"
+
+
+def upper(payload: bytes) -> bytes:
+    """Uppercase UTF-8 text, staying in bytes for ASCII payloads."""
+    if payload.isascii():
+        return payload.upper()
+    try:
+        return payload.decode('utf-8').upper().encode('utf-8')
+    except UnicodeDecodeError:
+        raise OpcodeError("Invalid UTF-8 encoding") from None
+
+
+def pack_user(user_id: int, name: bytes, email: bytes) -> bytes:
+    """Return a packed user record."""
+    return USER_RECORD.pack(user_id, len(name), len(email)) + name + email
+
+
+def unpack_user(buffer: bytes, offset: int = 0) -> Tuple[int, bytes, bytes, int]:
+    """
+    Read a packed user record.
+
+    Args:
+        buffer: Bytes holding the record
+        offset: Position of the record
+
+    Returns:
+        Tuple of (id, name, email, offset after the record)
+
+    Raises:
+        OpcodeError: If the record is truncated
+    """
+    if len(buffer) - offset < USER_RECORD.size:
+        raise OpcodeError("Truncated user record")
+    user_id, name_length, email_length = USER_RECORD.unpack_from(buffer, offset)
+    start = offset + USER_RECORD.size
+    end = start + name_length + email_length
+    if len(buffer) < end:
+        raise OpcodeError("Truncated user record")
+    return user_id, bytes(buffer[start:start + name_length]), bytes(buffer[start + name_length:end]), end
+
+
+def unpack_users(buffer: bytes) -> List[Tuple[int, bytes, bytes]]:
+    """Read every packed user record of a user_list response."""
+    users = []
+    offset = 0
+    while offset < len(buffer):
+        user_id, name, email, offset = unpack_user(buffer, offset)
+        users.append((user_id, name, email))
+    return users
+
+
+class UserStore:
+    """In-memory users (id, name, email) behind the user_* opcodes; safe to share between threads."""
+
+    def __init__(self):
+        self._users: Dict[int, Tuple[bytes, bytes]] = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def handlers(self) -> Dict[int, Handler]:
+        """Return the handler of each user opcode."""
+        return {
+            OP_USER_CREATE: self.create,
+            OP_USER_GET: self.get,
+            OP_USER_UPDATE: self.update,
+            OP_USER_DELETE: self.delete,
+            OP_USER_LIST: self.list,
+        }
+
+    def _user_id(self, payload: bytes) -> int:
+        """Read the user ID a get or delete request consists of."""
+        if len(payload) != USER_ID.size:
+            raise OpcodeError("Expected a 4-byte user id")
+        return USER_ID.unpack(payload)[0]
+
+    def create(self, payload: bytes) -> bytes:
+        """Add a user from a record whose id is ignored; returns the record with its new id."""
+        _, name, email, _ = unpack_user(payload)
+        if not name or not email:
+            raise OpcodeError("Name and email are required")
+        with self._lock:
+            user_id = self._next_id
+            self._next_id += 1
+            self._users[user_id] = (name, email)
+        return pack_user(user_id, name, email)
+
+    def get(self, payload: bytes) -> bytes:
+        """Return the record of a user id."""
+        user_id = self._user_id(payload)
+        user = self._users.get(user_id)
+        if user is None:
+            raise OpcodeError(f"User {user_id} not found")
+        return pack_user(user_id, *user)
+
+    def update(self, payload: bytes) -> bytes:
+        """Replace the non-empty fields of a record; returns the updated record."""
+        user_id, name, email, _ = unpack_user(payload)
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                raise OpcodeError(f"User {user_id} not found")
+            user = (name or user[0], email or user[1])
+            self._users[user_id] = user
+        return pack_user(user_id, *user)
+
+    def delete(self, payload: bytes) -> bytes:
+        """Remove a user id; returns an empty payload."""
+        user_id = self._user_id(payload)
+        with self._lock:
+            if self._users.pop(user_id, None) is None:
+                raise OpcodeError(f"User {user_id} not found")
+        return b''
+
+    def list(self, payload: bytes) -> bytes:
+        """Return every user record, ordered by id."""
+        with self._lock:
+            users = sorted(self._users.items())
+        return b''.join(pack_user(user_id, name, email) for user_id, (name, email) in users)
+
+
+def opcode_name(opcode: int) -> str:
+    """Return the name of an opcode for logging."""
+    return OPCODE_NAMES.get(opcode, f'0x{opcode:02x}')
+
+
+def parse_opcode(value: str) -> Optional[int]:
+    """Return the opcode for a name or number, or None if unknown."""
+    for opcode, name in OPCODE_NAMES.items():
+        if name == value:
+            return opcode
+    try:
+        return int(value, 0)
+    except ValueError:
+        return None
@@ -0,0 +1,232 @@
+"""
+Per-client rate limits.
+
+A connection can be held to a message rate and a byte rate, and so can
+all connections from one source IP together. Each limit is a token bucket
+that may go into debt: a read is processed in full, its messages and
+bytes are charged afterwards, and the connection is not read again until
+every bucket it draws from is out of debt. Over-limit clients are slowed
+down, never dropped. While the server does not read, the socket's receive
+buffer fills up and TCP flow control stalls the client.
+
+Unix domain socket clients have no IP address and share one source
+bucket, keyed 'unix'.
+
+An IP whose last connection closes in debt keeps its buckets until they
+are full again; open() and close() sweep such IPs every SWEEP_INTERVAL.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Seconds between sweeps for IPs without connections whose buckets have refilled
+SWEEP_INTERVAL = 1.0
+
+
+class TokenBucket:
+    """Tokens refilled at a fixed rate up to a burst size; charges may overdraw it."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float, now: float):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate: Tokens added per second
+            burst: Most tokens the bucket holds
+            now: Current time of the limiter's clock
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def _refill(self, now: float):
+        """Add the tokens earned since the last update."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def charge(self, amount: float, now: float):
+        """Take tokens, going into debt if there are not enough."""
+        self._refill(now)
+        self.tokens -= amount
+
+    def delay(self, now: float) -> float:
+        """Return the seconds until the bucket is out of debt, 0 if it is not in debt."""
+        self._refill(now)
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def full(self, now: float) -> bool:
+        """Return whether the bucket has refilled to its burst size."""
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+def _buckets(messages: Optional[float], nbytes: Optional[float], burst: float, now: float) -> List[TokenBucket]:
+    """Return a bucket per configured rate, each holding burst seconds of it."""
+    buckets = []
+    if messages is not None:
+        buckets.append(TokenBucket(messages, max(1.0, messages * burst), now))
+    if nbytes is not None:
+        buckets.append(TokenBucket(nbytes, max(1.0, nbytes * burst), now))
+    return buckets
+
+
+def source_key(address) -> str:
+    """Return the per-IP bucket key of a client address."""
+    return address[0] if isinstance(address, tuple) and address else str(address)
+
+
+class Throttle:
+    """The buckets one connection draws from: its own and those of its source IP."""
+
+    __slots__ = ('limiter', 'source', 'buckets', 'shared')
+
+    def __init__(self, limiter: 'RateLimiter', source: str, buckets: List[TokenBucket],
+                 shared: List[TokenBucket]):
+        self.limiter = limiter
+        self.source = source
+        self.buckets = buckets
+        self.shared = shared
+
+    def charge(self, messages: int, nbytes: int):
+        """
+        Charge processed messages and bytes to every bucket of the connection.
+
+        Args:
+            messages: Complete messages processed
+            nbytes: Bytes they took on the wire
+        """
+        limiter = self.limiter
+        now = limiter.clock()
+        amounts = limiter.amounts(messages, nbytes)
+        for bucket, amount in zip(self.buckets, amounts):
+            bucket.charge(amount, now)
+        if self.shared:
+            # Connections from the same IP may be served by different threads
+            with limiter.lock:
+                for bucket, amount in zip(self.shared, limiter.ip_amounts(messages, nbytes)):
+                    bucket.charge(amount, now)
+
+    def delay(self) -> float:
+        """Return the seconds to wait before reading from the connection again."""
+        limiter = self.limiter
+        now = limiter.clock()
+        wait = 0.0
+        for bucket in self.buckets:
+            wait = max(wait, bucket.delay(now))
+        if self.shared:
+            with limiter.lock:
+                for bucket in self.shared:
+                    wait = max(wait, bucket.delay(now))
+        return wait
+
+
+class RateLimiter:
+    """Hands out per-connection throttles and keeps the per-IP buckets they share."""
+
+    def __init__(self, connection_messages: Optional[float] = None, connection_bytes: Optional[float] = None,
+                 ip_messages: Optional[float] = None, ip_bytes: Optional[float] = None, burst: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the limiter; None leaves a rate unlimited.
+
+        Args:
+            connection_messages: Messages per second per connection
+            connection_bytes: Received bytes per second per connection
+            ip_messages: Messages per second across the connections of one IP
+            ip_bytes: Received bytes per second across the connections of one IP
+            burst: Seconds of each rate a client may use at once after
+                having been idle
+            clock: Monotonic time source
+        """
+        rates = (connection_messages, connection_bytes, ip_messages, ip_bytes)
+        if all(rate is None for rate in rates):
+            raise ValueError("At least one rate limit is required")
+        if any(rate is not None and rate <= 0 for rate in rates) or burst <= 0:
+            raise ValueError("Rates and burst must be positive")
+        self.connection_messages = connection_messages
+        self.connection_bytes = connection_bytes
+        self.ip_messages = ip_messages
+        self.ip_bytes = ip_bytes
+        self.burst = burst
+        self.clock = clock
+        self.lock = threading.Lock()
+        # source -> (shared buckets, open connections)
+        self._sources: Dict[str, list] = {}
+        # Sources without open connections, kept while their buckets refill
+        self._idle: Dict[str, list] = {}
+        self._next_sweep = clock() + SWEEP_INTERVAL
+
+    def amounts(self, messages: int, nbytes: int) -> tuple:
+        """Return the charge for each per-connection bucket, in bucket order."""
+        return self._amounts(self.connection_messages, self.connection_bytes, messages, nbytes)
+
+    def ip_amounts(self, messages: int, nbytes: int) -> tuple:
+        """Return the charge for each per-IP bucket, in bucket order."""
+        return self._amounts(self.ip_messages, self.ip_bytes, messages, nbytes)
+
+    @staticmethod
+    def _amounts(message_rate, byte_rate, messages: int, nbytes: int) -> tuple:
+        if message_rate is None:
+            return (nbytes,)
+        return (messages,) if byte_rate is None else (messages, nbytes)
+
+    def open(self, address) -> Throttle:
+        """
+        Return the throttle of a new connection.
+
+        Args:
+            address: Client address; its IP selects the shared buckets
+        """
+        now = self.clock()
+        source = source_key(address)
+        shared = []
+        if self.ip_messages is not None or self.ip_bytes is not None:
+            with self.lock:
+                entry = self._sources.get(source)
+                if entry is None:
+                    entry = self._sources[source] = [_buckets(self.ip_messages, self.ip_bytes, self.burst, now), 0]
+                self._idle.pop(source, None)
+                entry[1] += 1
+                shared = entry[0]
+                self._sweep(now)
+        buckets = _buckets(self.connection_messages, self.connection_bytes, self.burst, now)
+        return Throttle(self, source, buckets, shared)
+
+    def close(self, throttle: Throttle):
+        """
+        Release a connection's throttle.
+
+        An IP's buckets are dropped with its last connection unless they
+        are in debt, so reconnecting does not clear a debt. Buckets kept
+        for their debt are dropped by a later sweep once full again.
+        """
+        if not throttle.shared:
+            return
+        now = self.clock()
+        with self.lock:
+            entry = self._sources.get(throttle.source)
+            if entry is not None:
+                entry[1] -= 1
+                if not entry[1]:
+                    if any(bucket.delay(now) for bucket in entry[0]):
+                        self._idle[throttle.source] = entry
+                    else:
+                        del self._sources[throttle.source]
+            self._sweep(now)
+
+    def _sweep(self, now: float):
+        """Drop the buckets of IPs without connections that have refilled; caller holds the lock."""
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + SWEEP_INTERVAL
+        for source, entry in list(self._idle.items()):
+            if all(bucket.full(now) for bucket in entry[0]):
+                del self._idle[source]
+                del self._sources[source]
+
+    def __len__(self) -> int:
+        """Number of source IPs with open connections."""
+        return len(self._sources) - len(self._idle)
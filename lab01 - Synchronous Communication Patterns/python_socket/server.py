@@ -1,9 +1,63 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import queue
 import socket
+import selectors
+import ssl
 import threading
 import signal
 import sys
+import time
 import logging
-from typing import Optional
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Add the server directory to the path so sibling modules import as packages too
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from batching import (
+    BATCH_HANDLERS, DEFAULT_BATCH_SIZE, AsyncMicroBatcher, BatchHandler, MicroBatcher, get_batch_handler,
+    run_batch
+)
+from cache import CACHE_POLICIES, ResultCache, SynchronizedResultCache
+from compression import (
+    COMPRESSION_MODES, DEFAULT_COMPRESSION_THRESHOLD, DEFAULT_DICTIONARY, CompressingCodec, CorruptFrameError
+)
+from buffers import (
+    ASCII_WHITESPACE, DEFAULT_SLAB_SIZE, OutputBuffer, SlabPool, is_stripped, upper_ascii_in_place
+)
+from handoff import HAS_FD_PASSING, HandoffListener, complete_takeover, take_over
+from framing import (
+    DEFAULT_MAX_FRAME_SIZE, FRAME_HEADER, PROTOCOLS, FrameTooLargeError, StreamChunk, encode_frame,
+    frame_parts, make_codec, utf8_boundary
+)
+from metrics import ServerMetrics, StatsListener, accept_queue_depth
+from ratelimit import RateLimiter, Throttle
+from opcodes import (
+    FLAG_ERROR, FLAG_RESPONSE, OP_ECHO, OP_STATS, OP_UPPER, BinaryCodec, BinaryMessage, OpcodeRouter, UserStore,
+    opcode_name, upper
+)
+from logsetup import (
+    DEFAULT_SAMPLE_RATE, DEFAULT_SUMMARY_INTERVAL, LOG_MODES, TrafficLog, configure_logging, stop_logging
+)
+from timers import DEFAULT_TICK, ConnectionDeadline, ConnectionReaper
+from tls import DEFAULT_TICKETS, server_context, set_nodelay
+from transport import (
+    DEFAULT_UNIX_MODE, HAS_UNIX_SOCKETS, bind_unix_listener, parse_unix_address, peer_address,
+    unlink_unix_listener
+)
+from tuning import (
+    HAS_QUICKACK, TUNING_PROFILES, TuningProfile, check_backlog, get_profile, is_tcp, set_buffers,
+    tune_connection
+)
 
 # Configure logging
 logging.basicConfig(
@@ -12,23 +66,293 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Supported connection handling engines
+ENGINES = ('threaded', 'epoll')
+
+# Worker pool policies when every worker and pending slot is taken
+OVERFLOW_POLICIES = ('reject', 'backlog')
+
+# Asyncio event loop implementations selectable for AsyncSocketServer
+EVENT_LOOPS = ('auto', 'asyncio', 'uvloop')
+
+# Maximum number of bytes read per recv() call
+RECV_BUFFER_SIZE = 1024
+
+# Larger reads for the framed protocol, where one recv may carry many frames
+FRAMED_RECV_BUFFER_SIZE = 65536
+
+# Seconds between checks for finished connections while draining
+DRAIN_POLL_INTERVAL = 0.1
+
+# Seconds a client gets to complete the TLS handshake (threaded and asyncio engines)
+TLS_HANDSHAKE_TIMEOUT = 10.0
+
+# Largest chunk of a streamed message accepted, and the unsent reply bytes
+# at which the epoll engine stops reading from a connection (1 MiB)
+DEFAULT_MAX_BUFFERED = 1024 * 1024
+
+
+class _Connection:
+    """Per-connection state for the event-loop engine."""
+    
+    __slots__ = ('sock', 'address', 'codec', 'inbuf', 'outbuf', 'close_after_flush', 'deadline', 'quickack',
+                 'throttle', 'resume_at', 'tls', 'handshaking')
+    
+    def __init__(self, sock: socket.socket, address: tuple, codec, quickack: bool = False):
+        self.sock = sock
+        self.address = address
+        self.codec = codec
+        self.inbuf: Optional[bytes] = None  # partial frame left over in buffer-pool mode
+        self.outbuf = OutputBuffer()
+        self.close_after_flush = False
+        self.deadline: Optional[ConnectionDeadline] = None
+        self.quickack = quickack  # re-arm TCP_QUICKACK after every read
+        self.throttle: Optional[Throttle] = None
+        self.resume_at: Optional[float] = None  # reads deferred until then by the rate limiter
+        self.tls = isinstance(sock, ssl.SSLSocket)
+        self.handshaking = self.tls  # TLS handshake still in progress
+
 
 class SocketServer:
     """TCP Socket Server with graceful shutdown support."""
     
-    def __init__(self, host: str = 'localhost', port: int = 8080):
+    def __init__(self, host: str = 'localhost', port: int = 8080, engine: str = 'threaded',
+                 backlog: int = 5, protocol: str = 'text',
+                 max_frame_size: int = DEFAULT_MAX_FRAME_SIZE,
+                 max_workers: Optional[int] = None, max_pending: int = 0,
+                 overflow: str = 'reject', reuse_port: bool = False,
+                 buffer_pool: bool = False, slab_size: int = DEFAULT_SLAB_SIZE,
+                 traffic_log: Optional[TrafficLog] = None, idle_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None, max_lifetime: Optional[float] = None,
+                 timeout_tick: float = DEFAULT_TICK, handoff_path: Optional[str] = None,
+                 takeover: bool = False, drain_timeout: float = 30.0,
+                 stats_port: Optional[int] = None, compression: Optional[Sequence[str]] = None,
+                 compression_threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+                 compression_dict: bytes = DEFAULT_DICTIONARY, unix_socket: Optional[str] = None,
+                 unix_mode: int = DEFAULT_UNIX_MODE, tuning: Optional[Union[str, TuningProfile]] = None,
+                 result_cache: Optional[ResultCache] = None, rate_limiter: Optional[RateLimiter] = None,
+                 max_buffered: int = DEFAULT_MAX_BUFFERED,
+                 batch_handler: Optional[Union[str, BatchHandler]] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, batch_delay: float = 0.0,
+                 ssl_context: Optional[ssl.SSLContext] = None):
         """
         Initialize the socket server.
         
         Args:
             host: Server host address
             port: Server port number
+            engine: Connection handling engine, 'threaded' (one thread per
+                client) or 'epoll' (single selector-based event loop)
+            backlog: Maximum number of pending connections in the listen queue
+            protocol: Wire protocol, 'text' (one message per recv),
+                'framed' (4-byte big-endian length prefix per message) or
+                'binary' (opcode header dispatched to self.handlers)
+            max_frame_size: Largest accepted frame payload in bytes
+            max_workers: Size of the fixed worker pool for the threaded
+                engine; None keeps one thread per connection
+            max_pending: Accepted connections allowed to wait for a worker
+            overflow: What to do when workers and pending slots are full:
+                'reject' replies "ERROR: busy" and closes, 'backlog' stops
+                accepting so new connections wait in the listen backlog
+            reuse_port: Set SO_REUSEPORT so several processes can bind the
+                same port and the kernel balances accepts between them
+            buffer_pool: Receive with recv_into() into pooled slabs and
+                uppercase ASCII payloads in place (threaded and epoll engines)
+            slab_size: Size of each pooled receive slab in bytes
+            traffic_log: Sample per-message logs and log periodic per-client
+                throughput summaries instead of logging every message
+            idle_timeout: Close connections that send nothing for this many seconds
+            read_timeout: Close connections that take longer than this many
+                seconds to finish sending a message they started
+            max_lifetime: Close connections open for longer than this many seconds
+            timeout_tick: Resolution in seconds of the timing wheel that
+                enforces the timeouts
+            handoff_path: Unix domain socket path on which a replacement
+                process can take over the listening socket
+            takeover: Take the listening socket over from the server at
+                handoff_path instead of binding the port
+            drain_timeout: Seconds open connections get to finish after the
+                listening socket has been handed over
+            stats_port: Serve live metrics in Prometheus text format over
+                HTTP on this port (0 picks a free port)
+            compression: Compression modes clients may negotiate, most
+                preferred first (framed protocol); None disables negotiation
+            compression_threshold: Smallest reply in bytes that is compressed
+            compression_dict: Preset dictionary for the zlib-dict mode
+            unix_socket: Also accept connections on this Unix domain socket,
+                given as unix:///path or a plain path
+            unix_mode: Permission bits of the Unix domain socket file
+            tuning: Name of a tuning profile ('latency', 'throughput',
+                'default') or a TuningProfile; its backlog replaces backlog
+                and its socket options are set on every TCP connection
+            result_cache: Answer repeated messages from this cache instead of
+                calling _process_message() again; the threaded engine needs
+                a SynchronizedResultCache
+            rate_limiter: Hold connections and source IPs to message and
+                byte rates by deferring reads from clients over their limit;
+                the epoll engine also rotates the order it serves ready
+                connections in
+            max_buffered: Bound on what one connection can make the server
+                hold: the largest chunk of a streamed message (framed
+                protocol), and the unsent reply bytes at which the epoll
+                engine stops reading until the client catches up
+            batch_handler: Handle messages in batches with this handler, a
+                list of messages in and a list of replies out, instead of
+                one _process_message() call each (text and framed
+                protocols); 'scalar' adapts _process_message() and 'upper'
+                uppercases a batch in one call
+            batch_size: Most messages in one batch
+            batch_delay: Seconds a batch stays open for messages from other
+                connections; 0 batches what one wakeup has read
+            ssl_context: Wrap every accepted connection in TLS with this
+                server context (see tls.server_context()); it holds the
+                session ticket key, so share one context between servers
+                that should resume each other's sessions
         """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown protocol '{protocol}', expected one of {PROTOCOLS}")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {OVERFLOW_POLICIES}")
+        if reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+            raise ValueError("SO_REUSEPORT is not supported on this platform")
+        if max_workers is not None:
+            if engine != 'threaded':
+                raise ValueError("max_workers only applies to the threaded engine")
+            if max_workers < 1 or max_pending < 0:
+                raise ValueError("max_workers must be at least 1 and max_pending non-negative")
+        if handoff_path is not None and not HAS_FD_PASSING:
+            raise ValueError("Socket handoff needs Unix domain sockets and socket.send_fds()")
+        if takeover and handoff_path is None:
+            raise ValueError("takeover requires handoff_path")
+        if buffer_pool and protocol == 'binary':
+            raise ValueError("buffer_pool supports the text and framed protocols only")
+        if compression is not None:
+            if protocol != 'framed' or buffer_pool:
+                raise ValueError("compression needs the framed protocol without buffer_pool")
+            unknown = set(compression) - set(COMPRESSION_MODES)
+            if unknown:
+                raise ValueError(f"Unknown compression modes {sorted(unknown)}, expected {COMPRESSION_MODES}")
+        if unix_socket is not None:
+            if not HAS_UNIX_SOCKETS:
+                raise ValueError("Unix domain sockets are not supported on this platform")
+            if reuse_port or handoff_path is not None:
+                raise ValueError("unix_socket cannot be shared with reuse_port or handed over")
+        if result_cache is not None and engine == 'threaded' and not result_cache.thread_safe:
+            raise ValueError("The threaded engine needs a SynchronizedResultCache")
+        if ssl_context is not None and buffer_pool:
+            raise ValueError("buffer_pool cannot be combined with TLS")
+        if batch_handler is not None:
+            if protocol == 'binary' or buffer_pool:
+                raise ValueError("batch_handler needs the text or framed protocol without buffer_pool")
+            if batch_size < 1 or batch_delay < 0:
+                raise ValueError("batch_size must be at least 1 and batch_delay non-negative")
+            
+        self.tuning = get_profile(tuning) if tuning is not None else None
+        if self.tuning is not None:
+            backlog = self.tuning.backlog
+        self.result_cache = result_cache
+        self.rate_limiter = rate_limiter
+        self.batch_handler = None
+        if batch_handler is not None:
+            self.batch_handler = get_batch_handler(batch_handler, self._cached_process_message)
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.ssl_context = ssl_context
+            
         self.host = host
         self.port = port
+        self.engine = engine
+        self.backlog = backlog
+        self.protocol = protocol
+        self.max_frame_size = max_frame_size
+        self.max_buffered = max_buffered
+        self.recv_buffer_size = RECV_BUFFER_SIZE if protocol == 'text' else FRAMED_RECV_BUFFER_SIZE
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self.reuse_port = reuse_port
+        self.buffer_pool = buffer_pool
+        self.traffic_log = traffic_log
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
+        self.max_lifetime = max_lifetime
+        self.handoff_path = handoff_path
+        self.takeover = takeover
+        self.drain_timeout = drain_timeout
+        self.stats_port = stats_port
+        self.compression = tuple(compression) if compression is not None else None
+        self.compression_threshold = compression_threshold
+        self.compression_dict = compression_dict
+        self.unix_path = None
+        if unix_socket is not None:
+            self.unix_path = parse_unix_address(unix_socket) or unix_socket
+        self.unix_mode = unix_mode
+        self._quickack = bool(self.tuning and self.tuning.quickack and HAS_QUICKACK)
         self.server_socket: Optional[socket.socket] = None
+        self.unix_listener: Optional[socket.socket] = None
+        self._unix_bound: Optional[os.stat_result] = None
         self.running = False
-        self.client_threads = []
+        self.client_threads = set()
+        self.stats = Counter()
+        
+        # Threaded engine state: live threads remove themselves when done
+        self._threads_lock = threading.Lock()
+        self._active_clients = 0
+        self._pending_connections: Optional[queue.Queue] = None
+        self._connection_slots: Optional[threading.BoundedSemaphore] = None
+        
+        # Buffer-pool state; the in-place fast path only applies while
+        # _process_message is the built-in uppercase transform and no
+        # result cache has to see every message
+        self._slab_pool = SlabPool(slab_size) if buffer_pool else None
+        self._loop_slab: Optional[bytearray] = None
+        self._inplace_upper = (type(self)._process_message is SocketServer._process_message
+                               and result_cache is None)
+        
+        # One timing wheel tracks the timeouts of every connection
+        self._reaper: Optional[ConnectionReaper] = None
+        if idle_timeout is not None or read_timeout is not None or max_lifetime is not None:
+            self._reaper = ConnectionReaper(idle_timeout, read_timeout, max_lifetime, timeout_tick)
+        
+        # Binary protocol operations; register more with self.handlers.register()
+        self.users = UserStore()
+        self.handlers = OpcodeRouter()
+        self.handlers.register(OP_ECHO, bytes)
+        self.handlers.register(OP_UPPER, upper)
+        self.handlers.register(OP_STATS, self._stats_payload)
+        for opcode, handler in self.users.handlers().items():
+            self.handlers.register(opcode, handler)
+        
+        # Live metrics: one shard per threaded connection or per event loop
+        self.metrics = ServerMetrics() if stats_port is not None else None
+        self._stats_listener: Optional[StatsListener] = None
+        self._loop_shard = None
+        
+        # Handoff state: after handing the listener over, stop accepting and drain
+        self._handoff: Optional[HandoffListener] = None
+        self._takeover_control: Optional[socket.socket] = None
+        self._draining = False
+        self._drain_deadline = 0.0
+        
+        # Event-loop engine state
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._wakeup_reader: Optional[socket.socket] = None
+        self._wakeup_writer: Optional[socket.socket] = None
+        self._deferred: list = []  # heap of (resume time, order, connection) for deferred reads
+        self._deferred_order = itertools.count()
+        self._turn = 0
+        # Batched replies held by the event loop, as (connection, replies, bytes in, start time)
+        self._held: list = []
+        self._held_connections = set()
+        self._held_messages = 0
+        self._held_since = 0.0
+        
+        # Threads share one batcher; the event loop engines batch themselves
+        self._batcher = None
+        if self.batch_handler is not None and engine == 'threaded':
+            self._batcher = MicroBatcher(self._run_batch, batch_size, batch_delay)
         
     def setup_signal_handlers(self):
         """Set up signal handlers for graceful shutdown."""
@@ -43,20 +367,16 @@ class SocketServer:
     def start(self):
         """Start the socket server."""
         try:
-            # Create TCP socket
-            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            # Allow socket reuse
-            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            
-            # Bind to address
-            self.server_socket.bind((self.host, self.port))
-            logger.info(f"Server bound to {self.host}:{self.port}")
-            
-            # Listen for connections (max 5 pending connections)
-            self.server_socket.listen(5)
-            logger.info("Server listening for connections...")
+            self.server_socket = self._take_over_listener() if self.takeover else None
+            if self.server_socket is None:
+                self.server_socket = self._create_listener()
+            self._bind_unix()
             
             self.running = True
+            if self.traffic_log:
+                self.traffic_log.start()
+            self._start_stats()
+            self._start_handoff(self.server_socket.fileno)
             
             try:
                 self.setup_signal_handlers()
@@ -64,37 +384,320 @@ class SocketServer:
                 # Signal handlers can only be set in main thread
                 logger.debug(f"Could not set signal handlers: {e}")
             
-            # Main server loop
-            while self.running:
-                try:
-                    # Set timeout to allow periodic checking of self.running
-                    self.server_socket.settimeout(1.0)
-                    
-                    # Accept client connection
-                    client_socket, client_address = self.server_socket.accept()
-                    logger.info(f"New connection from {client_address}")
+            if self.engine == 'epoll':
+                self._serve_epoll()
+            else:
+                if self._reaper is not None:
+                    self._reaper.start(self._reap_socket)
+                self._serve_threaded()
                     
+        except Exception as e:
+            logger.error(f"Server error: {e}")
+        finally:
+            self.cleanup()
+            
+    def _create_listener(self) -> socket.socket:
+        """
+        Create the listening TCP socket.
+        
+        Returns:
+            Socket bound to host and port and listening
+        """
+        # Create TCP socket
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            # Allow socket reuse
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.reuse_port:
+                # Share the port with sibling worker processes
+                listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            if self.tuning is not None:
+                # Accepted sockets inherit the buffer sizes
+                set_buffers(listener, self.tuning)
+                
+            # Bind to address
+            listener.bind((self.host, self.port))
+            logger.info(f"Server bound to {self.host}:{self.port}")
+            
+            # Listen for connections
+            check_backlog(self.backlog)
+            listener.listen(self.backlog)
+            logger.info("Server listening for connections...")
+            return listener
+        except BaseException:
+            listener.close()
+            raise
+            
+    def _bind_unix(self):
+        """Listen on the Unix domain socket next to the TCP port, if one is configured."""
+        if self.unix_path is None:
+            return
+        self.unix_listener, self._unix_bound = bind_unix_listener(self.unix_path, self.backlog, self.unix_mode)
+        logger.info(f"Server bound to unix://{self.unix_path} (mode {self.unix_mode:o})")
+        
+    def _listeners(self) -> list:
+        """Return every open listening socket."""
+        return [sock for sock in (self.server_socket, self.unix_listener)
+                if sock is not None and sock.fileno() != -1]
+        
+    def _start_stats(self):
+        """Start the metrics endpoint if a stats port is configured."""
+        if self.metrics is None:
+            return
+        self._stats_listener = StatsListener(self.host, self.stats_port, self.render_stats)
+        self._stats_listener.start()
+        self.stats_port = self._stats_listener.port
+        
+    def render_stats(self) -> str:
+        """
+        Render live metrics in Prometheus text format.
+        
+        Returns:
+            Exposition text merged from every metrics shard
+        """
+        gauges = {}
+        if self.max_workers is not None:
+            gauges['threads'] = self.max_workers
+        elif self.engine == 'threaded':
+            with self._threads_lock:
+                gauges['threads'] = len(self.client_threads)
+        else:
+            gauges['threads'] = 1
+        if self._pending_connections is not None:
+            gauges['pending_connections'] = self._pending_connections.qsize()
+        listener = self._listening_socket()
+        queue_info = accept_queue_depth(listener) if listener is not None else None
+        if queue_info is not None:
+            gauges['accept_queue_depth'], gauges['accept_queue_limit'] = queue_info
+        cache = self.result_cache.stats() if self.result_cache is not None else None
+        return self.metrics.render(gauges, dict(self.stats), cache)
+        
+    def _listening_socket(self):
+        """Return the listening socket, or None when not listening."""
+        if self.server_socket is None or self.server_socket.fileno() == -1:
+            return None
+        return self.server_socket
+        
+    def _take_over_listener(self) -> Optional[socket.socket]:
+        """
+        Receive the listening socket from the server at handoff_path.
+        
+        Returns:
+            The listening socket, or None if no server is running there
+        """
+        try:
+            listener, self._takeover_control = take_over(self.handoff_path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            logger.warning(f"No server to take over at {self.handoff_path} ({e}), binding instead")
+            return None
+        logger.info(f"Took over listening socket {listener.getsockname()} from {self.handoff_path}")
+        return listener
+        
+    def _start_handoff(self, listener_fd: Callable[[], int]):
+        """
+        Release the previous server after a takeover and accept the next takeover.
+        
+        Args:
+            listener_fd: Returns the file descriptor of the listening socket
+        """
+        if self.handoff_path is None:
+            return
+        if self._takeover_control is not None:
+            control, self._takeover_control = self._takeover_control, None
+            complete_takeover(control)
+            logger.info("Previous server stopped accepting")
+        self._handoff = HandoffListener(self.handoff_path, listener_fd, self.stop_accepting)
+        self._handoff.start()
+        
+    def stop_accepting(self):
+        """
+        Stop accepting connections and shut down once open ones finish.
+        
+        Used after the listening socket has been handed over: it stays open
+        for the new process, and open connections get drain_timeout seconds.
+        """
+        self._drain_deadline = time.monotonic() + self.drain_timeout
+        self._draining = True
+        if self._wakeup_writer:
+            try:
+                self._wakeup_writer.send(b'\0')
+            except (BlockingIOError, OSError):
+                pass
+                
+    def _serve_threaded(self):
+        """Accept loops for the threaded engine, one thread per extra listener."""
+        if self.max_workers is not None:
+            self._start_worker_pool()
+        if self.unix_listener is not None:
+            threading.Thread(target=self._accept_loop, args=(self.unix_listener,),
+                             name='unix-accept', daemon=True).start()
+            
+        self._accept_loop(self.server_socket)
+        if self._draining:
+            self._drain_clients()
+            
+    def _accept_loop(self, listener: socket.socket):
+        """
+        Accept connections on one listening socket until shutdown or handoff.
+        
+        Args:
+            listener: TCP or Unix domain listening socket
+        """
+        while self.running and not self._draining:
+            try:
+                # With the backlog policy, only accept once a slot is free
+                if self.overflow == 'backlog' and self._connection_slots:
+                    if not self._connection_slots.acquire(timeout=1.0):
+                        continue
+                        
+                # Set timeout to allow periodic checking of self.running
+                listener.settimeout(1.0)
+                
+                # Accept client connection
+                try:
+                    client_socket, client_address = listener.accept()
+                except BaseException:
+                    if self.overflow == 'backlog' and self._connection_slots:
+                        self._connection_slots.release()
+                    raise
+                client_address = peer_address(client_socket, client_address)
+                logger.info(f"New connection from {client_address}")
+                self.stats['connections_accepted'] += 1
+                if self.tuning is not None:
+                    tune_connection(client_socket, self.tuning)
+                
+                if self._pending_connections is None:
                     # Handle client in separate thread
-                    client_thread = threading.Thread(
-                        target=self._handle_client,
-                        args=(client_socket, client_address),
-                        daemon=True
-                    )
-                    client_thread.start()
-                    self.client_threads.append(client_thread)
+                    self._start_client_thread(client_socket, client_address)
+                elif self.overflow == 'backlog' or self._connection_slots.acquire(blocking=False):
+                    with self._threads_lock:
+                        self._active_clients += 1
+                    self._pending_connections.put((client_socket, client_address))
+                else:
+                    self._reject_busy(client_socket, client_address)
                     
-                except socket.timeout:
-                    # Timeout is expected, continue loop to check self.running
-                    continue
-                except socket.error as e:
-                    if self.running:  # Only log if not shutting down
-                        logger.error(f"Socket error: {e}")
+            except socket.timeout:
+                # Timeout is expected, continue loop to check self.running
+                continue
+            except socket.error as e:
+                if self.running:  # Only log if not shutting down
+                    logger.error(f"Socket error: {e}")
+                break
+                
+    def _drain_clients(self):
+        """Wait until no client is being served, the drain time is up or shutdown() is called."""
+        logger.info(f"Stopped accepting, draining connections for up to {self.drain_timeout:g}s")
+        while self.running and time.monotonic() < self._drain_deadline:
+            with self._threads_lock:
+                if not self._active_clients:
                     break
+            time.sleep(DRAIN_POLL_INTERVAL)
+            
+    def _start_client_thread(self, client_socket: socket.socket, client_address: tuple):
+        """
+        Handle a client on a dedicated thread that untracks itself on exit.
+        
+        Args:
+            client_socket: Client socket connection
+            client_address: Client address tuple
+        """
+        def run():
+            try:
+                self._handle_client(client_socket, client_address)
+            finally:
+                with self._threads_lock:
+                    self.client_threads.discard(client_thread)
+                    self._active_clients -= 1
                     
-        except Exception as e:
-            logger.error(f"Server error: {e}")
+        client_thread = threading.Thread(target=run, daemon=True)
+        with self._threads_lock:
+            self.client_threads.add(client_thread)
+            self._active_clients += 1
+        client_thread.start()
+        
+    def _start_worker_pool(self):
+        """Start the fixed pool of worker threads fed by the pending queue."""
+        self._pending_connections = queue.Queue()
+        self._connection_slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"socket-worker-{i}", daemon=True)
+            self.client_threads.add(worker)
+            worker.start()
+        logger.info(f"Started {self.max_workers} workers with {self.max_pending} pending slots")
+        
+    def _worker_loop(self):
+        """Serve queued connections until a None sentinel arrives."""
+        while True:
+            item = self._pending_connections.get()
+            if item is None:
+                break
+            try:
+                self._handle_client(*item)
+            finally:
+                with self._threads_lock:
+                    self._active_clients -= 1
+                self._connection_slots.release()
+                
+    def _tls_handshake(self, client_socket: socket.socket, client_address: tuple) -> Optional[ssl.SSLSocket]:
+        """
+        Wrap a connection in TLS and complete the handshake on the calling thread.
+        
+        Args:
+            client_socket: Accepted plaintext socket
+            client_address: Client address tuple
+            
+        Returns:
+            The TLS socket, or None if the handshake failed and the
+            connection was closed
+        """
+        if self.tuning is None:
+            set_nodelay(client_socket)
+        timeout = client_socket.gettimeout()
+        client_socket.settimeout(TLS_HANDSHAKE_TIMEOUT)
+        try:
+            tls_socket = self.ssl_context.wrap_socket(client_socket, server_side=True)
+        except (ssl.SSLError, OSError) as e:
+            self._handshake_failed(client_address, e)
+            client_socket.close()
+            return None
+        tls_socket.settimeout(timeout)
+        self._count_handshake(tls_socket)
+        return tls_socket
+        
+    def _count_handshake(self, tls_object):
+        """Count a completed TLS handshake, and whether it resumed a session."""
+        self.stats['tls_handshakes'] += 1
+        if tls_object.session_reused:
+            self.stats['tls_resumed'] += 1
+            
+    def _handshake_failed(self, client_address: tuple, error: Exception):
+        """Log and count a failed TLS handshake."""
+        logger.error(f"TLS handshake with {client_address} failed: {error}")
+        self.stats['tls_handshake_failures'] += 1
+        
+    def _reject_busy(self, client_socket: socket.socket, client_address: tuple):
+        """
+        Turn away a connection when the worker pool is saturated.
+        
+        Args:
+            client_socket: Client socket connection
+            client_address: Client address tuple
+        """
+        logger.warning(f"Rejecting {client_address}: all workers busy")
+        self.stats['connections_rejected'] += 1
+        if self.ssl_context is not None:
+            # A plaintext reply would land in the client's TLS handshake, and
+            # handshaking here would stall the accept loop: just close
+            client_socket.close()
+            return
+        codec = self._new_codec()
+        try:
+            client_socket.setblocking(False)
+            client_socket.send(codec.encode(b"ERROR: busy"))
+        except OSError:
+            pass
         finally:
-            self.cleanup()
+            client_socket.close()
             
     def _handle_client(self, client_socket: socket.socket, client_address: tuple):
         """
@@ -104,40 +707,1004 @@ class SocketServer:
             client_socket: Client socket connection
             client_address: Client address tuple
         """
+        if self._slab_pool is not None:
+            self._handle_client_pooled(client_socket, client_address)
+            return
+        if self.ssl_context is not None:
+            client_socket = self._tls_handshake(client_socket, client_address)
+            if client_socket is None:
+                return
+                
+        codec = self._new_codec()
+        output = OutputBuffer()
+        deadline = self._reaper.add((client_socket, client_address)) if self._reaper is not None else None
+        shard = self._open_shard()
+        quickack = self._quickack and is_tcp(client_socket)
+        throttle = self.rate_limiter.open(client_address) if self.rate_limiter is not None else None
         try:
             with client_socket:
                 while True:
                     # Receive data from client
-                    data = client_socket.recv(1024)
+                    data = client_socket.recv(self.recv_buffer_size)
                     if not data:
-                        logger.info(f"Client {client_address} disconnected")
+                        if not (deadline and deadline.reason):
+                            logger.info(f"Client {client_address} disconnected")
+                        break
+                    if quickack:
+                        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+                        
+                    # Decode, process and send back every complete message
+                    # in one scatter-gather write
+                    if shard:
+                        started = time.perf_counter()
+                    replies, close = self._handle_data(codec, data, client_address, shard, throttle)
+                    if self._batcher is not None:
+                        messages = self._batch_messages(replies)
+                        if messages:
+                            replies = self._finish_batch(codec, replies, client_address,
+                                                         self._batcher.submit(messages))
+                    if deadline:
+                        deadline.touch(codec.buffered > 0, bool(replies))
+                    if shard:
+                        sending = time.perf_counter()
+                    output.extend(replies)
+                    output.flush(client_socket)
+                    if shard:
+                        shard.record_batch(len(data), replies, started, sending)
+                    if close:
                         break
+                    if throttle:
+                        self._throttle_thread(throttle)
                         
-                    # Decode message
-                    message = data.decode('utf-8').strip()
-                    logger.info(f"Received from {client_address}: {message}")
+        except socket.error as e:
+            if not (deadline and deadline.reason):
+                logger.error(f"Error handling client {client_address}: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error with client {client_address}: {e}")
+        finally:
+            if deadline:
+                self._reaper.remove(deadline)
+            self._close_shard(shard)
+            if throttle:
+                self.rate_limiter.close(throttle)
+            if self.traffic_log:
+                self.traffic_log.forget(client_address)
+            logger.info(f"Connection with {client_address} closed")
+            
+    def _throttle_thread(self, throttle: Throttle):
+        """
+        Sleep before the next read while a threaded connection is over its rate limit.
+        
+        Meanwhile the kernel's receive buffer fills and TCP flow control
+        holds the client back, and other connections get the GIL.
+        
+        Args:
+            throttle: Rate limit buckets of the connection
+        """
+        delay = throttle.delay()
+        if delay > 0:
+            self.stats['reads_deferred'] += 1
+            time.sleep(delay)
+            
+    def _open_shard(self):
+        """Return a metrics shard for a new threaded connection, or None without metrics."""
+        if self.metrics is None:
+            return None
+        shard = self.metrics.shard()
+        shard.opened = 1
+        return shard
+        
+    def _close_shard(self, shard):
+        """Count a threaded connection as closed and retire its shard."""
+        if shard:
+            shard.closed = 1
+            self.metrics.retire(shard)
+            
+    def _new_codec(self):
+        """Create the codec for a new connection."""
+        if self.compression is not None:
+            return CompressingCodec(self.max_frame_size, self.compression,
+                                    self.compression_threshold, self.compression_dict)
+        if self.protocol == 'binary':
+            return BinaryCodec(self.max_frame_size, reply=True)
+        return make_codec(self.protocol, self.max_frame_size, self.max_buffered)
+        
+    def _handle_data(self, codec, data: bytes, client_address: tuple, shard=None,
+                     throttle: Optional[Throttle] = None) -> Tuple[list, bool]:
+        """
+        Decode received bytes, process complete messages and build the reply.
+        
+        Args:
+            codec: Per-connection protocol codec
+            data: Bytes received from the client
+            client_address: Client address tuple
+            shard: Metrics shard timing the decode and process stages
+            throttle: Rate limit buckets charged for the received messages
+            
+        Returns:
+            Tuple of (reply buffers to send in order, whether to close the
+            connection afterwards); with a batch handler, messages it has
+            yet to answer stand in for their replies as str
+        """
+        if shard:
+            started = time.perf_counter()
+        try:
+            payloads = codec.decode(data)
+        except FrameTooLargeError as e:
+            logger.error(f"Oversized frame from {client_address}: {e}")
+            return [codec.encode(b"ERROR: Frame too large")], True
+        except CorruptFrameError as e:
+            logger.error(f"Corrupt frame from {client_address}: {e}")
+            return [codec.encode(b"ERROR: Corrupt frame")], True
+        if shard:
+            decoded = time.perf_counter()
+            shard.stages['decode'].observe(decoded - started)
+            shard.messages += len(payloads)
+        if throttle:
+            throttle.charge(len(payloads), len(data))
+            
+        replies = []
+        close = False
+        if codec.handshake_reply is not None:
+            # Answered before any message, so the client can switch modes
+            replies.append(codec.handshake_reply)
+            codec.handshake_reply = None
+        if codec.binary:
+            for message in payloads:
+                replies.extend(self._dispatch(codec, message, client_address))
+        else:
+            batching = self.batch_handler is not None
+            for payload in payloads:
+                if payload.__class__ is StreamChunk:
+                    replies.extend(self._stream_chunk(codec, payload, client_address))
+                    continue
+                if batching:
+                    # Left in place as a str for the batch handler to answer
+                    response, valid = self._batch_message(payload, client_address)
+                    if valid:
+                        replies.append(response)
+                        continue
+                else:
+                    response, valid = self._respond(payload, client_address)
+                replies.extend(self._encode_response(codec.encode_parts, response, client_address))
+                if not valid and not codec.framed:
+                    # Without framing the stream cannot be resynchronised
+                    close = True
+                    break
                     
-                    # Process message (convert to uppercase)
-                    response = self._process_message(message)
+        if shard:
+            shard.stages['process'].observe(time.perf_counter() - decoded)
+        return replies, close
+        
+    def _dispatch(self, codec: BinaryCodec, message: BinaryMessage, client_address: tuple) -> Tuple[bytes, bytes]:
+        """
+        Run the handler of a binary protocol request.
+        
+        Args:
+            codec: Per-connection binary codec
+            message: Decoded request
+            client_address: Client address tuple
+            
+        Returns:
+            Header and payload of the response
+        """
+        flags, reply = self.handlers.dispatch(message.opcode, message.payload)
+        if len(reply) > codec.max_frame_size:
+            # Such as user_list once the store has outgrown one frame; the
+            # connection stays usable
+            logger.error(f"Response to {opcode_name(message.opcode)} of {len(reply)} bytes "
+                         f"exceeds the frame limit of {codec.max_frame_size}")
+            flags = FLAG_RESPONSE | FLAG_ERROR
+            reply = f"ERROR: Response of {len(reply)} bytes exceeds limit of {codec.max_frame_size}".encode('ascii')
+        if self.traffic_log is None or self.traffic_log.record(client_address, len(message.payload), len(reply)):
+            logger.info(f"Request {message.request_id} from {client_address}: "
+                        f"{opcode_name(message.opcode)}, {len(message.payload)} bytes in, {len(reply)} bytes out")
+        return codec.encode_message(message.opcode, message.request_id, reply, flags)
+        
+    def _stats_payload(self, payload: bytes) -> bytes:
+        """Return server counters as JSON, for the binary stats operation."""
+        stats = dict(self.stats)
+        stats['users'] = len(self.users)
+        if self.metrics is not None:
+            total = self.metrics.snapshot()
+            stats.update(connections_total=total.opened, connections_active=total.opened - total.closed,
+                         messages_total=total.messages)
+        if self.result_cache is not None:
+            stats.update((f'cache_{name}', value) for name, value in self.result_cache.stats().items())
+        return json.dumps(stats, sort_keys=True).encode('ascii')
+        
+    def _stream_chunk(self, codec, chunk: StreamChunk, client_address: tuple) -> list:
+        """
+        Process one chunk of a streamed message and return its reply chunks.
+        
+        Bytes of a character split across chunks are held back for the next
+        chunk, so _process_chunk() only sees whole characters. Nothing else
+        of the message is kept.
+        
+        Args:
+            codec: Per-connection framed codec holding the split character
+            chunk: Received chunk
+            client_address: Client address tuple
+            
+        Returns:
+            Reply buffers; the last chunk of a stream is answered with the
+            last chunk of the reply
+        """
+        data = codec.stream_tail + chunk.data if codec.stream_tail else chunk.data
+        cut = len(data) if chunk.last else utf8_boundary(data)
+        codec.stream_tail = data[cut:]
+        if chunk.last:
+            self.stats['streams_completed'] += 1
+        reply = self._process_chunk(data[:cut] if cut < len(data) else data)
+        if self.traffic_log is None or self.traffic_log.record(client_address, len(chunk.data), len(reply)):
+            logger.info(f"Streamed chunk from {client_address}: {len(chunk.data)} bytes in, "
+                        f"{len(reply)} bytes out{' (last)' if chunk.last else ''}")
+        
+        if not reply and not chunk.last:
+            return []
+        # A transform that grows the text can overflow a frame; split the reply then
+        limit = self.max_frame_size
+        parts = [reply[start:start + limit] for start in range(0, len(reply), limit)] or [b'']
+        replies = []
+        for index, part in enumerate(parts):
+            replies.extend(codec.encode_chunk(part, chunk.last and index == len(parts) - 1))
+        return replies
+        
+    def _batch_message(self, payload: bytes, client_address: tuple) -> Tuple[Union[str, bytes], bool]:
+        """
+        Decode one message payload for the batch handler.
+        
+        Returns:
+            Tuple of (message, True), or (error response, False) if the
+            payload is not valid UTF-8
+        """
+        try:
+            return payload.decode('utf-8').strip(), True
+        except UnicodeDecodeError as e:
+            logger.error(f"Invalid UTF-8 data from {client_address}: {e}")
+            return b"ERROR: Invalid UTF-8 encoding", False
+            
+    @staticmethod
+    def _batch_messages(replies: list) -> List[str]:
+        """Return the messages in a reply list that wait for the batch handler."""
+        return [reply for reply in replies if reply.__class__ is str]
+        
+    def _run_batch(self, messages: List[str]) -> List[str]:
+        """
+        Call the batch handler on messages from one or more connections.
+        
+        A failing handler answers every message of the batch with an error
+        instead of taking the connections down.
+        """
+        try:
+            responses = run_batch(self.batch_handler, messages)
+        except Exception as e:
+            logger.error(f"Batch handler failed on {len(messages)} messages: {e}")
+            responses = ["ERROR: Batch failed"] * len(messages)
+        self.stats['batches'] += 1
+        self.stats['batched_messages'] += len(messages)
+        return responses
+        
+    def _finish_batch(self, codec, replies: list, client_address: tuple, responses) -> list:
+        """
+        Replace the messages in a reply list by their encoded responses.
+        
+        Args:
+            codec: Per-connection protocol codec
+            replies: Reply list returned by _handle_data()
+            client_address: Client address tuple
+            responses: Iterable of responses, consumed one per message
+            
+        Returns:
+            Reply buffers to send in order
+        """
+        responses = iter(responses)
+        finished = []
+        for reply in replies:
+            if reply.__class__ is not str:
+                finished.append(reply)
+                continue
+            response = next(responses)
+            data = response.encode('utf-8')
+            if self.traffic_log is None or self.traffic_log.record(client_address, len(reply), len(data)):
+                logger.info(f"Received from {client_address}: {reply}")
+                logger.info(f"Sent to {client_address}: {response}")
+            finished.extend(self._encode_response(codec.encode_parts, data, client_address))
+        return finished
+        
+    def _encode_response(self, encode_parts, response: bytes, client_address: tuple) -> tuple:
+        """
+        Encode a response, or an error in its place if it is too large for a frame.
+        
+        Uppercasing can lengthen a message, so a reply may outgrow the frame
+        limit its request fit in.
+        
+        Args:
+            encode_parts: Encoder returning the buffers of one frame
+            response: Response payload
+            client_address: Client address tuple
+            
+        Returns:
+            Buffers to send
+        """
+        try:
+            return encode_parts(response)
+        except FrameTooLargeError as e:
+            logger.error(f"Response to {client_address} dropped: {e}")
+            return encode_parts(b"ERROR: Response too large")
+            
+    def _frame_parts(self, payload: bytes) -> Tuple[bytes, bytes]:
+        """Frame a payload for the buffer-pool data path."""
+        return frame_parts(payload, self.max_frame_size)
+        
+    def _respond(self, payload: bytes, client_address: tuple) -> Tuple[bytes, bool]:
+        """
+        Decode one message payload, process it and encode the response.
+        
+        Args:
+            payload: Raw message bytes
+            client_address: Client address tuple
+            
+        Returns:
+            Tuple of (response payload, whether the message was valid UTF-8)
+        """
+        try:
+            message = payload.decode('utf-8').strip()
+        except UnicodeDecodeError as e:
+            logger.error(f"Invalid UTF-8 data from {client_address}: {e}")
+            return b"ERROR: Invalid UTF-8 encoding", False
+            
+        # Process message (convert to uppercase)
+        if self.result_cache is None:
+            response = self._process_message(message)
+        else:
+            response = self.result_cache.get_or_compute(message, self._process_message)
+        reply = response.encode('utf-8')
+        
+        # Without a traffic log every message is logged, otherwise 1 in N
+        if self.traffic_log is None or self.traffic_log.record(client_address, len(payload), len(reply)):
+            logger.info(f"Received from {client_address}: {message}")
+            logger.info(f"Sent to {client_address}: {response}")
+        return reply, True
+        
+    def _handle_client_pooled(self, client_socket: socket.socket, client_address: tuple):
+        """
+        Handle a client connection in buffer-pool mode.
+        
+        Data is received with recv_into() into a slab borrowed from the pool
+        and replies are sent from memoryviews of the same slab.
+        
+        Args:
+            client_socket: Client socket connection
+            client_address: Client address tuple
+        """
+        slab = self._slab_pool.acquire()
+        buffer = slab
+        view = memoryview(buffer)
+        filled = 0
+        output = OutputBuffer()
+        deadline = self._reaper.add((client_socket, client_address)) if self._reaper is not None else None
+        shard = self._open_shard()
+        quickack = self._quickack and is_tcp(client_socket)
+        throttle = self.rate_limiter.open(client_address) if self.rate_limiter is not None else None
+        try:
+            with client_socket:
+                while True:
+                    grown = self._reserve_frame(buffer, filled)
+                    if grown is not None:
+                        view.release()
+                        buffer, view = grown, memoryview(grown)
+                        
+                    received = client_socket.recv_into(view[filled:])
+                    if not received:
+                        if not (deadline and deadline.reason):
+                            logger.info(f"Client {client_address} disconnected")
+                        break
+                    if quickack:
+                        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+                    filled += received
                     
-                    # Send response back to client
-                    client_socket.send(response.encode('utf-8'))
-                    logger.info(f"Sent to {client_address}: {response}")
+                    if shard:
+                        started = time.perf_counter()
+                    consumed, replies, close = self._process_slab(buffer, filled, client_address, shard, throttle)
+                    if deadline:
+                        deadline.touch(consumed < filled, bool(replies))
+                    if shard:
+                        sending = time.perf_counter()
+                        shard.stages['process'].observe(sending - started)
+                    output.extend(replies)
+                    output.flush(client_socket)
+                    if shard:
+                        shard.record_batch(received, replies, started, sending)
+                    if close:
+                        break
+                    if throttle:
+                        self._throttle_thread(throttle)
+                        
+                    # Keep any partial frame at the start of the working buffer
+                    rest = filled - consumed
+                    if buffer is not slab and rest <= len(slab):
+                        slab[:rest] = buffer[consumed:filled]
+                        view.release()
+                        buffer, view = slab, memoryview(slab)
+                    elif rest and consumed:
+                        buffer[:rest] = buffer[consumed:filled]
+                    filled = rest
                     
         except socket.error as e:
-            logger.error(f"Error handling client {client_address}: {e}")
-        except UnicodeDecodeError as e:
-            logger.error(f"Invalid UTF-8 data from {client_address}: {e}")
-            try:
-                error_response = "ERROR: Invalid UTF-8 encoding"
-                client_socket.send(error_response.encode('utf-8'))
-            except:
-                pass
+            if not (deadline and deadline.reason):
+                logger.error(f"Error handling client {client_address}: {e}")
         except Exception as e:
             logger.error(f"Unexpected error with client {client_address}: {e}")
         finally:
+            if deadline:
+                self._reaper.remove(deadline)
+            self._close_shard(shard)
+            if throttle:
+                self.rate_limiter.close(throttle)
+            view.release()
+            self._slab_pool.release(slab)
+            if self.traffic_log:
+                self.traffic_log.forget(client_address)
             logger.info(f"Connection with {client_address} closed")
             
+    def _reserve_frame(self, buffer: bytearray, filled: int) -> Optional[bytearray]:
+        """
+        Return a larger copy of buffer if the pending frame cannot fit in it.
+        
+        Args:
+            buffer: Working receive buffer
+            filled: Number of valid bytes at the start of buffer
+            
+        Returns:
+            A new buffer holding the same data, or None if buffer is large enough
+        """
+        if self.protocol != 'framed' or filled < FRAME_HEADER.size:
+            return None
+        (length,) = FRAME_HEADER.unpack_from(buffer, 0)
+        needed = FRAME_HEADER.size + length
+        if length > self.max_frame_size or needed <= len(buffer):
+            return None
+        grown = bytearray(needed)
+        grown[:filled] = buffer[:filled]
+        return grown
+        
+    def _process_slab(self, buffer: bytearray, end: int, client_address: tuple,
+                      shard=None, throttle: Optional[Throttle] = None) -> Tuple[int, list, bool]:
+        """
+        Process the complete messages held in buffer[:end] without copying them.
+        
+        Stripped ASCII payloads are uppercased in place and their reply is
+        the original bytes, so consecutive frames are answered with a single
+        memoryview of the buffer. Other payloads fall back to _respond().
+        
+        Args:
+            buffer: Receive buffer
+            end: Number of valid bytes in buffer
+            client_address: Client address tuple
+            shard: Metrics shard counting the processed messages
+            throttle: Rate limit buckets charged for the processed messages
+            
+        Returns:
+            Tuple of (bytes consumed, replies to send in order, close flag)
+        """
+        view = memoryview(buffer)
+        
+        if self.protocol == 'text':
+            if shard:
+                shard.messages += 1
+            if throttle:
+                throttle.charge(1, end)
+            start, stop = 0, end
+            while start < stop and buffer[start] in ASCII_WHITESPACE:
+                start += 1
+            while stop > start and buffer[stop - 1] in ASCII_WHITESPACE:
+                stop -= 1
+            if self._inplace_upper and stop > start and upper_ascii_in_place(buffer, start, stop):
+                logger.debug("Uppercased %d bytes in place for %s", stop - start, client_address)
+                if self.traffic_log:
+                    self.traffic_log.record(client_address, end, stop - start)
+                return end, [view[start:stop]], False
+            response, valid = self._respond(bytes(view[:end]), client_address)
+            return end, [response], not valid
+            
+        header_size = FRAME_HEADER.size
+        replies = []
+        position = run_start = messages = 0
+        while end - position >= header_size:
+            (length,) = FRAME_HEADER.unpack_from(buffer, position)
+            if length > self.max_frame_size:
+                logger.error(f"Oversized frame from {client_address}: {length} bytes")
+                if run_start < position:
+                    replies.append(view[run_start:position])
+                replies.append(encode_frame(b"ERROR: Frame too large"))
+                if shard:
+                    shard.messages += messages
+                return position, replies, True
+                
+            payload_start = position + header_size
+            frame_end = payload_start + length
+            if frame_end > end:
+                break
+                
+            if not (self._inplace_upper and is_stripped(buffer, payload_start, frame_end)
+                    and upper_ascii_in_place(buffer, payload_start, frame_end)):
+                # Close the in-place run and answer this frame the regular way
+                if run_start < position:
+                    replies.append(view[run_start:position])
+                response, _ = self._respond(bytes(view[payload_start:frame_end]), client_address)
+                replies.extend(self._encode_response(self._frame_parts, response, client_address))
+                run_start = frame_end
+            elif self.traffic_log:
+                self.traffic_log.record(client_address, length, length)
+            position = frame_end
+            messages += 1
+            
+        if run_start < position:
+            logger.debug("Answered %d bytes of frames in place for %s", position - run_start, client_address)
+            replies.append(view[run_start:position])
+        if shard:
+            shard.messages += messages
+        if throttle:
+            throttle.charge(messages, position)
+        return position, replies, False
+        
+    def _serve_epoll(self):
+        """
+        Event loop for the epoll engine.
+        
+        All client sockets are multiplexed on a single selector. A socket
+        pair acts as a self-pipe so that shutdown() wakes the loop
+        immediately instead of relying on accept() timeouts.
+        """
+        self._selector = selectors.DefaultSelector()
+        if self.metrics is not None:
+            self._loop_shard = self.metrics.shard()
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(False)
+        self._wakeup_writer.setblocking(False)
+        
+        for listener in self._listeners():
+            listener.setblocking(False)
+            self._selector.register(listener, selectors.EVENT_READ, None)
+        self._selector.register(self._wakeup_reader, selectors.EVENT_READ, None)
+        
+        reaper = self._reaper
+        while self.running:
+            # Wake up every tick while connections have timeouts pending
+            timeout = reaper.tick if reaper is not None and len(reaper) else None
+            if self._draining:
+                timeout = min(timeout or DRAIN_POLL_INTERVAL, DRAIN_POLL_INTERVAL)
+            if self._deferred:
+                wait = max(0.0, self._deferred[0][0] - time.monotonic())
+                timeout = wait if timeout is None else min(timeout, wait)
+            if self._held:
+                wait = max(0.0, self._held_since + self.batch_delay - time.monotonic())
+                timeout = wait if timeout is None else min(timeout, wait)
+            ready = self._selector.select(timeout)
+            if self.rate_limiter is not None and len(ready) > 1:
+                # Start each pass at a different connection, so that none
+                # is always served first; each gets one read per pass
+                turn = self._turn % len(ready)
+                ready = ready[turn:] + ready[:turn]
+                self._turn += 1
+            for key, mask in ready:
+                if key.fileobj is self._wakeup_reader:
+                    self._drain_wakeup()
+                elif key.data is None:
+                    self._accept_ready(key.fileobj)
+                else:
+                    connection = key.data
+                    if mask & selectors.EVENT_READ:
+                        self._read_ready(connection)
+                    if mask & selectors.EVENT_WRITE and connection.sock.fileno() != -1:
+                        self._write_ready(connection)
+            if self._held and time.monotonic() >= self._held_since + self.batch_delay:
+                self._flush_batch()
+            if self._deferred:
+                self._resume_reads()
+            if reaper is not None:
+                for deadline in reaper.expire():
+                    self._count_reaped(deadline, deadline.item.address)
+                    self._close_connection(deadline.item)
+            if self._draining and self._drained_epoll():
+                break
+                
+    def _drained_epoll(self) -> bool:
+        """
+        Stop polling the listening socket while draining.
+        
+        Returns:
+            True once no connection is open or the drain time is up
+        """
+        if self.server_socket in self._selector.get_map():
+            for listener in self._listeners():
+                self._selector.unregister(listener)
+            logger.info(f"Stopped accepting, draining connections for up to {self.drain_timeout:g}s")
+        # Only the wakeup socket is left once every connection has closed,
+        # apart from connections unregistered while their reads are deferred
+        drained = len(self._selector.get_map()) <= 1 and not any(
+            connection.resume_at is not None for _, _, connection in self._deferred)
+        return drained or time.monotonic() >= self._drain_deadline
+                        
+    def _drain_wakeup(self):
+        """Consume pending wakeup bytes from the self-pipe."""
+        try:
+            while self._wakeup_reader.recv(RECV_BUFFER_SIZE):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+            
+    def _accept_ready(self, listener: socket.socket):
+        """
+        Accept every pending connection on a listening socket.
+        
+        Args:
+            listener: TCP or Unix domain listening socket
+        """
+        while True:
+            try:
+                client_socket, client_address = listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except socket.error as e:
+                if self.running:
+                    logger.error(f"Socket error: {e}")
+                return
+                
+            client_address = peer_address(client_socket, client_address)
+            logger.info(f"New connection from {client_address}")
+            client_socket.setblocking(False)
+            if self.tuning is not None:
+                tune_connection(client_socket, self.tuning)
+            if self.ssl_context is not None:
+                if self.tuning is None:
+                    set_nodelay(client_socket)
+                # The handshake is driven by readiness events like any other I/O
+                client_socket = self.ssl_context.wrap_socket(client_socket, server_side=True,
+                                                             do_handshake_on_connect=False)
+            connection = _Connection(client_socket, client_address, self._new_codec(),
+                                     self._quickack and is_tcp(client_socket))
+            if self.rate_limiter is not None:
+                connection.throttle = self.rate_limiter.open(client_address)
+            if self._reaper is not None:
+                connection.deadline = self._reaper.add(connection)
+            if self._loop_shard:
+                self._loop_shard.opened += 1
+            self._selector.register(client_socket, selectors.EVENT_READ, connection)
+            
+    def _read_ready(self, connection: _Connection):
+        """
+        Handle a readable client socket.
+        
+        Args:
+            connection: State of the readable connection
+        """
+        if self._slab_pool is not None:
+            self._read_ready_pooled(connection)
+            return
+        if connection.handshaking:
+            self._continue_handshake(connection)
+            return
+            
+        try:
+            data = connection.sock.recv(self.recv_buffer_size)
+            if connection.tls and connection.sock.pending():
+                # Decrypted bytes left in the TLS buffer raise no readiness event
+                data += connection.sock.recv(connection.sock.pending())
+        except (BlockingIOError, InterruptedError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            return
+        except socket.error as e:
+            logger.error(f"Error handling client {connection.address}: {e}")
+            self._close_connection(connection)
+            return
+            
+        if not data:
+            logger.info(f"Client {connection.address} disconnected")
+            self._close_connection(connection)
+            return
+        if connection.quickack:
+            connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+            
+        shard = self._loop_shard
+        if shard:
+            started = time.perf_counter()
+        replies, close = self._handle_data(connection.codec, data, connection.address, shard, connection.throttle)
+        if connection.deadline:
+            connection.deadline.touch(connection.codec.buffered > 0, bool(replies))
+        connection.close_after_flush = close
+        if connection.throttle:
+            self._defer_read(connection)
+        if self.batch_handler is not None and self._hold_batch(connection, replies, len(data),
+                                                               started if shard else 0.0):
+            # Nothing is written until the batch is handled, so stop polling
+            # a deferred connection for reads now
+            self._watch(connection)
+            return
+        if shard:
+            sending = time.perf_counter()
+        self._queue_replies(connection, replies)
+        if shard:
+            shard.record_batch(len(data), replies, started, sending)
+            
+    def _hold_batch(self, connection: _Connection, replies: list, received: int, started: float) -> bool:
+        """
+        Hold the replies of a read until the batch handler has answered its messages.
+        
+        The batch is handled once it is full, otherwise after the current
+        pass over ready connections once batch_delay has passed.
+        
+        Args:
+            connection: Connection the replies belong to
+            replies: Reply list returned by _handle_data()
+            received: Bytes read, for the metrics
+            started: perf_counter() value when the data arrived
+            
+        Returns:
+            False if the replies can be sent at once: no message of the
+            read waits for the handler and none of the connection's
+            earlier replies are held
+        """
+        pending = len(self._batch_messages(replies))
+        if not pending and connection not in self._held_connections:
+            return False
+        if not self._held:
+            self._held_since = time.monotonic()
+        # Later replies of a connection wait behind its held ones, to stay in order
+        self._held.append((connection, replies, received, started))
+        self._held_connections.add(connection)
+        self._held_messages += pending
+        if self._held_messages >= self.batch_size:
+            self._flush_batch()
+        return True
+        
+    def _flush_batch(self):
+        """Answer every held message with one batch handler call and queue the replies."""
+        held, self._held = self._held, []
+        self._held_connections.clear()
+        self._held_messages = 0
+        messages = [reply for _, replies, _, _ in held for reply in self._batch_messages(replies)]
+        responses = iter(self._run_batch(messages))
+        shard = self._loop_shard
+        for connection, replies, received, started in held:
+            replies = self._finish_batch(connection.codec, replies, connection.address, responses)
+            if connection.sock.fileno() == -1:
+                # Closed while its replies were held
+                continue
+            if shard:
+                sending = time.perf_counter()
+            self._queue_replies(connection, replies)
+            if shard:
+                shard.record_batch(received, replies, started, sending)
+        
+    def _read_ready_pooled(self, connection: _Connection):
+        """
+        Handle a readable client socket in buffer-pool mode.
+        
+        The event loop owns one slab shared by all connections. Only partial
+        frames and unsent replies are copied out of it.
+        
+        Args:
+            connection: State of the readable connection
+        """
+        if self._loop_slab is None:
+            self._loop_slab = self._slab_pool.acquire()
+        buffer = self._loop_slab
+        
+        filled = 0
+        if connection.inbuf:
+            filled = len(connection.inbuf)
+            if filled >= len(buffer):
+                buffer = bytearray(filled + self.recv_buffer_size)
+            buffer[:filled] = connection.inbuf
+            grown = self._reserve_frame(buffer, filled)
+            if grown is not None:
+                buffer = grown
+                
+        view = memoryview(buffer)
+        try:
+            received = connection.sock.recv_into(view[filled:])
+        except (BlockingIOError, InterruptedError):
+            return
+        except socket.error as e:
+            logger.error(f"Error handling client {connection.address}: {e}")
+            self._close_connection(connection)
+            return
+            
+        if not received:
+            logger.info(f"Client {connection.address} disconnected")
+            self._close_connection(connection)
+            return
+        if connection.quickack:
+            connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        filled += received
+        
+        shard = self._loop_shard
+        if shard:
+            started = time.perf_counter()
+        consumed, replies, close = self._process_slab(buffer, filled, connection.address, shard,
+                                                      connection.throttle)
+        connection.inbuf = bytes(view[consumed:filled]) if consumed < filled else None
+        if connection.deadline:
+            connection.deadline.touch(consumed < filled, bool(replies))
+        connection.close_after_flush = close
+        if connection.throttle:
+            self._defer_read(connection)
+        if shard:
+            sending = time.perf_counter()
+            shard.stages['process'].observe(sending - started)
+        self._queue_replies(connection, replies)
+        if shard:
+            shard.record_batch(received, replies, started, sending)
+        # Whatever the socket refused must not point into the shared slab
+        connection.outbuf.own()
+        
+    def _continue_handshake(self, connection: _Connection):
+        """
+        Advance the TLS handshake of a connection as far as its socket allows.
+        
+        Args:
+            connection: Connection whose handshake is in progress
+        """
+        try:
+            connection.sock.do_handshake()
+        except ssl.SSLWantReadError:
+            self._selector.modify(connection.sock, selectors.EVENT_READ, connection)
+            return
+        except ssl.SSLWantWriteError:
+            self._selector.modify(connection.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, connection)
+            return
+        except (ssl.SSLError, OSError) as e:
+            self._handshake_failed(connection.address, e)
+            self._close_connection(connection)
+            return
+        connection.handshaking = False
+        self._count_handshake(connection.sock)
+        self._watch(connection)
+        if connection.sock.pending():
+            # The client's first message arrived with the end of the handshake
+            self._read_ready(connection)
+            
+    def _queue_replies(self, connection: _Connection, replies: list):
+        """
+        Queue a batch of replies and try to send them in one write.
+        
+        Args:
+            connection: Destination connection
+            replies: Reply buffers in send order
+        """
+        connection.outbuf.extend(replies)
+        self._write_ready(connection)
+        
+    def _write_ready(self, connection: _Connection):
+        """
+        Flush as much buffered output as the socket accepts.
+        
+        Args:
+            connection: Connection with pending output
+        """
+        if connection.handshaking:
+            self._continue_handshake(connection)
+            return
+        try:
+            connection.outbuf.flush(connection.sock)
+        except socket.error as e:
+            logger.error(f"Error handling client {connection.address}: {e}")
+            self._close_connection(connection)
+            return
+            
+        if not connection.outbuf and connection.close_after_flush:
+            self._close_connection(connection)
+            return
+        self._watch(connection)
+        
+    def _watch(self, connection: _Connection):
+        """
+        Poll a connection for reads unless they are deferred, and for writes while output is pending.
+        
+        Reads also pause while more than max_buffered reply bytes wait to
+        be sent, so a client that does not read its replies cannot make
+        the server buffer without bound. A connection waiting for neither
+        is unregistered until its reads resume.
+        
+        Args:
+            connection: Open connection
+        """
+        reading = connection.resume_at is None and len(connection.outbuf) <= self.max_buffered
+        events = selectors.EVENT_READ if reading else 0
+        if connection.outbuf:
+            events |= selectors.EVENT_WRITE
+        key = self._selector.get_map().get(connection.sock)
+        if key is None:
+            if events:
+                self._selector.register(connection.sock, events, connection)
+        elif not events:
+            self._selector.unregister(connection.sock)
+        elif key.events != events:
+            self._selector.modify(connection.sock, events, connection)
+            
+    def _defer_read(self, connection: _Connection):
+        """
+        Stop reading from a connection that is over its rate limit until its buckets have refilled.
+        
+        The kernel's receive buffer then fills up and TCP flow control
+        holds the client back, while other connections keep being served.
+        
+        Args:
+            connection: Connection whose messages were just charged
+        """
+        delay = connection.throttle.delay()
+        if delay > 0:
+            connection.resume_at = time.monotonic() + delay
+            heapq.heappush(self._deferred, (connection.resume_at, next(self._deferred_order), connection))
+            self.stats['reads_deferred'] += 1
+            
+    def _resume_reads(self):
+        """Poll connections for reads again once their deferral is over."""
+        now = time.monotonic()
+        deferred = self._deferred
+        while deferred and deferred[0][0] <= now:
+            _, _, connection = heapq.heappop(deferred)
+            if connection.resume_at is None:
+                continue  # closed meanwhile
+            connection.resume_at = None
+            self._watch(connection)
+            
+    def _close_connection(self, connection: _Connection):
+        """
+        Unregister and close a client connection.
+        
+        Args:
+            connection: Connection to close
+        """
+        try:
+            self._selector.unregister(connection.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            connection.sock.close()
+        except Exception:
+            pass
+        if connection.deadline:
+            self._reaper.remove(connection.deadline)
+        if connection.throttle:
+            self.rate_limiter.close(connection.throttle)
+            connection.throttle = None
+        connection.resume_at = None
+        if self._loop_shard:
+            self._loop_shard.closed += 1
+        if self.traffic_log:
+            self.traffic_log.forget(connection.address)
+        logger.info(f"Connection with {connection.address} closed")
+        
+    def _count_reaped(self, deadline: ConnectionDeadline, client_address):
+        """
+        Record a connection closed by a timeout.
+        
+        Args:
+            deadline: Expired connection state
+            client_address: Client address tuple
+        """
+        logger.info(f"Reaping {client_address}: {deadline.reason} timeout")
+        self.stats['connections_reaped'] += 1
+        self.stats[f'reaped_{deadline.reason}'] += 1
+        
+    def _reap_socket(self, deadline: ConnectionDeadline):
+        """
+        Close an expired connection of the threaded engine from the reaper thread.
+        
+        Shutting the socket down wakes the handler thread blocked in recv().
+        
+        Args:
+            deadline: Expired connection state
+        """
+        client_socket, client_address = deadline.item
+        self._count_reaped(deadline, client_address)
+        try:
+            client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+            
     def _process_message(self, message: str) -> str:
         """
         Process incoming message and return response.
@@ -154,27 +1721,610 @@ class SocketServer:
         # Simple transformation: convert to uppercase
         return message.upper()
         
+    def _cached_process_message(self, message: str) -> str:
+        """Return _process_message(message), from the result cache if there is one."""
+        if self.result_cache is None:
+            return self._process_message(message)
+        return self.result_cache.get_or_compute(message, self._process_message)
+        
+    def _process_chunk(self, chunk: bytes) -> bytes:
+        """
+        Process one piece of a streamed message and return its part of the response.
+        
+        Pieces always end on a character boundary. Unlike _process_message(),
+        pieces are not stripped, since their whitespace is part of the message.
+        
+        Args:
+            chunk: UTF-8 text of the piece
+            
+        Returns:
+            Processed response bytes
+        """
+        if chunk.isascii():
+            return chunk.upper()
+        # Replies are already under way, so invalid bytes are replaced rather than refused
+        return chunk.decode('utf-8', 'replace').upper().encode('utf-8')
+        
     def shutdown(self):
         """Gracefully shutdown the server."""
         logger.info("Shutting down server...")
         self.running = False
         
-        if self.server_socket:
+        if self._wakeup_writer:
+            # Wake the event loop; it closes its own sockets on exit
             try:
-                self.server_socket.close()
-            except Exception as e:
-                logger.error(f"Error closing server socket: {e}")
+                self._wakeup_writer.send(b'\0')
+            except (BlockingIOError, OSError):
+                pass
+            return
+            
+        for sock in (self.server_socket, self.unix_listener):
+            if sock:
+                try:
+                    sock.close()
+                except Exception as e:
+                    logger.error(f"Error closing server socket: {e}")
                 
     def cleanup(self):
         """Clean up resources."""
         logger.info("Cleaning up server resources...")
+        self._close_handoff()
+        self._close_stats()
         
+        if self._selector:
+            for key in list(self._selector.get_map().values()):
+                if isinstance(key.data, _Connection):
+                    self._close_connection(key.data)
+            self._selector.close()
+            self._selector = None
+            if self._loop_slab is not None:
+                self._slab_pool.release(self._loop_slab)
+                self._loop_slab = None
+            
+            for sock in (self.server_socket, self._wakeup_reader, self._wakeup_writer):
+                if sock:
+                    sock.close()
+            self._wakeup_reader = self._wakeup_writer = None
+        self._close_unix()
+            
+        # Stop pool workers and close connections still waiting for one
+        if self._pending_connections is not None:
+            while True:
+                try:
+                    item = self._pending_connections.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[0].close()
+            for _ in range(self.max_workers):
+                self._pending_connections.put(None)
+                
+        if self._reaper is not None:
+            self._reaper.stop()
+            
         # Wait for client threads to finish (with timeout)
-        for thread in self.client_threads:
+        with self._threads_lock:
+            threads = list(self.client_threads)
+        for thread in threads:
             if thread.is_alive():
                 thread.join(timeout=1.0)
                 
+        if self.traffic_log:
+            self.traffic_log.stop()
+        logger.info("Server shutdown complete")
+        
+    def _close_stats(self):
+        """Stop the metrics endpoint."""
+        if self._stats_listener is not None:
+            self._stats_listener.close()
+            self._stats_listener = None
+            
+    def _close_unix(self):
+        """Close the Unix domain listener and remove its socket file."""
+        if self.unix_listener is not None:
+            self.unix_listener.close()
+            unlink_unix_listener(self.unix_path, self._unix_bound)
+            self.unix_listener = None
+            
+    def _close_handoff(self):
+        """Stop serving takeover requests and drop an unfinished takeover."""
+        if self._handoff is not None:
+            self._handoff.close()
+            self._handoff = None
+        if self._takeover_control is not None:
+            self._takeover_control.close()
+            self._takeover_control = None
+
+
+def resolve_loop_factory(name: str = 'auto') -> Callable[[], asyncio.AbstractEventLoop]:
+    """
+    Return a factory for the requested asyncio event loop implementation.
+    
+    Args:
+        name: 'asyncio' for the standard loop, 'uvloop' to require uvloop,
+            or 'auto' to use uvloop when it is installed
+            
+    Returns:
+        Callable creating a new event loop
+    """
+    if name not in EVENT_LOOPS:
+        raise ValueError(f"Unknown event loop '{name}', expected one of {EVENT_LOOPS}")
+    if name == 'uvloop' and uvloop is None:
+        raise ValueError("uvloop event loop requested but uvloop is not installed")
+    if name != 'asyncio' and uvloop is not None:
+        return uvloop.new_event_loop
+    return asyncio.new_event_loop
+
+
+class AsyncSocketServer(SocketServer):
+    """asyncio-based TCP Socket Server sharing SocketServer message semantics."""
+    
+    def __init__(self, host: str = 'localhost', port: int = 8080, backlog: int = 5,
+                 protocol: str = 'text', max_frame_size: int = DEFAULT_MAX_FRAME_SIZE,
+                 loop_factory: Optional[Callable[[], asyncio.AbstractEventLoop]] = None,
+                 drain_timeout: float = 1.0, reuse_port: bool = False,
+                 traffic_log: Optional[TrafficLog] = None, idle_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None, max_lifetime: Optional[float] = None,
+                 timeout_tick: float = DEFAULT_TICK, handoff_path: Optional[str] = None,
+                 takeover: bool = False, stats_port: Optional[int] = None,
+                 compression: Optional[Sequence[str]] = None,
+                 compression_threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+                 compression_dict: bytes = DEFAULT_DICTIONARY, unix_socket: Optional[str] = None,
+                 unix_mode: int = DEFAULT_UNIX_MODE, tuning: Optional[Union[str, TuningProfile]] = None,
+                 result_cache: Optional[ResultCache] = None, rate_limiter: Optional[RateLimiter] = None,
+                 max_buffered: int = DEFAULT_MAX_BUFFERED,
+                 batch_handler: Optional[Union[str, BatchHandler]] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, batch_delay: float = 0.0,
+                 ssl_context: Optional[ssl.SSLContext] = None):
+        """
+        Initialize the asyncio socket server.
+        
+        Args:
+            host: Server host address
+            port: Server port number
+            backlog: Maximum number of pending connections in the listen queue
+            protocol: Wire protocol, 'text', 'framed' or 'binary'
+            max_frame_size: Largest accepted frame payload in bytes
+            loop_factory: Callable creating the event loop used by start();
+                defaults to uvloop when installed, else the asyncio loop
+            drain_timeout: Seconds to wait for open connections on shutdown
+            reuse_port: Set SO_REUSEPORT on the listening socket
+            traffic_log: Sample per-message logs and log periodic summaries
+            idle_timeout: Close connections that send nothing for this many seconds
+            read_timeout: Seconds a started message may take to arrive in full
+            max_lifetime: Close connections open for longer than this many seconds
+            timeout_tick: Resolution in seconds of the timeout timing wheel
+            handoff_path: Unix domain socket path on which a replacement
+                process can take over the listening socket
+            takeover: Take the listening socket over from the server at
+                handoff_path instead of binding the port
+            stats_port: Serve live metrics in Prometheus text format over
+                HTTP on this port (0 picks a free port)
+            compression: Compression modes clients may negotiate, most
+                preferred first (framed protocol); None disables negotiation
+            compression_threshold: Smallest reply in bytes that is compressed
+            compression_dict: Preset dictionary for the zlib-dict mode
+            unix_socket: Also accept connections on this Unix domain socket,
+                given as unix:///path or a plain path
+            unix_mode: Permission bits of the Unix domain socket file
+            tuning: Name of a tuning profile or a TuningProfile; its backlog
+                replaces backlog and its options are set on TCP connections
+            result_cache: Answer repeated messages from this cache; all
+                connections share the event loop, so it needs no lock
+            rate_limiter: Hold connections and source IPs to message and
+                byte rates by deferring reads from clients over their limit;
+                connections also yield to each other after every read
+            max_buffered: Largest chunk of a streamed message accepted
+                (framed protocol); replies are bounded by writer.drain()
+            batch_handler: Handle messages in batches with this handler,
+                'scalar', 'upper' or a callable taking and returning a list
+            batch_size: Most messages in one batch
+            batch_delay: Seconds a batch stays open for more messages; 0
+                batches what the connections read in one loop iteration
+            ssl_context: Serve TLS with this server context; asyncio
+                performs the handshakes
+        """
+        super().__init__(host, port, backlog=backlog, protocol=protocol,
+                         max_frame_size=max_frame_size, reuse_port=reuse_port,
+                         traffic_log=traffic_log, idle_timeout=idle_timeout,
+                         read_timeout=read_timeout, max_lifetime=max_lifetime,
+                         timeout_tick=timeout_tick, handoff_path=handoff_path,
+                         takeover=takeover, drain_timeout=drain_timeout,
+                         stats_port=stats_port, compression=compression,
+                         compression_threshold=compression_threshold,
+                         compression_dict=compression_dict, unix_socket=unix_socket,
+                         unix_mode=unix_mode, tuning=tuning, rate_limiter=rate_limiter,
+                         max_buffered=max_buffered, batch_handler=batch_handler,
+                         batch_size=batch_size, batch_delay=batch_delay, ssl_context=ssl_context)
+        self.engine = 'asyncio'
+        self.result_cache = result_cache
+        if self.batch_handler is not None:
+            self._batcher = AsyncMicroBatcher(self._run_batch, batch_size, batch_delay)
+        self.loop_factory = loop_factory or resolve_loop_factory('auto')
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._unix_server: Optional[asyncio.AbstractServer] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._connection_tasks = set()
+        self._reap_task: Optional[asyncio.Task] = None
+        
+    def start(self):
+        """Start the server on a new event loop and block until shutdown."""
+        loop = self.loop_factory()
+        try:
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.serve())
+        except Exception as e:
+            logger.error(f"Server error: {e}")
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+            
+    async def serve(self):
+        """
+        Serve clients on the running event loop until shutdown() is called.
+        
+        This coroutine can be awaited directly to embed the server in an
+        existing asyncio application.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        
+        listener = self._take_over_listener() if self.takeover else None
+        if listener is None and self.tuning is not None:
+            # Bind here so the buffer sizes are set before listen()
+            listener = self._create_listener()
+        if listener is not None:
+            self._server = await asyncio.start_server(
+                self._handle_connection, sock=listener, backlog=self.backlog, **self._tls_options()
+            )
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_connection, self.host, self.port,
+                backlog=self.backlog, reuse_address=True, reuse_port=self.reuse_port or None,
+                **self._tls_options()
+            )
+            logger.info(f"Server bound to {self.host}:{self.port}")
+            logger.info("Server listening for connections...")
+        try:
+            self._bind_unix()
+        except OSError:
+            self._server.close()
+            raise
+        if self.unix_listener is not None:
+            self._unix_server = await asyncio.start_unix_server(self._handle_connection, sock=self.unix_listener,
+                                                                **self._tls_options())
+        self.running = True
+        if self.traffic_log:
+            self.traffic_log.start()
+        if self._reaper is not None:
+            self._reap_task = asyncio.ensure_future(self._reap_loop())
+        if self.metrics is not None:
+            self._loop_shard = self.metrics.shard()
+        self._start_stats()
+        
+        try:
+            self.setup_signal_handlers()
+        except (ValueError, RuntimeError, NotImplementedError) as e:
+            # Signal handlers can only be set in main thread on Unix
+            logger.debug(f"Could not set signal handlers: {e}")
+            
+        try:
+            self._start_handoff(self._server.sockets[0].fileno)
+            await self._stop_event.wait()
+        finally:
+            self._remove_signal_handlers()
+            await self._close()
+            
+    def _tls_options(self) -> dict:
+        """Return the start_server() arguments that wrap connections in TLS, if configured."""
+        if self.ssl_context is None:
+            return {}
+        return {'ssl': self.ssl_context, 'ssl_handshake_timeout': TLS_HANDSHAKE_TIMEOUT}
+        
+    def setup_signal_handlers(self):
+        """Set up event loop signal handlers for graceful shutdown."""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self._loop.add_signal_handler(signum, self._signal_handler, signum, None)
+            
+    def _remove_signal_handlers(self):
+        """Remove the signal handlers installed by setup_signal_handlers()."""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.remove_signal_handler(signum)
+            except (ValueError, RuntimeError, NotImplementedError):
+                pass
+                
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Handle individual client connection.
+        
+        Args:
+            reader: Stream reading from the client
+            writer: Stream writing to the client
+        """
+        client_address = peer_address(writer.get_extra_info('socket'), writer.get_extra_info('peername'))
+        logger.info(f"New connection from {client_address}")
+        task = asyncio.current_task()
+        self._connection_tasks.add(task)
+        tls_object = writer.get_extra_info('ssl_object')
+        if tls_object is not None:
+            # asyncio has completed the handshake before calling this handler
+            self._count_handshake(tls_object)
+        codec = self._new_codec()
+        deadline = self._reaper.add((writer, client_address)) if self._reaper is not None else None
+        shard = self._loop_shard
+        if shard:
+            shard.opened += 1
+        sock = writer.get_extra_info('socket')
+        if self.tuning is not None:
+            # After asyncio's own TCP_NODELAY
+            tune_connection(sock, self.tuning)
+        quickack = self._quickack and is_tcp(sock)
+        throttle = self.rate_limiter.open(client_address) if self.rate_limiter is not None else None
+        
+        try:
+            while True:
+                data = await reader.read(self.recv_buffer_size)
+                if not data:
+                    if not (deadline and deadline.reason):
+                        logger.info(f"Client {client_address} disconnected")
+                    break
+                if quickack:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+                    
+                if shard:
+                    started = time.perf_counter()
+                replies, close = self._handle_data(codec, data, client_address, shard, throttle)
+                if self._batcher is not None:
+                    messages = self._batch_messages(replies)
+                    if messages:
+                        replies = self._finish_batch(codec, replies, client_address,
+                                                     await self._batcher.submit(messages))
+                if deadline:
+                    deadline.touch(codec.buffered > 0, bool(replies))
+                if shard:
+                    sending = time.perf_counter()
+                if replies:
+                    writer.writelines(replies)
+                    await writer.drain()
+                if shard:
+                    shard.record_batch(len(data), replies, started, sending)
+                if close:
+                    break
+                if throttle:
+                    delay = throttle.delay()
+                    if delay > 0:
+                        self.stats['reads_deferred'] += 1
+                    # A read of buffered data does not yield, so yield here
+                    # even when under the limit to let other connections run
+                    await asyncio.sleep(delay)
+                
+        except asyncio.CancelledError:
+            pass
+        except (ConnectionError, OSError) as e:
+            if not (deadline and deadline.reason):
+                logger.error(f"Error handling client {client_address}: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error with client {client_address}: {e}")
+        finally:
+            if deadline:
+                self._reaper.remove(deadline)
+            if shard:
+                shard.closed += 1
+            if throttle:
+                self.rate_limiter.close(throttle)
+            self._connection_tasks.discard(task)
+            writer.close()
+            if self.traffic_log:
+                self.traffic_log.forget(client_address)
+            logger.info(f"Connection with {client_address} closed")
+            
+    async def _reap_loop(self):
+        """Expire timed-out connections every wheel tick by aborting their transports."""
+        while True:
+            await asyncio.sleep(self._reaper.tick)
+            for deadline in self._reaper.expire():
+                writer, client_address = deadline.item
+                self._count_reaped(deadline, client_address)
+                writer.transport.abort()
+                
+    async def _close(self):
+        """Stop accepting, drain open connections and cancel stragglers."""
+        logger.info("Cleaning up server resources...")
+        self.running = False
+        self._close_handoff()
+        self._close_stats()
+        self._server.close()
+        if self._unix_server is not None:
+            self._unix_server.close()
+        if self._reap_task:
+            self._reap_task.cancel()
+            self._reap_task = None
+        
+        if self._connection_tasks:
+            _, pending = await asyncio.wait(set(self._connection_tasks), timeout=self.drain_timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+                
+        await self._server.wait_closed()
+        if self._unix_server is not None:
+            await self._unix_server.wait_closed()
+            self._unix_server = None
+        self._close_unix()
+        if self.traffic_log:
+            self.traffic_log.stop()
         logger.info("Server shutdown complete")
+                
+    def _listening_socket(self):
+        """Return the listening socket, or None when not listening."""
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0]
+        
+    def stop_accepting(self):
+        """Stop accepting after a handoff; open connections get drain_timeout seconds."""
+        logger.info(f"Stopped accepting, draining connections for up to {self.drain_timeout:g}s")
+        self.shutdown()
+        
+    def shutdown(self):
+        """Gracefully shutdown the server; safe to call from any thread."""
+        logger.info("Shutting down server...")
+        self.running = False
+        
+        loop, stop_event = self._loop, self._stop_event
+        if loop is None or stop_event is None or loop.is_closed():
+            return
+        try:
+            if asyncio.get_running_loop() is loop:
+                stop_event.set()
+                return
+        except RuntimeError:
+            pass
+        loop.call_soon_threadsafe(stop_event.set)
+
+
+class PreforkServer:
+    """Supervisor running N forked server processes that share a port via SO_REUSEPORT."""
+    
+    def __init__(self, server_factory: Callable[[], SocketServer], workers: int,
+                 restart_delay: float = 0.5, drain_timeout: float = 10.0):
+        """
+        Initialize the pre-fork supervisor.
+        
+        Args:
+            server_factory: Creates the server run by each worker process;
+                the server must be created with reuse_port=True
+            workers: Number of worker processes
+            restart_delay: Seconds to wait before restarting a crashed worker
+            drain_timeout: Seconds workers get to drain on shutdown before
+                they are killed
+        """
+        if not hasattr(os, 'fork'):
+            raise ValueError("Pre-fork mode requires os.fork()")
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+            
+        self.server_factory = server_factory
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.drain_timeout = drain_timeout
+        self.running = False
+        self.children: Dict[int, int] = {}  # pid -> worker slot
+        self.restarts = 0
+        
+    def setup_signal_handlers(self):
+        """Set up signal handlers that forward shutdown to the workers."""
+        signal.signal(signal.SIGINT, self._signal_handler)
+        signal.signal(signal.SIGTERM, self._signal_handler)
+        
+    def _signal_handler(self, signum, frame):
+        """Handle shutdown signals gracefully."""
+        logger.info(f"Supervisor received signal {signum}, draining workers...")
+        self.shutdown()
+        
+    def start(self):
+        """Fork the workers and supervise them until shutdown."""
+        self.running = True
+        self.setup_signal_handlers()
+        
+        for slot in range(self.workers):
+            self._spawn(slot)
+        logger.info(f"Supervisor {os.getpid()} started {self.workers} workers")
+        
+        try:
+            self._supervise()
+        finally:
+            self._reap_remaining()
+            logger.info("Supervisor shutdown complete")
+            
+    def _spawn(self, slot: int):
+        """
+        Fork one worker process.
+        
+        Args:
+            slot: Worker index, kept across restarts
+        """
+        pid = os.fork()
+        if pid == 0:
+            # Child: run a server with default signal handling, never return
+            exit_code = 0
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                server = self.server_factory()
+                server.start()
+            except BaseException as e:
+                logger.error(f"Worker {slot} failed: {e}")
+                exit_code = 1
+            finally:
+                stop_logging()
+                logging.shutdown()
+                os._exit(exit_code)
+                
+        self.children[pid] = slot
+        logger.info(f"Started worker {slot} (pid {pid})")
+        
+    def _supervise(self):
+        """Reap exited workers and restart them while running."""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.1)
+                continue
+                
+            slot = self.children.pop(pid, None)
+            if slot is None:
+                continue
+            if self.running:
+                exit_code = os.waitstatus_to_exitcode(status)
+                logger.error(f"Worker {slot} (pid {pid}) exited unexpectedly "
+                             f"with code {exit_code}, restarting")
+                self.restarts += 1
+                time.sleep(self.restart_delay)
+                if self.running:
+                    self._spawn(slot)
+            else:
+                logger.info(f"Worker {slot} (pid {pid}) exited")
+                
+    def _reap_remaining(self):
+        """Wait for draining workers, killing any that exceed the drain timeout."""
+        deadline = time.monotonic() + self.drain_timeout
+        while self.children:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.children.pop(pid, None)
+            elif time.monotonic() > deadline:
+                for child in list(self.children):
+                    logger.warning(f"Worker pid {child} did not drain in time, killing")
+                    self._signal_children(signal.SIGKILL, [child])
+                deadline = float('inf')
+            else:
+                time.sleep(0.05)
+        self.children.clear()
+        
+    def _signal_children(self, signum: int, pids=None):
+        """Send a signal to worker processes, ignoring ones already gone."""
+        for pid in list(pids if pids is not None else self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+                
+    def shutdown(self):
+        """Stop restarting workers and forward SIGTERM so they drain."""
+        if not self.running:
+            return
+        self.running = False
+        self._signal_children(signal.SIGTERM)
 
 
 def main():
@@ -184,23 +2334,218 @@ def main():
     parser = argparse.ArgumentParser(description='TCP Socket Server')
     parser.add_argument('--host', default='localhost', help='Server host (default: localhost)')
     parser.add_argument('--port', type=int, default=8080, help='Server port (default: 8080)')
+    parser.add_argument('--unix', default=None, metavar='ADDRESS',
+                        help='Also accept connections on a Unix domain socket, e.g. unix:///tmp/socket_server.sock')
+    parser.add_argument('--unix-mode', type=lambda value: int(value, 8), default=DEFAULT_UNIX_MODE,
+                        metavar='MODE', help=f'Octal permissions of the --unix socket file (default: {DEFAULT_UNIX_MODE:o})')
+    parser.add_argument('--engine', choices=ENGINES + ('asyncio',), default='threaded',
+                        help='Connection handling engine (default: threaded)')
+    parser.add_argument('--loop', choices=EVENT_LOOPS, default='auto',
+                        help='Event loop for the asyncio engine; auto uses uvloop if installed (default: auto)')
+    parser.add_argument('--backlog', type=int, default=None,
+                        help='Listen queue size for pending connections (default: 5, or the --tuning profile\'s)')
+    parser.add_argument('--tuning', choices=TUNING_PROFILES, default=None,
+                        help='Socket tuning profile: latency (TCP_NODELAY, TCP_QUICKACK), throughput '
+                             '(Nagle, 4 MiB buffers) or default (kernel defaults); latency and throughput '
+                             'also set keepalive and a 4096 backlog (default: no profile)')
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='text',
+                        help='Wire protocol: text, 4-byte length-prefixed framed, or binary '
+                             'with opcode headers (default: text)')
+    parser.add_argument('--max-frame-size', type=int, default=DEFAULT_MAX_FRAME_SIZE,
+                        help=f'Largest accepted frame payload in bytes (default: {DEFAULT_MAX_FRAME_SIZE})')
+    parser.add_argument('--max-buffered', type=int, default=DEFAULT_MAX_BUFFERED,
+                        help='Largest chunk of a streamed message, and unsent reply bytes at which '
+                             f'a connection stops being read (default: {DEFAULT_MAX_BUFFERED})')
+    parser.add_argument('--max-workers', type=int, default=None,
+                        help='Fixed worker pool size for the threaded engine (default: one thread per connection)')
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help='Accepted connections that may wait for a free worker (default: 0)')
+    parser.add_argument('--overflow', choices=OVERFLOW_POLICIES, default=None,
+                        help='When the pool is full: reply "ERROR: busy" or leave clients in the listen backlog (default: reject)')
+    parser.add_argument('--compression', nargs='+', choices=COMPRESSION_MODES, default=None, metavar='MODE',
+                        help='Compression modes clients may negotiate, most preferred first: '
+                             'zlib-dict, zlib, none (framed protocol; default: no negotiation)')
+    parser.add_argument('--compression-threshold', type=int, default=DEFAULT_COMPRESSION_THRESHOLD,
+                        help=f'Smallest reply in bytes that is compressed (default: {DEFAULT_COMPRESSION_THRESHOLD})')
+    parser.add_argument('--compression-dict', default=None, metavar='PATH',
+                        help='File holding the preset dictionary for zlib-dict (default: built-in)')
+    parser.add_argument('--cache-entries', type=int, default=None,
+                        help='Cache up to this many message results and answer repeats from the cache '
+                             '(default: no cache)')
+    parser.add_argument('--cache-bytes', type=int, default=None,
+                        help='Also bound the result cache by memory in bytes (default: entries only)')
+    parser.add_argument('--cache-ttl', type=float, default=None,
+                        help='Seconds a cached result stays valid (default: until evicted)')
+    parser.add_argument('--cache-policy', choices=CACHE_POLICIES, default='lru',
+                        help='lru admits every result; tinylfu only admits results requested more often '
+                             'than the entry they would evict (default: lru)')
+    parser.add_argument('--conn-msg-rate', type=float, default=None,
+                        help='Messages per second allowed per connection; faster clients are read '
+                             'less often (default: unlimited)')
+    parser.add_argument('--conn-byte-rate', type=float, default=None,
+                        help='Received bytes per second allowed per connection (default: unlimited)')
+    parser.add_argument('--ip-msg-rate', type=float, default=None,
+                        help='Messages per second allowed across all connections of a client IP '
+                             '(default: unlimited)')
+    parser.add_argument('--ip-byte-rate', type=float, default=None,
+                        help='Received bytes per second allowed across all connections of a client IP '
+                             '(default: unlimited)')
+    parser.add_argument('--rate-burst', type=float, default=1.0,
+                        help='Seconds of its rate limits a client may use in one burst (default: 1.0)')
+    parser.add_argument('--batch-handler', choices=BATCH_HANDLERS, default=None,
+                        help="Handle messages in batches: 'scalar' calls the uppercase transform per message, "
+                             "'upper' uppercases a whole batch at once (default: one call per message)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Most messages in one batch (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--batch-delay', type=float, default=0.0,
+                        help='Seconds a batch waits for messages from other connections '
+                             '(default: 0, batch what one wakeup has read)')
+    parser.add_argument('--tls-cert', default=None, metavar='PEM',
+                        help='Serve TLS with this certificate chain (default: plaintext)')
+    parser.add_argument('--tls-key', default=None, metavar='PEM',
+                        help='Private key of --tls-cert, if not in the same file')
+    parser.add_argument('--tls-tickets', type=int, default=DEFAULT_TICKETS,
+                        help=f'Session tickets sent per full TLS handshake; 0 disables resumption '
+                             f'(default: {DEFAULT_TICKETS})')
+    parser.add_argument('--buffer-pool', action='store_true',
+                        help='Receive into pooled slabs and transform ASCII payloads in place')
+    parser.add_argument('--slab-size', type=int, default=DEFAULT_SLAB_SIZE,
+                        help=f'Size of each pooled receive slab in bytes (default: {DEFAULT_SLAB_SIZE})')
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help='Close connections idle for this many seconds (default: never)')
+    parser.add_argument('--read-timeout', type=float, default=None,
+                        help='Close connections that take longer than this many seconds to send '
+                             'a message they started (default: never)')
+    parser.add_argument('--max-lifetime', type=float, default=None,
+                        help='Close connections open for longer than this many seconds (default: never)')
+    parser.add_argument('--handoff-socket', default=None, metavar='PATH',
+                        help='Unix socket on which a new server process can take over the listening socket')
+    parser.add_argument('--takeover', action='store_true',
+                        help='Take the listening socket over from the server running at --handoff-socket, '
+                             'which then stops accepting and drains')
+    parser.add_argument('--drain-timeout', type=float, default=30.0,
+                        help='Seconds open connections get to finish after a takeover (default: 30)')
+    parser.add_argument('--stats-port', type=int, default=None,
+                        help='Serve live metrics in Prometheus text format on this HTTP port (default: off)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Fork this many server processes sharing the port via SO_REUSEPORT')
+    parser.add_argument('--log-mode', choices=LOG_MODES, default='sync',
+                        help='sync: log on request threads; queue: log from a background thread; '
+                             'sampled: queue plus 1-in-N message logs and periodic summaries (default: sync)')
+    parser.add_argument('--log-sample', type=int, default=DEFAULT_SAMPLE_RATE,
+                        help=f'In sampled mode, log 1 in N messages per connection (default: {DEFAULT_SAMPLE_RATE})')
+    parser.add_argument('--log-interval', type=float, default=DEFAULT_SUMMARY_INTERVAL,
+                        help=f'In sampled mode, seconds between throughput summaries (default: {DEFAULT_SUMMARY_INTERVAL:g})')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
     
     args = parser.parse_args()
+    if args.takeover and args.handoff_socket is None:
+        parser.error("--takeover requires --handoff-socket")
+    if args.handoff_socket is not None and args.workers is not None:
+        parser.error("--handoff-socket cannot be combined with --workers")
+    if args.stats_port is not None and args.workers is not None:
+        parser.error("--stats-port cannot be combined with --workers")
+    if args.unix is not None and (args.workers is not None or args.handoff_socket is not None):
+        parser.error("--unix cannot be combined with --workers or --handoff-socket")
+    if args.engine == 'asyncio':
+        # Worker pools and slab receives are implemented by the threaded and epoll engines only
+        pool_options = {'--max-workers': args.max_workers, '--max-pending': args.max_pending,
+                        '--overflow': args.overflow, '--buffer-pool': args.buffer_pool or None,
+                        '--slab-size': args.slab_size if args.slab_size != DEFAULT_SLAB_SIZE else None}
+        given = [flag for flag, value in pool_options.items() if value is not None]
+        if given:
+            parser.error(f"{', '.join(given)} cannot be combined with --engine asyncio")
+    if args.max_pending is None:
+        args.max_pending = 0
+    if args.overflow is None:
+        args.overflow = 'reject'
+    if args.buffer_pool and args.protocol == 'binary':
+        parser.error("--buffer-pool supports the text and framed protocols only")
+    if args.compression is not None and (args.protocol != 'framed' or args.buffer_pool):
+        parser.error("--compression requires --protocol framed and cannot be combined with --buffer-pool")
+    if args.tls_key is not None and args.tls_cert is None:
+        parser.error("--tls-key requires --tls-cert")
+    if args.tls_cert is not None and args.buffer_pool:
+        parser.error("--tls-cert cannot be combined with --buffer-pool")
+    compression_dict = DEFAULT_DICTIONARY
+    if args.compression_dict is not None:
+        with open(args.compression_dict, 'rb') as dict_file:
+            compression_dict = dict_file.read()
     
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
+    configure_logging(args.log_mode)
+    
+    reuse_port = args.workers is not None
+    tuning = get_profile(args.tuning) if args.tuning is not None else None
+    if tuning is not None and args.backlog is not None:
+        tuning = tuning._replace(backlog=args.backlog)
+    backlog = args.backlog if args.backlog is not None else 5
+    limits = (args.conn_msg_rate, args.conn_byte_rate, args.ip_msg_rate, args.ip_byte_rate)
+    rate_limits = limits if any(limit is not None for limit in limits) else None
+    # Created before forking so every worker holds the same session ticket key
+    ssl_context = None
+    if args.tls_cert is not None:
+        ssl_context = server_context(args.tls_cert, args.tls_key, args.tls_tickets)
     
-    # Create and start server
-    server = SocketServer(args.host, args.port)
+    def create_server():
+        traffic_log = None
+        if args.log_mode == 'sampled':
+            traffic_log = TrafficLog(args.log_sample, args.log_interval, name='Client')
+        result_cache = None
+        if args.cache_entries is not None:
+            # Only the threaded engine touches the cache from several threads
+            cache_class = SynchronizedResultCache if args.engine == 'threaded' else ResultCache
+            result_cache = cache_class(args.cache_entries, args.cache_bytes, args.cache_ttl, args.cache_policy)
+        rate_limiter = None
+        if rate_limits:
+            rate_limiter = RateLimiter(*rate_limits, burst=args.rate_burst)
+        if args.engine == 'asyncio':
+            return AsyncSocketServer(args.host, args.port, backlog=backlog,
+                                     protocol=args.protocol, max_frame_size=args.max_frame_size,
+                                     loop_factory=resolve_loop_factory(args.loop),
+                                     reuse_port=reuse_port, traffic_log=traffic_log,
+                                     idle_timeout=args.idle_timeout, read_timeout=args.read_timeout,
+                                     max_lifetime=args.max_lifetime, handoff_path=args.handoff_socket,
+                                     takeover=args.takeover, drain_timeout=args.drain_timeout,
+                                     stats_port=args.stats_port, compression=args.compression,
+                                     compression_threshold=args.compression_threshold,
+                                     compression_dict=compression_dict, unix_socket=args.unix,
+                                     unix_mode=args.unix_mode, tuning=tuning, result_cache=result_cache,
+                                     rate_limiter=rate_limiter, max_buffered=args.max_buffered,
+                                     batch_handler=args.batch_handler, batch_size=args.batch_size,
+                                     batch_delay=args.batch_delay, ssl_context=ssl_context)
+        return SocketServer(args.host, args.port, engine=args.engine, backlog=backlog,
+                            protocol=args.protocol, max_frame_size=args.max_frame_size,
+                            max_workers=args.max_workers, max_pending=args.max_pending,
+                            overflow=args.overflow, reuse_port=reuse_port,
+                            buffer_pool=args.buffer_pool, slab_size=args.slab_size,
+                            traffic_log=traffic_log, idle_timeout=args.idle_timeout,
+                            read_timeout=args.read_timeout, max_lifetime=args.max_lifetime,
+                            handoff_path=args.handoff_socket, takeover=args.takeover,
+                            drain_timeout=args.drain_timeout, stats_port=args.stats_port,
+                            compression=args.compression, compression_threshold=args.compression_threshold,
+                            compression_dict=compression_dict, unix_socket=args.unix, unix_mode=args.unix_mode,
+                            tuning=tuning, result_cache=result_cache, rate_limiter=rate_limiter,
+                            max_buffered=args.max_buffered, batch_handler=args.batch_handler,
+                            batch_size=args.batch_size, batch_delay=args.batch_delay,
+                            ssl_context=ssl_context)
     
     try:
+        # Create and start server
+        if args.workers is not None:
+            server = PreforkServer(create_server, args.workers)
+        else:
+            server = create_server()
+            
         server.start()
     except KeyboardInterrupt:
         logger.info("Keyboard interrupt received")
     except Exception as e:
         logger.error(f"Server failed to start: {e}")
         sys.exit(1)
+    finally:
+        stop_logging()
 
 
 if __name__ == '__main__':
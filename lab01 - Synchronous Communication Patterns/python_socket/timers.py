@@ -0,0 +1,366 @@
+"""
+Connection timeouts enforced with a hierarchical timing wheel.
+
+Every connection gets a single wheel entry instead of a timer of its own.
+The wheel is advanced one tick at a time: each tick only looks at one
+slot of the lowest level, and every 2**bits ticks the next slot of the
+level above is cascaded down, so the cost per tick does not depend on
+how many connections are tracked.
+
+Activity rarely touches the wheel. Connections record when they were last
+active, and an entry that fires early is simply rescheduled at the
+connection's real deadline; only the start of a message, which can bring
+the read deadline forward, moves the entry. Timeouts fire at most one
+tick late.
+
+- idle: no data received for this many seconds
+- read: a partially received message not completed within this many
+  seconds of its first byte (slow senders trickling bytes)
+- lifetime: connection open for longer than this many seconds
+"""
+import math
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+# Reasons a connection can be reaped for
+TIMEOUT_REASONS = ('idle', 'read', 'lifetime')
+
+# Wheel resolution in seconds
+DEFAULT_TICK = 0.1
+
+# 4 levels of 64 slots span 64**4 ticks (about 19 days at 0.1 s)
+DEFAULT_WHEEL_BITS = 6
+DEFAULT_WHEEL_LEVELS = 4
+
+
+class _Timer:
+    """Wheel entry; bucket is the slot holding it, None once fired or cancelled."""
+
+    __slots__ = ('item', 'expires', 'bucket')
+
+    def __init__(self, item, expires: int):
+        self.item = item
+        self.expires = expires
+        self.bucket = None
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel with O(1) schedule and cancel.
+
+    Not thread-safe; callers sharing a wheel between threads must lock.
+    """
+
+    def __init__(self, tick: float = DEFAULT_TICK, bits: int = DEFAULT_WHEEL_BITS,
+                 levels: int = DEFAULT_WHEEL_LEVELS, now: Optional[float] = None):
+        """
+        Initialize the wheel.
+
+        Args:
+            tick: Seconds per tick
+            bits: log2 of the number of slots per level
+            levels: Number of levels
+            now: Current monotonic time (defaults to time.monotonic())
+        """
+        if tick <= 0:
+            raise ValueError("tick must be positive")
+        if bits < 1 or levels < 1:
+            raise ValueError("bits and levels must be at least 1")
+
+        self.tick = tick
+        self._bits = bits
+        self._mask = (1 << bits) - 1
+        self._levels = [[set() for _ in range(1 << bits)] for _ in range(levels)]
+        # Entries further out are parked in the top level and re-placed on cascade
+        self._horizon = (1 << (bits * levels)) - 1
+        self.current = self.tick_of(time.monotonic() if now is None else now)
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Number of scheduled entries."""
+        return self._count
+
+    def tick_of(self, when: float) -> int:
+        """Return the tick containing a monotonic time."""
+        return math.floor(when / self.tick)
+
+    def schedule(self, item, deadline: float) -> _Timer:
+        """
+        Schedule an item to fire at the first tick at or after deadline.
+
+        Args:
+            item: Object returned by advance() when the entry fires
+            deadline: Monotonic time in seconds
+
+        Returns:
+            Handle for cancel()
+        """
+        timer = _Timer(item, max(math.ceil(deadline / self.tick), self.current + 1))
+        self._place(timer)
+        self._count += 1
+        return timer
+
+    def cancel(self, timer: _Timer):
+        """
+        Remove a scheduled entry; does nothing if it already fired.
+
+        Args:
+            timer: Handle returned by schedule()
+        """
+        if timer.bucket is not None:
+            timer.bucket.discard(timer)
+            timer.bucket = None
+            self._count -= 1
+
+    def advance(self, now: float) -> List:
+        """
+        Move the wheel up to now and return the items that fired.
+
+        Args:
+            now: Current monotonic time
+
+        Returns:
+            Items of every entry whose tick has been reached
+        """
+        target = self.tick_of(now)
+        expired = []
+        levels, bits, mask = self._levels, self._bits, self._mask
+
+        while self.current < target:
+            if not self._count:
+                self.current = target
+                break
+            self.current += 1
+            current = self.current
+
+            # Cascade the next slot of each level whose lower level wrapped
+            level = 1
+            while level < len(levels) and not current & ((1 << (bits * level)) - 1):
+                bucket = levels[level][(current >> (bits * level)) & mask]
+                if bucket:
+                    timers = list(bucket)
+                    bucket.clear()
+                    for timer in timers:
+                        self._place(timer)
+                level += 1
+
+            bucket = levels[0][current & mask]
+            if bucket:
+                for timer in bucket:
+                    timer.bucket = None
+                    expired.append(timer.item)
+                self._count -= len(bucket)
+                bucket.clear()
+        return expired
+
+    def _place(self, timer: _Timer):
+        """Put an entry in the slot matching its distance from the current tick."""
+        expires = min(timer.expires, self.current + self._horizon)
+        delta = expires - self.current
+        level = 0
+        while level < len(self._levels) - 1 and delta >> (self._bits * (level + 1)):
+            level += 1
+        bucket = self._levels[level][(expires >> (self._bits * level)) & self._mask]
+        bucket.add(timer)
+        timer.bucket = bucket
+
+
+class ConnectionDeadline:
+    """Timeout state of one tracked connection."""
+
+    __slots__ = ('reaper', 'item', 'opened', 'active', 'partial_since', 'reason', 'timer')
+
+    def __init__(self, reaper: 'ConnectionReaper', item, now: float):
+        self.reaper = reaper
+        self.item = item
+        self.opened = now
+        self.active = now
+        self.partial_since: Optional[float] = None
+        # Set to one of TIMEOUT_REASONS when the connection is reaped
+        self.reason: Optional[str] = None
+        self.timer: Optional[_Timer] = None
+
+    def touch(self, partial: bool = False, completed: bool = True):
+        """
+        Record that data was received.
+
+        Args:
+            partial: Bytes of an unfinished message are still buffered
+            completed: At least one message was completed by this data
+        """
+        now = time.monotonic()
+        self.active = now
+        if not partial:
+            self.partial_since = None
+        elif completed or self.partial_since is None:
+            self.partial_since = now
+            self.reaper.message_started(self)
+
+
+class ConnectionReaper:
+    """
+    Idle, read and lifetime timeouts for many connections on one timing wheel.
+
+    add(), remove() and expire() may be called from different threads. In
+    the threaded engine start() runs expire() on a background thread; event
+    loops call expire() themselves after each poll.
+    """
+
+    def __init__(self, idle_timeout: Optional[float] = None, read_timeout: Optional[float] = None,
+                 max_lifetime: Optional[float] = None, tick: float = DEFAULT_TICK):
+        """
+        Initialize the reaper.
+
+        Args:
+            idle_timeout: Seconds without received data before a connection is closed
+            read_timeout: Seconds a partially received message may take to complete
+            max_lifetime: Seconds a connection may stay open in total
+            tick: Timing wheel resolution in seconds
+        """
+        timeouts = [t for t in (idle_timeout, read_timeout, max_lifetime) if t is not None]
+        if not timeouts:
+            raise ValueError("At least one timeout must be set")
+        if any(t <= 0 for t in timeouts):
+            raise ValueError("Timeouts must be positive")
+
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
+        self.max_lifetime = max_lifetime
+        # How long to wait before looking again at a connection no timeout applies to yet
+        self._recheck = min(timeouts)
+        self.wheel = TimingWheel(tick)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def tick(self) -> float:
+        """Timing wheel resolution in seconds."""
+        return self.wheel.tick
+
+    def __len__(self) -> int:
+        """Number of tracked connections."""
+        return len(self.wheel)
+
+    def add(self, item) -> ConnectionDeadline:
+        """
+        Start tracking a connection.
+
+        Args:
+            item: Object identifying the connection to the caller
+
+        Returns:
+            State to touch() on activity and pass to remove() on close
+        """
+        state = ConnectionDeadline(self, item, time.monotonic())
+        with self._lock:
+            self._schedule(state, state.opened)
+        return state
+
+    def remove(self, state: ConnectionDeadline):
+        """
+        Stop tracking a connection.
+
+        Args:
+            state: State returned by add()
+        """
+        with self._lock:
+            self.wheel.cancel(state.timer)
+
+    def message_started(self, state: ConnectionDeadline):
+        """
+        Move a connection's entry forward if its read deadline is now the earliest.
+
+        Args:
+            state: Connection that started receiving a message
+        """
+        if self.read_timeout is None:
+            return
+        with self._lock:
+            timer = state.timer
+            if timer.bucket is not None and \
+                    state.partial_since + self.read_timeout < timer.expires * self.wheel.tick:
+                self.wheel.cancel(timer)
+                self._schedule(state, state.partial_since)
+
+    def deadline(self, state: ConnectionDeadline) -> Tuple[float, Optional[str]]:
+        """
+        Return the earliest deadline of a connection and the timeout behind it.
+
+        Args:
+            state: Connection state
+
+        Returns:
+            Tuple of (monotonic deadline, reason), or (inf, None) if no
+            timeout currently applies
+        """
+        deadline, reason = math.inf, None
+        if self.idle_timeout is not None:
+            deadline, reason = state.active + self.idle_timeout, 'idle'
+        if self.read_timeout is not None and state.partial_since is not None:
+            if state.partial_since + self.read_timeout < deadline:
+                deadline, reason = state.partial_since + self.read_timeout, 'read'
+        if self.max_lifetime is not None and state.opened + self.max_lifetime < deadline:
+            deadline, reason = state.opened + self.max_lifetime, 'lifetime'
+        return deadline, reason
+
+    def expire(self, now: Optional[float] = None) -> List[ConnectionDeadline]:
+        """
+        Advance the wheel and return connections whose deadline has passed.
+
+        Entries that fire before their connection's real deadline, because
+        it was active since they were scheduled, are rescheduled instead.
+
+        Args:
+            now: Current monotonic time (defaults to time.monotonic())
+
+        Returns:
+            Expired connection states, with reason set; they are no longer tracked
+        """
+        now = time.monotonic() if now is None else now
+        reaped = []
+        with self._lock:
+            for state in self.wheel.advance(now):
+                deadline, reason = self.deadline(state)
+                if deadline <= now:
+                    state.reason = reason
+                    reaped.append(state)
+                else:
+                    self._schedule(state, now)
+        return reaped
+
+    def _schedule(self, state: ConnectionDeadline, now: float):
+        """Put a connection on the wheel at its deadline."""
+        deadline, reason = self.deadline(state)
+        if reason is None:
+            deadline = now + self._recheck
+        state.timer = self.wheel.schedule(state, deadline)
+
+    def start(self, on_expire: Callable[[ConnectionDeadline], None]):
+        """
+        Run expire() every tick on a background thread.
+
+        Args:
+            on_expire: Called with each expired connection state
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(on_expire,),
+                                        name='connection-reaper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, on_expire: Callable[[ConnectionDeadline], None]):
+        """Reaper thread body."""
+        while not self._stop_event.wait(self.tick):
+            for state in self.expire():
+                on_expire(state)
@@ -0,0 +1,125 @@
+"""
+TLS contexts and self-signed certificates.
+
+The server wraps every accepted connection in TLS from one SSLContext,
+and the client wraps its socket before the first message. A full
+handshake costs a key exchange and a certificate check, so both ends
+support session resumption:
+
+- The server sends session tickets after each handshake (TLS 1.3). A
+  ticket is encrypted with a key held by the server's SSLContext, which
+  is all the server-side session state; OpenSSL's session cache counts
+  resumed handshakes in SSLContext.session_stats()['hits']. Prefork
+  workers share the context's ticket key when the context is created
+  before the workers are forked.
+- The client keeps the session of its last connection and offers it on
+  the next connect(), which then skips the certificate exchange.
+
+Certificates for tests and benchmarks are self-signed and generated with
+the openssl command-line tool.
+"""
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+from typing import Optional, Tuple
+
+# Session tickets sent after each full handshake; each can resume one connection
+DEFAULT_TICKETS = 2
+
+HAS_OPENSSL_CLI = shutil.which('openssl') is not None
+
+# openssl req -newkey arguments per certificate key type
+KEY_TYPES = {
+    'ec': ['ec', '-pkeyopt', 'ec_paramgen_curve:prime256v1'],
+    'rsa': ['rsa:2048'],
+}
+
+
+def server_context(certfile: str, keyfile: Optional[str] = None, tickets: int = DEFAULT_TICKETS) -> ssl.SSLContext:
+    """
+    Create the context a server wraps accepted connections with.
+
+    Args:
+        certfile: PEM certificate chain
+        keyfile: PEM private key; None if certfile holds it too
+        tickets: Session tickets sent per full handshake; 0 disables resumption
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.load_cert_chain(certfile, keyfile)
+    context.num_tickets = tickets
+    if not tickets:
+        context.options |= ssl.OP_NO_TICKET
+    return context
+
+
+def client_context(cafile: Optional[str] = None, verify: bool = True) -> ssl.SSLContext:
+    """
+    Create the context a client wraps its connections with.
+
+    Args:
+        cafile: PEM certificates to trust, such as a self-signed server
+            certificate; None trusts the system's certificate authorities
+        verify: Check the server certificate and host name
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    if not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif cafile is not None:
+        context.load_verify_locations(cafile)
+    else:
+        context.load_default_certs()
+    return context
+
+
+def set_nodelay(sock: socket.socket):
+    """
+    Send small TLS writes at once on a TCP socket.
+
+    The last handshake flight and the first message are separate writes,
+    and without tickets nothing else is sent in between, so Nagle's
+    algorithm would hold the message until the peer's delayed ACK.
+    """
+    if sock.family in (socket.AF_INET, socket.AF_INET6):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+def generate_self_signed(directory: str, hostname: str = 'localhost', days: int = 30,
+                         key_type: str = 'ec') -> Tuple[str, str]:
+    """
+    Write a self-signed certificate and its private key to a directory.
+
+    The certificate is valid for hostname, localhost and 127.0.0.1, and
+    clients trust it by passing it as cafile to client_context().
+
+    Args:
+        directory: Existing directory receiving cert.pem and key.pem
+        hostname: Host name the certificate is issued to
+        days: Validity period
+        key_type: 'ec' (P-256, quick to generate) or 'rsa' (2048 bits,
+            costlier full handshakes, like most CA-issued certificates)
+
+    Returns:
+        Tuple of (certificate path, private key path)
+
+    Raises:
+        ValueError: If key_type is unknown
+        RuntimeError: If the openssl command is unavailable or fails
+    """
+    if key_type not in KEY_TYPES:
+        raise ValueError(f"Unknown key type '{key_type}', expected one of {tuple(KEY_TYPES)}")
+    if not HAS_OPENSSL_CLI:
+        raise RuntimeError("Generating certificates needs the openssl command")
+    certfile = os.path.join(directory, 'cert.pem')
+    keyfile = os.path.join(directory, 'key.pem')
+    names = ','.join(dict.fromkeys([f'DNS:{hostname}', 'DNS:localhost', 'IP:127.0.0.1']))
+    command = ['openssl', 'req', '-x509', '-newkey', *KEY_TYPES[key_type], '-nodes',
+               '-keyout', keyfile, '-out', certfile, '-days', str(days), '-subj', f'/CN={hostname}', '-addext', f'subjectAltName={names}']
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode:
+        raise RuntimeError(f"openssl failed: {result.stderr.decode(errors='replace').strip()}")
+    return certfile, keyfile
@@ -0,0 +1,146 @@
+"""
+Unix domain socket addresses and listeners.
+
+Clients on the same host as the server can skip the loopback TCP stack by
+connecting to a Unix domain socket. Such endpoints are written as URLs
+with an absolute path,
+
+    unix:///run/socket_server.sock
+
+and can be passed wherever a host is expected; the port is then ignored.
+A server keeps its TCP listener and serves the Unix domain socket next
+to it.
+"""
+import errno
+import os
+import socket
+import stat
+from typing import Optional, Tuple
+
+UNIX_SCHEME = 'unix://'
+
+HAS_UNIX_SOCKETS = hasattr(socket, 'AF_UNIX')
+
+# Owner and group may connect; connecting needs write permission on the file
+DEFAULT_UNIX_MODE = 0o660
+
+
+def parse_unix_address(address: str) -> Optional[str]:
+    """
+    Return the socket path of a unix:// address.
+
+    Args:
+        address: Host name, IP address or unix:///path URL
+
+    Returns:
+        The path, or None if address is not a unix:// URL
+
+    Raises:
+        ValueError: If the URL has no absolute path
+    """
+    if not address.startswith(UNIX_SCHEME):
+        return None
+    path = address[len(UNIX_SCHEME):]
+    if not path.startswith('/'):
+        raise ValueError(f"Expected unix:///absolute/path, got '{address}'")
+    return path
+
+
+def format_address(host: str, port: int) -> str:
+    """Return an endpoint for log messages, without the port for Unix domain sockets."""
+    return host if host.startswith(UNIX_SCHEME) else f"{host}:{port}"
+
+
+def remove_stale_socket(path: str):
+    """
+    Remove a socket file left behind by a server that is no longer running.
+
+    Args:
+        path: Socket path about to be bound
+
+    Raises:
+        OSError: With EADDRINUSE if a server still accepts on path, or
+            EEXIST if path exists but is not a socket
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(errno.EEXIST, f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        # Nobody listens any more
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    else:
+        raise OSError(errno.EADDRINUSE, f"Another server is listening on {path}")
+    finally:
+        probe.close()
+
+
+def bind_unix_listener(path: str, backlog: int, mode: int = DEFAULT_UNIX_MODE) -> Tuple[socket.socket, os.stat_result]:
+    """
+    Create a listening Unix domain socket, replacing a stale socket file.
+
+    The file gets its mode before listen(), so no client can connect
+    while it still has the default permissions.
+
+    Args:
+        path: Filesystem path of the socket
+        backlog: Maximum number of pending connections in the listen queue
+        mode: Permission bits of the socket file
+
+    Returns:
+        Tuple of (listening socket, stat of the bound file); pass the stat
+        to unlink_unix_listener() on shutdown
+    """
+    remove_stale_socket(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        os.chmod(path, mode)
+        sock.listen(backlog)
+        return sock, os.stat(path)
+    except BaseException:
+        sock.close()
+        raise
+
+
+def unlink_unix_listener(path: str, bound: os.stat_result):
+    """
+    Remove the socket file of a closed listener unless another server has replaced it.
+
+    Args:
+        path: Filesystem path of the socket
+        bound: Stat returned by bind_unix_listener()
+    """
+    try:
+        current = os.lstat(path)
+    except OSError:
+        return
+    if (current.st_dev, current.st_ino) == (bound.st_dev, bound.st_ino):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def peer_address(sock, address) -> tuple:
+    """
+    Return a client address usable as a per-connection key.
+
+    Unix domain socket clients are unnamed, so every one of them reports
+    the same empty address; they are told apart by file descriptor.
+
+    Args:
+        sock: Accepted socket
+        address: Address returned by accept() or the peername
+    """
+    if address:
+        return address
+    return ('unix', sock.fileno())
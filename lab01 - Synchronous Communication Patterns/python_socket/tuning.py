@@ -0,0 +1,133 @@
+"""
+Named socket tuning profiles.
+
+A profile bundles the listen backlog with the TCP options that trade
+latency against throughput:
+
+    backlog    accept queue length; Linux caps it at net.core.somaxconn
+    nodelay    TCP_NODELAY: send small writes at once instead of holding
+               them back until earlier data is acknowledged (Nagle)
+    quickack   TCP_QUICKACK (Linux): acknowledge at once instead of
+               delaying up to 40 ms; the kernel keeps clearing it, so the
+               server re-arms it after every read
+    sndbuf     SO_SNDBUF in bytes
+    rcvbuf     SO_RCVBUF in bytes; set before listen()/connect() so the
+               TCP window scale is negotiated for it
+    keepalive  (idle, interval, count) for SO_KEEPALIVE probes, so dead
+               peers are noticed
+
+None leaves an option at the kernel's (or asyncio's) default. Options
+only apply to TCP sockets; Unix domain sockets keep only the backlog.
+
+    default     backlog 5 and kernel defaults, as before profiles existed
+    latency     Nagle and delayed ACKs off, large backlog, quick keepalive
+    throughput  Nagle on to coalesce small writes, 4 MiB buffers
+"""
+import logging
+import socket
+from collections import namedtuple
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+TuningProfile = namedtuple('TuningProfile', ('name', 'backlog', 'nodelay', 'quickack', 'sndbuf', 'rcvbuf',
+                                             'keepalive'))
+
+PROFILES = {
+    'default': TuningProfile('default', backlog=5, nodelay=None, quickack=None, sndbuf=None, rcvbuf=None,
+                             keepalive=None),
+    'latency': TuningProfile('latency', backlog=4096, nodelay=True, quickack=True, sndbuf=None, rcvbuf=None,
+                             keepalive=(30, 5, 3)),
+    'throughput': TuningProfile('throughput', backlog=4096, nodelay=False, quickack=None,
+                                sndbuf=4 << 20, rcvbuf=4 << 20, keepalive=(60, 10, 5)),
+}
+
+TUNING_PROFILES = tuple(PROFILES)
+
+HAS_QUICKACK = hasattr(socket, 'TCP_QUICKACK')
+
+SOMAXCONN_PATH = '/proc/sys/net/core/somaxconn'
+
+
+def get_profile(profile: Union[str, TuningProfile]) -> TuningProfile:
+    """Return the profile with the given name; profiles are passed through."""
+    if isinstance(profile, TuningProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown tuning profile '{profile}', expected one of {TUNING_PROFILES}") from None
+
+
+def somaxconn() -> Optional[int]:
+    """Return the kernel's cap on listen backlogs, or None where unknown."""
+    try:
+        with open(SOMAXCONN_PATH) as limit:
+            return int(limit.read())
+    except (OSError, ValueError):
+        return None
+
+
+def is_tcp(sock) -> bool:
+    """True for TCP sockets, which the options of a profile apply to."""
+    return sock.family in (socket.AF_INET, socket.AF_INET6)
+
+
+def set_buffers(sock, profile: TuningProfile):
+    """
+    Set the send and receive buffer sizes of a profile.
+
+    Call on listening sockets before listen(), so accepted sockets inherit
+    them, and on client sockets before connect().
+    """
+    if not is_tcp(sock):
+        return
+    if profile.sndbuf is not None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, profile.sndbuf)
+    if profile.rcvbuf is not None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, profile.rcvbuf)
+
+
+def tune_connection(sock, profile: TuningProfile):
+    """
+    Set the per-connection options of a profile on a connected or accepted socket.
+
+    Options the platform rejects are skipped, so a connection is never
+    lost over tuning.
+
+    Args:
+        sock: Socket, or the transport socket of an asyncio stream
+        profile: Profile to apply
+    """
+    if not is_tcp(sock):
+        return
+    try:
+        _set_connection_options(sock, profile)
+    except OSError as e:
+        logger.debug(f"Could not apply tuning profile {profile.name}: {e}")
+
+
+def _set_connection_options(sock, profile: TuningProfile):
+    """Set the options of tune_connection(), raising on the first one rejected."""
+    if profile.nodelay is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(profile.nodelay))
+    if profile.quickack and HAS_QUICKACK:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+    if profile.keepalive is not None:
+        idle, interval, count = profile.keepalive
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # TCP_KEEPIDLE is called TCP_KEEPALIVE on macOS
+        idle_option = getattr(socket, 'TCP_KEEPIDLE', getattr(socket, 'TCP_KEEPALIVE', None))
+        if idle_option is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, idle_option, idle)
+        if hasattr(socket, 'TCP_KEEPINTVL'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+        if hasattr(socket, 'TCP_KEEPCNT'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+
+
+def check_backlog(backlog: int):
+    """Warn when the kernel will silently shorten a listen backlog."""
+    limit = somaxconn()
+    if limit is not None and backlog > limit:
+        logger.warning(f"Listen backlog {backlog} is capped at net.core.somaxconn = {limit}")
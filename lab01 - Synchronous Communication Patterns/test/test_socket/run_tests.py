@@ -38,7 +38,7 @@ def wait_for_port_free(port, timeout=5):
 def cleanup_environment():
     """Context manager for test environment cleanup."""
     # Kill any existing processes that might be using our test ports
-    test_ports = [8081, 8082, 8083, 8084, 8085, 8086]
+    test_ports = [8081, 8082, 8083, 8084, 8085, 8086, 8087, 8088, 8089, 8090, 8091, 8092, 8093, 8094, 8095, 8096, 8097, 8098, 8099, 8100, 8101, 8102, 8103, 8104, 8105, 8106, 8107, 8108, 8109, 8110, 8111, 8112, 8113, 8114, 8115, 8116]
     
     print("Cleaning up test environment...")
     
@@ -82,6 +82,31 @@ def run_specific_tests():
         ("Integration Tests", ["test_socket.py::TestIntegration::test_basic_communication"]),
         ("Multiple Client Test", ["test_socket.py::TestIntegration::test_multiple_clients"]),
         ("Connection Tests", ["test_socket.py::TestIntegration::test_connection_refused"]),
+        ("Epoll Engine Tests", ["test_socket.py::TestEpollEngine"]),
+        ("Asyncio Server Tests", ["test_socket.py::TestAsyncServer"]),
+        ("Framed Protocol Tests", ["test_socket.py::TestFraming", "test_socket.py::TestFramedProtocol"]),
+        ("Pipelining Tests", ["test_socket.py::TestPipelining"]),
+        ("Worker Pool Tests", ["test_socket.py::TestWorkerPool"]),
+        ("Pre-fork Tests", ["test_socket.py::TestPrefork"]),
+        ("Buffer Pool Tests", ["test_socket.py::TestBufferPool"]),
+        ("Output Buffer Tests", ["test_socket.py::TestOutputBuffer"]),
+        ("Log Mode Tests", ["test_socket.py::TestLogModes"]),
+        ("Client Pool Tests", ["test_socket.py::TestClientPool"]),
+        ("Async Client Tests", ["test_socket.py::TestAsyncClient"]),
+        ("Load Generator Tests", ["test_socket.py::TestLoadGenerator"]),
+        ("Connection Timeout Tests", ["test_socket.py::TestConnectionTimeouts"]),
+        ("Takeover Tests", ["test_socket.py::TestTakeover"]),
+        ("Stats Listener Tests", ["test_socket.py::TestStatsListener"]),
+        ("Compression Tests", ["test_socket.py::TestCompression"]),
+        ("Binary Protocol Tests", ["test_socket.py::TestBinaryProtocol"]),
+        ("Unix Socket Tests", ["test_socket.py::TestUnixSockets"]),
+        ("Tuning Profile Tests", ["test_socket.py::TestTuningProfiles"]),
+        ("Result Cache Tests", ["test_socket.py::TestResultCache"]),
+        ("Rate Limit Tests", ["test_socket.py::TestRateLimits"]),
+        ("Streaming Tests", ["test_socket.py::TestStreaming"]),
+        ("Batching Tests", ["test_socket.py::TestBatching"]),
+        ("Batch Client Tests", ["test_socket.py::TestBatchClient"]),
+        ("TLS Tests", ["test_socket.py::TestTLS"]),
         ("Performance Tests", ["test_socket.py::TestPerformance"]),
     ]
     
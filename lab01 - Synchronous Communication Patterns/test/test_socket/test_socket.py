@@ -1,8 +1,15 @@
 import pytest
+import asyncio
+import io
+import itertools
+import json
+import logging
 import socket
+import ssl
 import threading
 import time
 import subprocess
+import signal
 import sys
 import os
 from unittest.mock import patch, Mock
@@ -11,8 +18,30 @@ from unittest.mock import patch, Mock
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
 sys.path.insert(0, project_root)
 
-from python_socket.server import SocketServer
-from python_socket.client import SocketClient
+# Shared protocol modules are imported by server and client as top-level modules
+socket_dir = os.path.join(project_root, 'python_socket')
+sys.path.insert(0, socket_dir)
+
+from python_socket.server import SocketServer, AsyncSocketServer, resolve_loop_factory
+from python_socket.client import AsyncSocketClient, SocketClient, SocketClientPool, run_batch
+from buffers import OutputBuffer, SlabPool, upper_ascii_in_place
+from compression import CompressingCodec
+from framing import FrameDecoder, FrameTooLargeError, StreamChunk, chunk_parts, encode_frame, utf8_boundary
+from loadgen import LoadGenerator, format_report, parse_payload_spec
+from opcodes import (
+    FLAG_ERROR, FLAG_RESPONSE, OP_ECHO, OP_STATS, OP_UPPER, OP_USER_CREATE, OP_USER_DELETE, OP_USER_GET,
+    OP_USER_LIST, OP_USER_UPDATE, USER_ID, BinaryCodec, OpcodeError, OpcodeRouter, pack_user, unpack_user,
+    unpack_users
+)
+from metrics import HISTOGRAM_BUCKETS, ServerMetrics, bucket_index, bucket_upper_bound
+from logsetup import DeferredQueueHandler, TrafficLog, configure_logging, stop_logging
+from timers import ConnectionReaper, TimingWheel
+from transport import parse_unix_address, remove_stale_socket
+from tuning import PROFILES, get_profile
+from batching import AsyncMicroBatcher, MicroBatcher, bulk_upper, scalar_batch
+from tls import HAS_OPENSSL_CLI, client_context, generate_self_signed, server_context
+from cache import ResultCache, SynchronizedResultCache
+from ratelimit import RateLimiter, TokenBucket
 
 
 class TestSocketServer:
@@ -226,218 +255,2405 @@ class TestIntegration:
         time.sleep(0.1)
 
 
-class TestErrorConditions:
-    """Tests for various error conditions."""
+class TestEpollEngine:
+    """Integration tests for the selector-based event-loop engine."""
     
-    def test_invalid_host(self):
-        """Test client behavior with invalid host."""
-        client = SocketClient('invalid.host.name', 8080)
+    @pytest.fixture
+    def epoll_server(self):
+        """Fixture to start an epoll engine server in a separate thread."""
+        server = SocketServer('localhost', 8087, engine='epoll')
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
         
-        assert client.connect() is False
-        response = client.send_single_message("test")
-        assert response is None
+        for _ in range(20):
+            try:
+                test_socket = socket.create_connection(('localhost', 8087), timeout=0.5)
+                test_socket.close()
+                break
+            except (ConnectionRefusedError, socket.timeout, OSError):
+                time.sleep(0.1)
+        else:
+            server.shutdown()
+            pytest.skip("Epoll server failed to start within timeout")
+            
+        yield server, server_thread
         
-    def test_invalid_port(self):
-        """Test client behavior with invalid port."""
-        client = SocketClient('localhost', 99999)  # Invalid port
+        server.shutdown()
+        server_thread.join(timeout=2.0)
         
-        assert client.connect() is False
+    def test_invalid_engine(self):
+        """Test that unknown engines are rejected."""
+        with pytest.raises(ValueError):
+            SocketServer(engine='bogus')
+            
+    def test_basic_communication(self, epoll_server):
+        """Test request/response and persistent connections on the epoll engine."""
+        client = SocketClient('localhost', 8087)
+        assert client.send_single_message("hello epoll") == "HELLO EPOLL"
         
-    def test_connection_timeout(self):
-        """Test client timeout behavior."""
-        # Use a non-routable IP to simulate timeout
-        client = SocketClient('10.255.255.1', 8080, timeout=1.0)
+        assert client.connect() is True
+        for i in range(5):
+            assert client.send_message(f"message_{i}") == f"MESSAGE_{i}"
+        client.disconnect()
         
+    def test_many_concurrent_connections(self, epoll_server):
+        """Test that one event loop serves many open connections."""
+        connections = [socket.create_connection(('localhost', 8087), timeout=2.0) for _ in range(50)]
+        try:
+            for i, conn in enumerate(connections):
+                conn.sendall(f"client{i}".encode('utf-8'))
+            for i, conn in enumerate(connections):
+                assert conn.recv(1024) == f"CLIENT{i}".encode('utf-8')
+        finally:
+            for conn in connections:
+                conn.close()
+                
+    def test_malformed_input_handling(self, epoll_server):
+        """Test invalid UTF-8 gets an error reply followed by a close."""
+        with socket.create_connection(('localhost', 8087), timeout=2.0) as raw_socket:
+            raw_socket.sendall(b'\xff\xfe\xfd')
+            assert b"ERROR" in raw_socket.recv(1024)
+            assert raw_socket.recv(1024) == b''
+            
+    def test_shutdown_wakes_event_loop(self, epoll_server):
+        """Test shutdown() stops the loop promptly via the self-pipe."""
+        server, server_thread = epoll_server
         start_time = time.time()
-        result = client.connect()
-        end_time = time.time()
-        
-        assert result is False
-        assert end_time - start_time >= 1.0  # Should timeout after 1 second
+        server.shutdown()
+        server_thread.join(timeout=2.0)
         
+        assert not server_thread.is_alive()
+        assert time.time() - start_time < 0.5
+
+
+class TestAsyncServer:
+    """Integration tests for the asyncio-based AsyncSocketServer."""
+    
     @pytest.fixture
-    def mock_server(self):
-        """Fixture for a server that closes connections immediately."""
-        server_socket = None
-        server_running = threading.Event()
+    def async_server(self):
+        """Fixture to start an AsyncSocketServer on its own loop in a thread."""
+        server = AsyncSocketServer('localhost', 8088)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
         
-        def mock_server_func():
-            nonlocal server_socket
+        for _ in range(20):
             try:
-                server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                server_socket.bind(('localhost', 8084))
-                server_socket.listen(1)
-                server_socket.settimeout(0.5)  # Add timeout to prevent hanging
-                server_running.set()
-                
-                # Accept and immediately close a few connections
-                for _ in range(3):
-                    try:
-                        client_socket, _ = server_socket.accept()
-                        client_socket.close()  # Immediately close without processing
-                    except socket.timeout:
-                        continue
-                    except:
-                        break
-                        
-            except Exception:
-                pass
-            finally:
-                if server_socket:
-                    try:
-                        server_socket.close()
-                    except:
-                        pass
-                        
-        thread = threading.Thread(target=mock_server_func, daemon=True)
-        thread.start()
+                test_socket = socket.create_connection(('localhost', 8088), timeout=0.5)
+                test_socket.close()
+                break
+            except (ConnectionRefusedError, socket.timeout, OSError):
+                time.sleep(0.1)
+        else:
+            server.shutdown()
+            pytest.skip("Async server failed to start within timeout")
+            
+        yield server, server_thread
         
-        # Wait for server to start or timeout
-        if not server_running.wait(timeout=2.0):
-            pytest.skip("Mock server failed to start")
+        server.shutdown()
+        server_thread.join(timeout=3.0)
         
-        time.sleep(0.1)  # Small delay to ensure server is ready
-        yield
+    def test_loop_factory_resolution(self):
+        """Test event loop selection falls back to asyncio without uvloop."""
+        assert resolve_loop_factory('asyncio') is asyncio.new_event_loop
+        with pytest.raises(ValueError):
+            resolve_loop_factory('bogus')
+            
+    def test_basic_communication(self, async_server):
+        """Test request/response on the asyncio server."""
+        client = SocketClient('localhost', 8088)
+        assert client.send_single_message("hello asyncio") == "HELLO ASYNCIO"
         
-        # Cleanup
-        if server_socket:
-            try:
-                server_socket.close()
-            except:
-                pass
+        assert client.connect() is True
+        for i in range(5):
+            assert client.send_message(f"message_{i}") == f"MESSAGE_{i}"
+        client.disconnect()
         
-    def test_connection_closed_by_server(self, mock_server):
-        """Test client behavior when server closes connection."""
-        client = SocketClient('localhost', 8084)
+    def test_graceful_shutdown_closes_connections(self, async_server):
+        """Test shutdown() from another thread stops the loop and drains clients."""
+        server, server_thread = async_server
+        idle = socket.create_connection(('localhost', 8088), timeout=3.0)
+        try:
+            idle.sendall(b"ping")
+            assert idle.recv(1024) == b"PING"
+            
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            assert not server_thread.is_alive()
+            assert idle.recv(1024) == b''
+        finally:
+            idle.close()
+            
+    def test_embedded_in_running_loop(self):
+        """Test serve() can be awaited inside an existing asyncio application."""
+        async def scenario():
+            server = AsyncSocketServer('localhost', 8089)
+            serve_task = asyncio.create_task(server.serve())
+            while not server.running:
+                await asyncio.sleep(0.01)
+                
+            reader, writer = await asyncio.open_connection('localhost', 8089)
+            writer.write(b"embedded")
+            await writer.drain()
+            response = await reader.read(1024)
+            writer.close()
+            
+            server.shutdown()
+            await asyncio.wait_for(serve_task, timeout=3.0)
+            return response
+            
+        assert asyncio.run(scenario()) == b"EMBEDDED"
+
+
+class TestFraming:
+    """Unit tests for length-prefixed framing."""
+    
+    def test_encode_frame(self):
+        """Test frames carry a 4-byte big-endian length header."""
+        assert encode_frame(b"hello") == b"\x00\x00\x00\x05hello"
+        assert encode_frame(b"") == b"\x00\x00\x00\x00"
+        with pytest.raises(FrameTooLargeError):
+            encode_frame(b"x" * 11, max_frame_size=10)
+            
+    def test_incremental_reassembly(self):
+        """Test frames split across and merged within reads are reassembled."""
+        decoder = FrameDecoder()
+        stream = encode_frame(b"first") + encode_frame(b"second") + encode_frame(b"x" * 5000)
         
-        # Connection should succeed initially
-        assert client.connect() is True
+        frames = []
+        for i in range(0, len(stream), 3):
+            frames.extend(decoder.feed(stream[i:i + 3]))
+        assert frames == [b"first", b"second", b"x" * 5000]
+        assert decoder.buffered == 0
         
-        # But sending message should fail due to closed connection
-        response = client.send_message("test")
-        assert response is None
+        assert decoder.feed(stream) == [b"first", b"second", b"x" * 5000]
         
-    def test_malformed_input_handling(self):
-        """Test server handling of malformed input."""
-        server = SocketServer('localhost', 8085)
+    def test_oversized_frame_rejected(self):
+        """Test the decoder rejects frames above the configured maximum."""
+        decoder = FrameDecoder(max_frame_size=16)
+        with pytest.raises(FrameTooLargeError):
+            decoder.feed(b"\x00\x00\x00\x11")
+
+
+class TestFramedProtocol:
+    """Integration tests for the framed protocol on every engine."""
+    
+    @pytest.fixture(params=['threaded', 'epoll', 'asyncio'])
+    def framed_server(self, request):
+        """Fixture to start a framed-protocol server for each engine."""
+        if request.param == 'asyncio':
+            server = AsyncSocketServer('localhost', 8090, protocol='framed', max_frame_size=65536)
+        else:
+            server = SocketServer('localhost', 8090, engine=request.param, protocol='framed',
+                                  max_frame_size=65536)
         server_thread = threading.Thread(target=server.start, daemon=True)
         server_thread.start()
         
-        # Wait for server to start
-        max_retries = 10
-        for _ in range(max_retries):
+        for _ in range(20):
             try:
-                test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                test_socket.settimeout(1.0)
-                test_socket.connect(('localhost', 8085))
+                test_socket = socket.create_connection(('localhost', 8090), timeout=0.5)
                 test_socket.close()
                 break
-            except (ConnectionRefusedError, socket.timeout):
+            except (ConnectionRefusedError, socket.timeout, OSError):
                 time.sleep(0.1)
         else:
-            pytest.skip("Server failed to start for malformed input test")
+            server.shutdown()
+            pytest.skip("Framed server failed to start within timeout")
+            
+        yield server
         
-        raw_socket = None
-        try:
-            # Test with raw socket to send malformed data
-            raw_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            raw_socket.settimeout(2.0)  # Set timeout to prevent hanging
-            raw_socket.connect(('localhost', 8085))
+        server.shutdown()
+        server_thread.join(timeout=3.0)
+        
+    def test_large_message(self, framed_server):
+        """Test messages larger than one recv buffer round-trip intact."""
+        client = SocketClient('localhost', 8090, protocol='framed')
+        message = "abc" * 10000
+        assert client.send_single_message(message) == message.upper()
+        
+    def test_back_to_back_messages(self, framed_server):
+        """Test frames written in one send are answered separately and in order."""
+        with socket.create_connection(('localhost', 8090), timeout=3.0) as raw_socket:
+            raw_socket.sendall(b"".join(encode_frame(f"msg{i}".encode('utf-8')) for i in range(20)))
             
-            # Send invalid UTF-8 bytes
-            raw_socket.send(b'\xff\xfe\xfd')
+            decoder = FrameDecoder()
+            replies = []
+            while len(replies) < 20:
+                data = raw_socket.recv(65536)
+                assert data
+                replies.extend(decoder.feed(data))
+        assert replies == [f"MSG{i}".encode('utf-8') for i in range(20)]
+        
+    def test_invalid_utf8_keeps_connection(self, framed_server):
+        """Test an invalid frame gets an error reply without closing the stream."""
+        client = SocketClient('localhost', 8090, protocol='framed')
+        assert client.connect() is True
+        try:
+            client.client_socket.sendall(encode_frame(b"\xff\xfe"))
+            assert client._receive_payload().startswith(b"ERROR")
+            assert client.send_message("still open") == "STILL OPEN"
+        finally:
+            client.disconnect()
             
-            # Should receive error response
-            response = raw_socket.recv(1024)
-            assert b"ERROR" in response
+    def test_oversized_frame_closes_connection(self, framed_server):
+        """Test frames above max_frame_size are rejected and the connection closed."""
+        with socket.create_connection(('localhost', 8090), timeout=3.0) as raw_socket:
+            raw_socket.sendall(b"\x00\x10\x00\x00")
+            decoder = FrameDecoder()
+            assert decoder.feed(raw_socket.recv(1024)) == [b"ERROR: Frame too large"]
+            assert raw_socket.recv(1024) == b''
             
-        except socket.timeout:
-            # If timeout occurs, test passes as server handled malformed input
-            pass
-        except Exception as e:
-            # Log the exception but don't fail the test
-            print(f"Expected exception during malformed input test: {e}")
+    def test_reply_grown_past_frame_limit(self, framed_server):
+        """Test a request whose uppercased reply outgrows max_frame_size gets an error reply."""
+        client = SocketClient('localhost', 8090, protocol='framed')
+        assert client.connect() is True
+        try:
+            # 2 bytes per character in, 6 out once uppercased
+            assert client.send_message("\u0390" * 20000) == "ERROR: Response too large"
+            assert client.send_message("still open") == "STILL OPEN"
         finally:
-            if raw_socket:
-                try:
-                    raw_socket.close()
-                except:
-                    pass
-            server.shutdown()
-            time.sleep(0.1)
-
-
-class TestCLIInterface:
-    """Tests for command-line interface."""
-    
-    def test_server_cli_arguments(self):
-        """Test server command-line argument parsing."""
-        # This would require mocking sys.argv and testing main()
-        # For simplicity, we'll test the core functionality
-        pass
-        
-    def test_client_cli_arguments(self):
-        """Test client command-line argument parsing."""
-        # This would require mocking sys.argv and testing main()
-        # For simplicity, we'll test the core functionality
-        pass
+            client.disconnect()
+        assert framed_server.running
 
 
-# Performance and Load Tests
-class TestPerformance:
-    """Basic performance tests."""
+class TestPipelining:
+    """Tests for request pipelining in SocketClient."""
     
     @pytest.fixture
-    def performance_server(self):
-        """Server fixture for performance testing."""
-        server = SocketServer('localhost', 8086)
+    def pipeline_server(self):
+        """Fixture to start a framed epoll server."""
+        server = SocketServer('localhost', 8092, engine='epoll', protocol='framed')
         server_thread = threading.Thread(target=server.start, daemon=True)
         server_thread.start()
         
-        # Wait for server to start
-        max_retries = 10
-        for _ in range(max_retries):
+        for _ in range(20):
             try:
-                test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                test_socket.settimeout(1.0)
-                test_socket.connect(('localhost', 8086))
+                test_socket = socket.create_connection(('localhost', 8092), timeout=0.5)
                 test_socket.close()
                 break
-            except (ConnectionRefusedError, socket.timeout):
+            except (ConnectionRefusedError, socket.timeout, OSError):
                 time.sleep(0.1)
         else:
-            pytest.skip("Performance server failed to start")
-        
+            server.shutdown()
+            pytest.skip("Pipeline server failed to start within timeout")
+            
         yield server
         
         server.shutdown()
-        time.sleep(0.1)
-        
-    def test_message_throughput(self, performance_server):
-        """Test message throughput under normal load."""
-        client = SocketClient('localhost', 8086, timeout=10.0)  # Longer timeout for performance test
+        server_thread.join(timeout=2.0)
         
-        # Connect once and send multiple messages
+    def test_requires_framed_protocol(self):
+        """Test pipelining is refused on the text protocol."""
+        client = SocketClient('localhost', 8092)
+        client.client_socket = Mock()
+        client._codec = Mock(framed=False)
+        with pytest.raises(ValueError):
+            list(client.send_many(["a"]))
+        with pytest.raises(ValueError):
+            with client.pipeline():
+                pass
+                
+    def test_send_many_in_order(self, pipeline_server):
+        """Test responses come back in request order for every window size."""
+        client = SocketClient('localhost', 8092, protocol='framed')
+        assert client.connect() is True
+        try:
+            messages = [f"msg{i}" for i in range(100)]
+            for window in (1, 7, 100, 500):
+                assert list(client.send_many(iter(messages), window=window)) == [m.upper() for m in messages]
+        finally:
+            client.disconnect()
+            
+    def test_send_many_stopped_early(self, pipeline_server):
+        """Test abandoning send_many() leaves the connection usable."""
+        client = SocketClient('localhost', 8092, protocol='framed')
+        assert client.connect() is True
+        try:
+            responses = client.send_many([f"msg{i}" for i in range(10)], window=10)
+            assert next(responses) == "MSG0"
+            responses.close()
+            assert client.send_message("after") == "AFTER"
+        finally:
+            client.disconnect()
+            
+    def test_pipeline_context_manager(self, pipeline_server):
+        """Test pipeline() flushes buffered sends and collects responses."""
+        client = SocketClient('localhost', 8092, protocol='framed')
+        assert client.connect() is True
+        try:
+            with client.pipeline() as pipe:
+                for i in range(5):
+                    pipe.send(f"p{i}")
+                assert pipe.responses == []
+            assert pipe.responses == ["P0", "P1", "P2", "P3", "P4"]
+        finally:
+            client.disconnect()
+            
+    def test_pipeline_block_raises(self, pipeline_server):
+        """Test a pipeline whose block raises sends nothing and leaves the connection in sync."""
+        client = SocketClient('localhost', 8092, protocol='framed')
         assert client.connect() is True
+        try:
+            with pytest.raises(RuntimeError):
+                with client.pipeline() as pipe:
+                    pipe.send("queued")
+                    raise RuntimeError("caller failed")
+            assert pipe.responses == []
+            assert client.send_message("next") == "NEXT"
+            assert client.send_message("after") == "AFTER"
+        finally:
+            client.disconnect()
+
+
+class TestWorkerPool:
+    """Tests for thread tracking and the bounded worker pool."""
+    
+    def start_server(self, **kwargs):
+        """Start a threaded server on port 8093 and wait until it accepts."""
+        server = SocketServer('localhost', 8093, **kwargs)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
         
-        start_time = time.time()
-        message_count = 50  # Reduced count for more reliable testing
-        successful_messages = 0
+        for _ in range(20):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Worker pool server failed to start within timeout")
+        return server, server_thread
         
-        for i in range(message_count):
-            try:
-                response = client.send_message(f"message_{i}")
-                if response == f"MESSAGE_{i}":
-                    successful_messages += 1
-            except Exception as e:
-                print(f"Message {i} failed: {e}")
-                continue
-                
-        end_time = time.time()
-        duration = end_time - start_time
+    def stop_server(self, server, server_thread):
+        """Shut the server down and wait for its accept loop to exit."""
+        server.shutdown()
+        server_thread.join(timeout=3.0)
         
-        client.disconnect()
+    def test_invalid_pool_configuration(self):
+        """Test pool options are validated."""
+        with pytest.raises(ValueError):
+            SocketServer(engine='epoll', max_workers=4)
+        with pytest.raises(ValueError):
+            SocketServer(max_workers=0)
+        with pytest.raises(ValueError):
+            SocketServer(overflow='bogus')
+            
+    def test_finished_threads_are_pruned(self):
+        """Test per-connection threads stop being tracked once they exit."""
+        server, server_thread = self.start_server()
+        try:
+            client = SocketClient('localhost', 8093)
+            for i in range(20):
+                assert client.send_single_message(f"msg{i}") == f"MSG{i}"
+                
+            for _ in range(20):
+                if not server.client_threads:
+                    break
+                time.sleep(0.05)
+            assert len(server.client_threads) == 0
+            assert server.stats['connections_accepted'] == 20
+        finally:
+            self.stop_server(server, server_thread)
+            
+    def test_pool_reuses_fixed_threads(self):
+        """Test the pool serves many connections without spawning threads."""
+        server, server_thread = self.start_server(max_workers=2, max_pending=2)
+        try:
+            assert len(server.client_threads) == 2
+            threads_before = threading.active_count()
+            client = SocketClient('localhost', 8093)
+            for i in range(20):
+                assert client.send_single_message(f"msg{i}") == f"MSG{i}"
+            assert threading.active_count() == threads_before
+            assert len(server.client_threads) == 2
+        finally:
+            self.stop_server(server, server_thread)
+            
+    def test_pool_rejects_when_busy(self):
+        """Test a saturated pool answers new connections with ERROR: busy."""
+        server, server_thread = self.start_server(max_workers=1, max_pending=0)
+        busy_client = SocketClient('localhost', 8093)
+        try:
+            assert busy_client.connect() is True
+            assert busy_client.send_message("hold") == "HOLD"
+            
+            with socket.create_connection(('localhost', 8093), timeout=2.0) as rejected:
+                assert rejected.recv(1024) == b"ERROR: busy"
+                assert rejected.recv(1024) == b""
+            assert server.stats['connections_rejected'] == 1
+        finally:
+            busy_client.disconnect()
+            self.stop_server(server, server_thread)
+            
+    def test_pool_backlog_policy(self):
+        """Test the backlog policy defers new connections until a worker frees up."""
+        server, server_thread = self.start_server(max_workers=1, max_pending=0, overflow='backlog')
+        busy_client = SocketClient('localhost', 8093)
+        try:
+            assert busy_client.connect() is True
+            assert busy_client.send_message("hold") == "HOLD"
+            
+            with socket.create_connection(('localhost', 8093), timeout=2.0) as waiting:
+                waiting.sendall(b"queued")
+                waiting.settimeout(0.5)
+                with pytest.raises(socket.timeout):
+                    waiting.recv(1024)
+                    
+                busy_client.disconnect()
+                waiting.settimeout(3.0)
+                assert waiting.recv(1024) == b"QUEUED"
+            assert server.stats['connections_rejected'] == 0
+        finally:
+            busy_client.disconnect()
+            self.stop_server(server, server_thread)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork') or not hasattr(socket, 'SO_REUSEPORT'),
+                    reason="Pre-fork mode needs os.fork() and SO_REUSEPORT")
+class TestPrefork:
+    """Tests for SO_REUSEPORT sharing and the pre-fork supervisor."""
+    
+    def test_reuse_port_allows_shared_bind(self):
+        """Test two servers created with reuse_port can bind the same port."""
+        servers = [SocketServer('localhost', 8094, reuse_port=True) for _ in range(2)]
+        threads = [threading.Thread(target=server.start, daemon=True) for server in servers]
+        for thread in threads:
+            thread.start()
+        try:
+            for _ in range(20):
+                if all(server.running for server in servers):
+                    break
+                time.sleep(0.05)
+            assert all(server.running for server in servers)
+            assert SocketClient('localhost', 8094).send_single_message("shared") == "SHARED"
+        finally:
+            for server in servers:
+                server.shutdown()
+            for thread in threads:
+                thread.join(timeout=3.0)
+                
+    def test_supervisor_restarts_and_drains(self, tmp_path):
+        """Test crashed workers are restarted and SIGTERM stops all workers."""
+        log_path = tmp_path / "prefork.log"
+        with open(log_path, 'w') as log_file:
+            supervisor = subprocess.Popen(
+                [sys.executable, os.path.join(socket_dir, 'server.py'),
+                 '--port', '8095', '--workers', '2', '--engine', 'epoll'],
+                stdout=log_file, stderr=log_file
+            )
+        try:
+            client = SocketClient('localhost', 8095)
+            for _ in range(50):
+                if client.send_single_message("ready") == "READY":
+                    break
+                time.sleep(0.1)
+            else:
+                pytest.skip("Pre-fork supervisor failed to start")
+                
+            pids = [int(line.rsplit('pid ', 1)[1].rstrip(')\n'))
+                    for line in open(log_path) if 'Started worker 0' in line]
+            os.kill(pids[0], signal.SIGKILL)
+            
+            for _ in range(50):
+                if open(log_path).read().count('Started worker 0') == 2:
+                    break
+                time.sleep(0.1)
+            assert 'exited unexpectedly' in open(log_path).read()
+            assert client.send_single_message("after crash") == "AFTER CRASH"
+            
+            supervisor.send_signal(signal.SIGTERM)
+            assert supervisor.wait(timeout=10) == 0
+            assert 'Supervisor shutdown complete' in open(log_path).read()
+        finally:
+            if supervisor.poll() is None:
+                supervisor.kill()
+                supervisor.wait()
+
+
+class TestBufferPool:
+    """Tests for the zero-copy buffer-pool data path."""
+    
+    def test_upper_ascii_in_place(self):
+        """Test ASCII ranges are uppercased in place and non-ASCII is refused."""
+        buffer = bytearray(b"xxhello worldxx")
+        assert upper_ascii_in_place(buffer, 2, 13) is True
+        assert buffer == bytearray(b"xxHELLO WORLDxx")
+        assert upper_ascii_in_place(bytearray("caf\u00e9".encode('utf-8')), 0, 5) is False
+        
+    def test_slab_pool_reuses_slabs(self):
+        """Test released slabs are handed out again instead of reallocated."""
+        pool = SlabPool(slab_size=128)
+        slab = pool.acquire()
+        pool.release(slab)
+        assert pool.acquire() is slab
+        pool.release(bytearray(64))  # foreign sizes are dropped
+        pool.acquire()
+        assert pool.allocated == 2
+        
+    def start_server(self, engine, protocol, **options):
+        """Start a buffer-pool server on port 8096 and wait until it accepts."""
+        server = SocketServer('localhost', 8096, engine=engine, protocol=protocol, buffer_pool=True, **options)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        
+        for _ in range(20):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Buffer-pool server failed to start within timeout")
+        return server, server_thread
+        
+    @pytest.mark.parametrize("engine", ['threaded', 'epoll'])
+    def test_framed_messages(self, engine):
+        """Test small, 64 KB, padded and non-ASCII frames in one pipelined batch."""
+        server, server_thread = self.start_server(engine, 'framed')
+        client = SocketClient('localhost', 8096, protocol='framed')
+        try:
+            assert client.connect() is True
+            big = 'abc' * 30000  # larger than one slab
+            messages = ["hello", "a" * 65536, "  padded  ", "caf\u00e9", big, "world"]
+            expected = ["HELLO", "A" * 65536, "PADDED", "CAF\u00c9", big.upper(), "WORLD"]
+            assert list(client.send_many(messages, window=8)) == expected
+            assert client.send_message("again") == "AGAIN"
+        finally:
+            client.disconnect()
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+    @pytest.mark.parametrize("engine", ['threaded', 'epoll'])
+    def test_reply_grown_past_frame_limit(self, engine):
+        """Test a frame whose uppercased reply outgrows max_frame_size gets an error reply."""
+        server, server_thread = self.start_server(engine, 'framed', max_frame_size=1000)
+        client = SocketClient('localhost', 8096, protocol='framed')
+        try:
+            assert client.connect() is True
+            assert client.send_message("\u0390" * 400) == "ERROR: Response too large"
+            assert client.send_message("still open") == "STILL OPEN"
+            assert server.running
+        finally:
+            client.disconnect()
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+    @pytest.mark.parametrize("engine", ['threaded', 'epoll'])
+    def test_text_messages(self, engine):
+        """Test the text protocol strips whitespace and falls back for non-ASCII."""
+        server, server_thread = self.start_server(engine, 'text')
+        client = SocketClient('localhost', 8096)
+        try:
+            assert client.connect() is True
+            assert client.send_message("hello\n") == "HELLO"
+            assert client.send_message("stra\u00dfe") == "STRASSE"
+        finally:
+            client.disconnect()
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+            
+class TestOutputBuffer:
+    """Tests for coalesced scatter-gather writes."""
+    
+    def test_partial_sends_keep_order(self):
+        """Test partial writes resume mid-chunk without losing or reordering bytes."""
+        sock = Mock()
+        sent = []
+        
+        def accept_some(chunks):
+            data = b''.join(bytes(chunk) for chunk in chunks)[:5]
+            sent.append(data)
+            return len(data)
+            
+        sock.sendmsg.side_effect = accept_some
+        sock.send.side_effect = lambda chunk: accept_some([chunk])
+        
+        output = OutputBuffer()
+        output.extend([b"abc", b"", memoryview(b"defghij"), b"klm"])
+        assert len(output) == 13
+        assert output.flush(sock) is True
+        assert b''.join(sent) == b"abcdefghijklm"
+        assert len(output) == 0
+        
+    def test_batch_is_one_syscall(self):
+        """Test small batches are joined and large ones use a single sendmsg call."""
+        left, right = socket.socketpair()
+        try:
+            sock = Mock(wraps=left)
+            output = OutputBuffer()
+            output.extend([b"one", b"two", b"three"])
+            assert output.flush(sock) is True
+            assert (sock.send.call_count, sock.sendmsg.call_count) == (1, 0)
+            assert right.recv(1024) == b"onetwothree"
+            
+            sock.reset_mock()
+            chunks = [bytes([i]) * 40000 for i in range(3)]
+            output.extend(chunks)
+            assert output.flush(sock) is True
+            assert (sock.send.call_count, sock.sendmsg.call_count) == (0, 1)
+            received = bytearray()
+            while len(received) < 120000:
+                received += right.recv(65536)
+            assert received == b''.join(chunks)
+        finally:
+            left.close()
+            right.close()
+            
+    def test_would_block_keeps_tail(self):
+        """Test a full non-blocking socket leaves the unsent tail queued."""
+        left, right = socket.socketpair()
+        try:
+            left.setblocking(False)
+            payload = bytes(range(256)) * 16384  # 4 MiB, more than the socket buffers
+            output = OutputBuffer()
+            output.extend([payload[:1000], bytearray(payload[1000:])])
+            output.own()
+            assert output.flush(left) is False
+            assert 0 < len(output) < len(payload)
+            
+            received = bytearray()
+            right.settimeout(2.0)
+            while len(received) < len(payload):
+                received += right.recv(1 << 20)
+                output.flush(left)
+            assert received == payload
+            assert len(output) == 0
+        finally:
+            left.close()
+            right.close()
+            
+    def test_epoll_flushes_large_backlog(self):
+        """Test the epoll engine finishes replies larger than the socket buffers."""
+        server = SocketServer('localhost', 8097, engine='epoll', protocol='framed')
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(20):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Epoll server failed to start within timeout")
+            
+        try:
+            payload = b"x" * 65536
+            with socket.create_connection(('localhost', 8097), timeout=5.0) as sock:
+                # Send everything before reading so replies back up on the server
+                sock.sendall(encode_frame(payload) * 64)
+                decoder = FrameDecoder()
+                frames = []
+                while len(frames) < 64:
+                    frames.extend(decoder.feed(sock.recv(65536)))
+            assert frames == [payload.upper()] * 64
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+            
+class TestLogModes:
+    """Tests for queued logging, sampling and traffic summaries."""
+    
+    def test_sampling_is_per_connection(self):
+        """Test the first and then every Nth message of each connection is sampled."""
+        traffic = TrafficLog(sample_rate=3)
+        first = [traffic.record(('a', 1), 5, 5) for _ in range(7)]
+        second = [traffic.record(('b', 2), 5, 5) for _ in range(2)]
+        assert first == [True, False, False, True, False, False, True]
+        assert second == [True, False]
+        
+    def test_summary_reports_rates_and_drops_closed(self, caplog):
+        """Test summaries log per-client deltas and forget closed connections."""
+        traffic = TrafficLog(sample_rate=10, name='Client')
+        for _ in range(4):
+            traffic.record(('a', 1), 10, 20)
+        traffic.forget(('a', 1))
+        with caplog.at_level(logging.INFO, logger='logsetup'):
+            traffic.summary()
+            traffic.summary()
+        lines = [r.getMessage() for r in caplog.records]
+        assert len(lines) == 2
+        assert lines[0].startswith("Client ('a', 1):")
+        assert lines[1].startswith("Traffic summary: 1 active connections")
+        assert traffic.record(('a', 1), 1, 1) is True  # counters start over
+        
+    def test_queue_mode_hands_records_to_listener(self):
+        """Test queue mode moves root handlers behind a listener and restores them."""
+        root = logging.getLogger()
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        original = root.handlers[:]
+        for h in original:
+            root.removeHandler(h)
+        root.addHandler(handler)
+        try:
+            configure_logging('queue')
+            assert [type(h) for h in root.handlers] == [DeferredQueueHandler]
+            logging.getLogger('test.queue').warning("value %d", 42)
+            stop_logging()
+            assert root.handlers == [handler]
+            assert [r.getMessage() for r in records] == ["value 42"]
+        finally:
+            stop_logging()
+            root.removeHandler(handler)
+            for h in original:
+                root.addHandler(h)
+                
+    def test_server_samples_message_logs(self, caplog):
+        """Test a server with a traffic log only logs sampled messages."""
+        traffic = TrafficLog(sample_rate=4)
+        server = SocketServer('localhost', 8098, traffic_log=traffic)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        with caplog.at_level(logging.INFO):
+            server_thread.start()
+            for _ in range(20):
+                if server.running:
+                    break
+                time.sleep(0.05)
+            client = SocketClient('localhost', 8098)
+            try:
+                assert client.connect() is True
+                for i in range(8):
+                    assert client.send_message(f"m{i}") == f"M{i}"
+            finally:
+                client.disconnect()
+                server.shutdown()
+                server_thread.join(timeout=3.0)
+        received = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Received from")]
+        assert [line.rsplit(': ', 1)[1] for line in received] == ["m0", "m4"]
+        assert any(r.getMessage().startswith("Traffic summary") for r in caplog.records)
+        
+        
+class TestClientPool:
+    """Tests for the SocketClientPool connection pool."""
+    
+    def start_server(self):
+        """Start an epoll server on port 8099 and wait until it accepts."""
+        server = SocketServer('localhost', 8099, engine='epoll')
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(20):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Pool test server failed to start within timeout")
+        return server, server_thread
+        
+    def stop_server(self, server, server_thread):
+        """Shut the server down, closing every connection it holds."""
+        server.shutdown()
+        server_thread.join(timeout=3.0)
+        
+    def test_invalid_sizes(self):
+        """Test pool sizes are validated."""
+        with pytest.raises(ValueError):
+            SocketClientPool(min_size=2, max_size=1)
+        with pytest.raises(ValueError):
+            SocketClientPool(max_size=0)
+            
+    def test_calls_reuse_one_connection(self):
+        """Test sequential pooled calls share a single TCP connection."""
+        server, server_thread = self.start_server()
+        pool = SocketClientPool(max_size=4)
+        try:
+            client = SocketClient('localhost', 8099)
+            for i in range(10):
+                assert client.send_single_message(f"msg{i}", pool=pool) == f"MSG{i}"
+            assert pool.stats['created'] == 1
+            assert pool.stats['reused'] == 9
+        finally:
+            pool.close()
+            self.stop_server(server, server_thread)
+            
+    def test_max_size_blocks_checkout(self):
+        """Test checkout waits for a free connection and times out."""
+        server, server_thread = self.start_server()
+        pool = SocketClientPool(max_size=1, checkout_timeout=0.2)
+        try:
+            held = pool.acquire('localhost', 8099)
+            with pytest.raises(TimeoutError):
+                pool.acquire('localhost', 8099)
+            pool.release(held)
+            with pool.connection('localhost', 8099) as client:
+                assert client is held
+                assert client.send_message("again") == "AGAIN"
+        finally:
+            pool.close()
+            self.stop_server(server, server_thread)
+            
+    def test_min_size_and_idle_eviction(self):
+        """Test endpoints are pre-warmed and idle connections shrink back to min_size."""
+        server, server_thread = self.start_server()
+        pool = SocketClientPool(min_size=2, max_size=4, idle_timeout=0.1)
+        try:
+            clients = [pool.acquire('localhost', 8099) for _ in range(3)]
+            assert pool.stats['created'] == 3
+            for client in clients:
+                pool.release(client)
+            time.sleep(0.2)
+            with pool.connection('localhost', 8099) as client:
+                assert client.send_message("warm") == "WARM"
+            assert pool.stats['evicted'] == 1
+        finally:
+            pool.close()
+            self.stop_server(server, server_thread)
+            
+    def test_dead_connection_is_replaced(self):
+        """Test a connection closed by a restarted server fails its health check."""
+        server, server_thread = self.start_server()
+        pool = SocketClientPool(max_size=2)
+        try:
+            assert pool.send_message('localhost', 8099, "before") == "BEFORE"
+            self.stop_server(server, server_thread)
+            server, server_thread = self.start_server()
+            
+            assert pool.send_message('localhost', 8099, "after") == "AFTER"
+            assert pool.stats['unhealthy'] == 1
+            assert pool.stats['created'] == 2
+        finally:
+            pool.close()
+            self.stop_server(server, server_thread)
+            
+            
+class TestAsyncClient:
+    """Tests for the asyncio AsyncSocketClient."""
+    
+    @pytest.fixture(params=['text', 'framed'])
+    def epoll_server(self, request):
+        """Fixture to start an epoll server on port 8100 for each protocol."""
+        server = SocketServer('localhost', 8100, engine='epoll', protocol=request.param, backlog=1024)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(20):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Epoll server failed to start within timeout")
+            
+        yield request.param
+        
+        server.shutdown()
+        server_thread.join(timeout=3.0)
+        
+    def test_send_message(self, epoll_server):
+        """Test request/response and the async context manager."""
+        async def scenario():
+            async with AsyncSocketClient('localhost', 8100, protocol=epoll_server) as client:
+                return [await client.send_message(f"message_{i}") for i in range(5)]
+                
+        assert asyncio.run(scenario()) == [f"MESSAGE_{i}" for i in range(5)]
+        
+    def test_send_many_stays_in_sync(self, epoll_server):
+        """Test pipelining, and that stopping early drains outstanding responses."""
+        if epoll_server != 'framed':
+            pytest.skip("Pipelining requires the framed protocol")
+            
+        async def scenario():
+            async with AsyncSocketClient('localhost', 8100, protocol='framed') as client:
+                responses = [r async for r in client.send_many((f"m{i}" for i in range(100)), window=16)]
+                stream = client.send_many([f"x{i}" for i in range(10)], window=10)
+                first = await stream.__anext__()
+                await stream.aclose()
+                return responses, first, await client.send_message("after")
+                
+        responses, first, after = asyncio.run(scenario())
+        assert responses == [f"M{i}" for i in range(100)]
+        assert (first, after) == ("X0", "AFTER")
+        
+    def test_many_concurrent_connections(self, epoll_server):
+        """Test one event loop drives hundreds of connections at once."""
+        async def scenario():
+            clients = [AsyncSocketClient('localhost', 8100, protocol=epoll_server) for _ in range(300)]
+            assert all(await asyncio.gather(*(client.connect() for client in clients)))
+            responses = await asyncio.gather(*(client.send_message(f"c{i}") for i, client in enumerate(clients)))
+            await asyncio.gather(*(client.close() for client in clients))
+            return responses
+            
+        assert asyncio.run(scenario()) == [f"C{i}" for i in range(300)]
+        
+    def test_per_call_timeout(self):
+        """Test a server that never answers makes send_message return None after timeout."""
+        listener = socket.create_server(('localhost', 8101))
+        
+        async def scenario():
+            client = AsyncSocketClient('localhost', 8101, timeout=0.2)
+            assert await client.connect() is True
+            start = time.perf_counter()
+            response = await client.send_message("anyone there?")
+            elapsed = time.perf_counter() - start
+            await client.close()
+            return response, elapsed
+            
+        try:
+            response, elapsed = asyncio.run(scenario())
+        finally:
+            listener.close()
+        assert response is None
+        assert elapsed < 1.0
+        
+    def test_not_connected(self):
+        """Test calls before connect() fail cleanly."""
+        client = AsyncSocketClient('localhost', 8100)
+        assert asyncio.run(client.send_message("test")) is None
+        assert asyncio.run(AsyncSocketClient('localhost', 1).connect()) is False
+        
+        
+class TestLoadGenerator:
+    """Tests for the loadgen.py load generator."""
+    
+    @pytest.fixture
+    def epoll_server(self):
+        """Fixture to start a framed epoll server on port 8102."""
+        server = SocketServer('localhost', 8102, engine='epoll', protocol='framed', backlog=1024)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(20):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Epoll server failed to start within timeout")
+            
+        yield server
+        
+        server.shutdown()
+        server_thread.join(timeout=3.0)
+        
+    def test_payload_distributions(self):
+        """Test payload size specifications parse and stay within bounds."""
+        import random
+        rng = random.Random(1)
+        assert parse_payload_spec('64')(rng) == 64
+        assert all(10 <= parse_payload_spec('uniform:10:20')(rng) <= 20 for _ in range(100))
+        assert all(1 <= parse_payload_spec('exp:100:500')(rng) <= 500 for _ in range(100))
+        assert parse_payload_spec('choice:7,9')(rng) in (7, 9)
+        for bad in ('0', 'uniform:5', 'uniform:9:3', 'exp:-1', 'choice:', 'zipf:1'):
+            with pytest.raises(ValueError):
+                parse_payload_spec(bad)
+                
+    def test_closed_loop_report(self, epoll_server):
+        """Test a closed-loop run sends every message and reports JSON-ready stats."""
+        generator = LoadGenerator('localhost', 8102, connections=8, messages=25,
+                                  payload='choice:16,2048', protocol='framed', seed=3)
+        report = asyncio.run(generator.run())
+        
+        assert report['connected'] == 8
+        assert report['messages'] == 200
+        assert report['errors'] == 0
+        assert report['bytes_sent'] == report['bytes_received'] > 0
+        latency = report['latency_ms']
+        assert latency['p50'] <= latency['p90'] <= latency['p99'] <= latency['p99.9'] <= latency['max']
+        assert json.loads(json.dumps(report))['config']['mode'] == 'closed-loop'
+        assert "p99.9" in format_report(report)
+        
+    def test_open_loop_duration(self, epoll_server):
+        """Test open-loop pacing holds the requested rate for the duration."""
+        generator = LoadGenerator('localhost', 8102, connections=4, duration=0.5, rate=200,
+                                  protocol='framed')
+        report = asyncio.run(generator.run())
+        
+        assert report['config']['mode'] == 'open-loop'
+        assert report['errors'] == 0
+        assert 80 <= report['messages'] <= 110
+        
+        
+class TestConnectionTimeouts:
+    """Tests for the timing wheel and idle, read and lifetime timeouts."""
+    
+    def start_server(self, engine='threaded', **kwargs):
+        """Start a server with fast timeout ticks on port 8103."""
+        if engine == 'asyncio':
+            server = AsyncSocketServer('localhost', 8103, timeout_tick=0.05, **kwargs)
+        else:
+            server = SocketServer('localhost', 8103, engine=engine, timeout_tick=0.05, **kwargs)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(20):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Timeout test server failed to start within timeout")
+        return server, server_thread
+        
+    def stop_server(self, server, server_thread):
+        """Shut the server down."""
+        server.shutdown()
+        server_thread.join(timeout=3.0)
+        
+    def wait_closed(self, sock, limit=3.0):
+        """Return seconds until the server closes sock, reading and discarding replies."""
+        sock.settimeout(limit)
+        started = time.monotonic()
+        try:
+            while sock.recv(1024):
+                pass
+        except ConnectionResetError:
+            pass
+        return time.monotonic() - started
+        
+    def test_timing_wheel_fires_in_order(self):
+        """Test entries fire no earlier than their deadline, across levels and past the horizon."""
+        wheel = TimingWheel(tick=1.0, bits=2, levels=2, now=0)
+        deadlines = {'near': 2.5, 'cascaded': 9.0, 'far': 40.0}
+        timers = {name: wheel.schedule(name, deadline) for name, deadline in deadlines.items()}
+        cancelled = wheel.schedule('cancelled', 5.0)
+        wheel.cancel(cancelled)
+        assert len(wheel) == 3
+        
+        fired = {}
+        for now in range(1, 50):
+            for name in wheel.advance(now):
+                fired[name] = now
+        assert fired == {'near': 3, 'cascaded': 9, 'far': 40}
+        assert len(wheel) == 0
+        wheel.cancel(timers['near'])  # already fired: no-op
+        
+    def test_reaper_reschedules_active_connections(self):
+        """Test activity pushes the idle deadline back without touching the wheel."""
+        reaper = ConnectionReaper(idle_timeout=0.2, tick=0.05)
+        state = reaper.add('conn')
+        time.sleep(0.15)
+        state.touch()
+        time.sleep(0.15)
+        assert reaper.expire() == []
+        time.sleep(0.15)
+        assert reaper.expire() == [state]
+        assert state.reason == 'idle'
+        assert len(reaper) == 0
+        with pytest.raises(ValueError):
+            ConnectionReaper()
+            
+    def test_idle_connection_reaped(self):
+        """Test the threaded engine closes a connection that goes quiet."""
+        server, server_thread = self.start_server('threaded', idle_timeout=0.3)
+        try:
+            with socket.create_connection(('localhost', 8103)) as sock:
+                sock.sendall(b"hello")
+                assert sock.recv(1024) == b"HELLO"
+                assert 0.2 <= self.wait_closed(sock) < 1.5
+            assert server.stats['connections_reaped'] == 1
+            assert server.stats['reaped_idle'] == 1
+        finally:
+            self.stop_server(server, server_thread)
+            
+    def test_slow_partial_frame_reaped(self):
+        """Test the epoll engine closes a client trickling a frame byte by byte."""
+        server, server_thread = self.start_server('epoll', protocol='framed',
+                                                  idle_timeout=5.0, read_timeout=0.3)
+        try:
+            with socket.create_connection(('localhost', 8103)) as sock:
+                frame = encode_frame(b"slowloris")
+                with pytest.raises(OSError):
+                    for i in range(len(frame)):
+                        sock.sendall(frame[i:i + 1])
+                        time.sleep(0.1)
+                    if not sock.recv(1024):
+                        raise ConnectionResetError
+            assert server.stats['reaped_read'] == 1
+            assert server.stats['reaped_idle'] == 0
+        finally:
+            self.stop_server(server, server_thread)
+            
+    def test_busy_connection_outlives_idle_timeout(self):
+        """Test a connection sending steadily is kept until its lifetime runs out."""
+        server, server_thread = self.start_server('asyncio', idle_timeout=0.2, max_lifetime=0.8)
+        try:
+            with socket.create_connection(('localhost', 8103)) as sock:
+                started = time.monotonic()
+                with pytest.raises(OSError):
+                    while time.monotonic() - started < 3.0:
+                        sock.sendall(b"ping")
+                        if sock.recv(1024) != b"PING":
+                            raise ConnectionResetError
+                        time.sleep(0.1)
+                assert 0.7 <= time.monotonic() - started < 1.5
+            assert server.stats['reaped_lifetime'] == 1
+            assert server.stats['reaped_idle'] == 0
+        finally:
+            self.stop_server(server, server_thread)
+            
+            
+class TestTakeover:
+    """Tests for handing the listening socket over to a new server."""
+    
+    def start_server(self, server):
+        """Run a server on a thread and wait until it accepts."""
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Takeover test server failed to start within timeout")
+        return server_thread
+        
+    def test_takeover_requires_handoff_path(self):
+        """Test takeover cannot be requested without a handoff path."""
+        with pytest.raises(ValueError):
+            SocketServer('localhost', 8104, takeover=True)
+            
+    def test_takeover_without_running_server_binds(self, tmp_path):
+        """Test a takeover with nobody to take over from binds the port itself."""
+        path = str(tmp_path / 'handoff.sock')
+        server = SocketServer('localhost', 8104, engine='epoll', handoff_path=path, takeover=True)
+        server_thread = self.start_server(server)
+        try:
+            assert SocketClient('localhost', 8104).send_single_message("solo") == "SOLO"
+            assert os.path.exists(path)
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+        assert not os.path.exists(path)
+        
+    def test_takeover_refuses_no_connections(self, tmp_path):
+        """Test new connections keep succeeding while a new server takes over, and the old one drains."""
+        path = str(tmp_path / 'handoff.sock')
+        old = SocketServer('localhost', 8104, engine='epoll', handoff_path=path, drain_timeout=5.0)
+        old_thread = self.start_server(old)
+        new = SocketServer('localhost', 8104, engine='threaded', handoff_path=path, takeover=True)
+        new_thread = None
+        
+        stop = threading.Event()
+        results = []
+        
+        def probe():
+            while not stop.is_set():
+                try:
+                    results.append(SocketClient('localhost', 8104, timeout=2.0).send_single_message("probe"))
+                except Exception as e:
+                    results.append(e)
+                time.sleep(0.01)
+                
+        prober = threading.Thread(target=probe, daemon=True)
+        try:
+            # A connection opened before the takeover stays on the old server
+            existing = SocketClient('localhost', 8104)
+            assert existing.connect()
+            prober.start()
+            time.sleep(0.2)
+            
+            new_thread = self.start_server(new)
+            time.sleep(0.3)
+            assert old.running and old._draining
+            assert existing.send_message("still here") == "STILL HERE"
+            
+            stop.set()
+            prober.join(timeout=5.0)
+            existing.disconnect()
+            old_thread.join(timeout=3.0)
+            assert not old_thread.is_alive()
+            
+            assert results and all(result == "PROBE" for result in results)
+            assert SocketClient('localhost', 8104).send_single_message("after") == "AFTER"
+            assert os.path.exists(path)
+        finally:
+            stop.set()
+            old.shutdown()
+            new.shutdown()
+            if new_thread:
+                new_thread.join(timeout=3.0)
+                
+                
+class TestStatsListener:
+    """Tests for the Prometheus metrics endpoint."""
+    
+    def scrape(self, port):
+        """Fetch the metrics text from a stats port."""
+        with socket.create_connection(('localhost', port), timeout=2.0) as sock:
+            sock.sendall(b"GET /metrics HTTP/1.0\r\n\r\n")
+            response = b''
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                response += chunk
+        head, _, body = response.partition(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.0 200")
+        return body.decode('utf-8')
+        
+    def sample(self, text, name):
+        """Return the value of an unlabelled sample."""
+        for line in text.splitlines():
+            if line.startswith(name + ' '):
+                return float(line.split()[1])
+        raise AssertionError(f"{name} not in scrape")
+        
+    def test_histogram_buckets_are_contiguous(self):
+        """Test every duration falls in the bucket whose bounds contain it."""
+        assert bucket_index(0) == 0
+        for micros in list(range(2000)) + [12345, 10 ** 6, 10 ** 8]:
+            index = bucket_index(micros)
+            assert index < HISTOGRAM_BUCKETS
+            assert micros < bucket_upper_bound(index) * 1e6 + 1e-6
+            if index:
+                assert micros >= bucket_upper_bound(index - 1) * 1e6 - 1e-6
+                
+    def test_retired_shards_are_kept(self):
+        """Test closed connection shards still count towards the totals."""
+        metrics = ServerMetrics()
+        first, second = metrics.shard(), metrics.shard()
+        first.messages, second.messages = 3, 4
+        first.stages['process'].observe(0.002)
+        metrics.retire(first)
+        total = metrics.snapshot()
+        assert total.messages == 7
+        assert total.stages['process'].count == 1
+        
+    @pytest.mark.parametrize("engine", ['threaded', 'epoll', 'asyncio'])
+    def test_scrape_after_traffic(self, engine):
+        """Test a scrape reports connections, messages, bytes and stage histograms."""
+        if engine == 'asyncio':
+            server = AsyncSocketServer('localhost', 8105, stats_port=8106)
+        else:
+            server = SocketServer('localhost', 8105, engine=engine, stats_port=8106)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Stats test server failed to start within timeout")
+            
+        try:
+            client = SocketClient('localhost', 8105)
+            assert client.connect()
+            for i in range(5):
+                assert client.send_message(f"stat{i}") == f"STAT{i}"
+            text = self.scrape(8106)
+            assert self.sample(text, 'socket_server_connections_active') == 1
+            client.disconnect()
+            
+            time.sleep(0.2)
+            text = self.scrape(8106)
+            assert self.sample(text, 'socket_server_connections_total') == 1
+            assert self.sample(text, 'socket_server_connections_active') == 0
+            assert self.sample(text, 'socket_server_messages_total') == 5
+            assert self.sample(text, 'socket_server_received_bytes_total') == 5 * len("stat0")
+            assert self.sample(text, 'socket_server_sent_bytes_total') == 5 * len("STAT0")
+            assert 'socket_server_stage_duration_seconds_count{stage="process"} 5' in text
+            assert 'socket_server_stage_duration_seconds_bucket{stage="send",le="+Inf"} 5' in text
+            if sys.platform.startswith('linux'):
+                assert self.sample(text, 'socket_server_accept_queue_depth') == 0
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+            
+class TestCompression:
+    """Tests for negotiated per-connection compression."""
+    
+    def negotiate(self, client, server):
+        """Run the handshake between two codecs in memory."""
+        assert server.decode(client.hello()) == []
+        assert client.decode(server.handshake_reply) == []
+        
+    @pytest.mark.parametrize("modes", [['zlib-dict'], ['zlib'], ['none']])
+    def test_codec_round_trip(self, modes):
+        """Test payloads above and below the threshold survive both directions."""
+        client, server = CompressingCodec(modes=modes), CompressingCodec()
+        self.negotiate(client, server)
+        assert client.mode == server.mode == modes[0]
+        
+        messages = [b"short", b"status message " * 200, b"", b"status message " * 50]
+        wire = b''.join(b''.join(client.encode_parts(message)) for message in messages)
+        assert server.decode(wire) == messages
+        replies = b''.join(server.encode(message.upper()) for message in messages)
+        assert client.decode(replies) == [message.upper() for message in messages]
+        if modes[0] != 'none':
+            assert len(server.encode(messages[1])) < len(messages[1]) // 10
+            
+    def test_dictionary_mismatch_falls_back(self):
+        """Test peers with different preset dictionaries agree on plain zlib."""
+        client = CompressingCodec(modes=['zlib-dict', 'zlib'], dictionary=b"one dictionary")
+        server = CompressingCodec(dictionary=b"another dictionary")
+        self.negotiate(client, server)
+        assert client.mode == server.mode == 'zlib'
+        
+    def test_decompressed_size_is_limited(self):
+        """Test a small frame inflating past the frame size limit is rejected."""
+        client = CompressingCodec(modes=['zlib'], threshold=0)
+        server = CompressingCodec(max_frame_size=1024)
+        self.negotiate(client, server)
+        with pytest.raises(FrameTooLargeError):
+            server.decode(client.encode(b"a" * 100000))
+            
+    def test_compression_requires_framed_protocol(self):
+        """Test compression is refused with the text protocol."""
+        with pytest.raises(ValueError):
+            SocketServer('localhost', 8107, compression=['zlib'])
+        with pytest.raises(ValueError):
+            SocketClient('localhost', 8107, compression=['zlib'])
+            
+    @pytest.mark.parametrize("compression", [['zlib-dict', 'zlib'], None])
+    def test_negotiated_echo(self, compression):
+        """Test a compressing client works with and without server support."""
+        server = SocketServer('localhost', 8107, engine='epoll', protocol='framed', compression=compression)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Compression test server failed to start within timeout")
+            
+        try:
+            client = SocketClient('localhost', 8107, protocol='framed', compression=['zlib-dict'])
+            assert client.connect()
+            assert client._codec.mode == ('zlib-dict' if compression else 'none')
+            blob = "order shipped to customer " * 100 + "done"
+            assert client.send_message(blob) == blob.upper()
+            assert list(client.send_many([blob, "tiny"] * 4, window=4)) == [blob.upper(), "TINY"] * 4
+            client.disconnect()
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+            
+class TestBinaryProtocol:
+    """Tests for the binary multi-opcode protocol."""
+    
+    def test_codec_reassembles_split_messages(self):
+        """Test messages split across reads are decoded with their header fields."""
+        client, server = BinaryCodec(), BinaryCodec(reply=True)
+        wire = b''.join(client.encode_message(OP_ECHO, 7, b"first"))
+        wire += b''.join(client.encode_message(OP_UPPER, 8, b"", flags=0x40))
+        
+        assert server.decode(wire[:4]) == []
+        assert server.buffered == 4
+        messages = server.decode(wire[4:])
+        assert [tuple(message) for message in messages] == [(OP_ECHO, 0, 7, b"first"), (OP_UPPER, 0x40, 8, b"")]
+        assert server.buffered == 0
+        
+    def test_oversized_header_rejected(self):
+        """Test a header announcing too large a payload is rejected before it arrives."""
+        codec = BinaryCodec(max_frame_size=16)
+        with pytest.raises(FrameTooLargeError):
+            codec.decode(b''.join(BinaryCodec().encode_message(OP_ECHO, 1, b"x" * 17)))
+            
+    def test_router_errors(self):
+        """Test unknown opcodes and handler errors produce error responses."""
+        def reject(payload):
+            raise OpcodeError("rejected")
+            
+        router = OpcodeRouter()
+        router.register(0x20, reject)
+        assert router.dispatch(0x20, b"") == (FLAG_RESPONSE | FLAG_ERROR, b"ERROR: rejected")
+        assert router.dispatch(0x21, b"")[0] == FLAG_RESPONSE | FLAG_ERROR
+        with pytest.raises(ValueError):
+            router.register(256, reject)
+            
+    def test_binary_requires_regular_data_path(self):
+        """Test the text protocol stays the default and binary refuses the buffer pool."""
+        assert SocketServer('localhost', 8108).protocol == 'text'
+        with pytest.raises(ValueError):
+            SocketServer('localhost', 8108, protocol='binary', buffer_pool=True)
+            
+    @pytest.mark.parametrize("engine", ['threaded', 'epoll'])
+    def test_mixed_operations_on_one_connection(self, engine):
+        """Test echo, upper, stats and the user store share one connection."""
+        server = SocketServer('localhost', 8108, engine=engine, protocol='binary')
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Binary test server failed to start within timeout")
+            
+        try:
+            client = SocketClient('localhost', 8108, protocol='binary')
+            assert client.connect()
+            assert client.send_message("text api") == "TEXT API"
+            assert client.request(OP_ECHO, b"\x00\xffraw").payload == b"\x00\xffraw"
+            assert client.request(OP_UPPER, "grüße".encode('utf-8')).payload == "GRÜSSE".encode('utf-8')
+            
+            created = client.request(OP_USER_CREATE, pack_user(0, b"Ada", b"ada@example.com"))
+            user_id, name, email, _ = unpack_user(created.payload)
+            assert (name, email) == (b"Ada", b"ada@example.com")
+            updated = client.request(OP_USER_UPDATE, pack_user(user_id, b"", b"ada@example.org"))
+            assert unpack_user(updated.payload)[1:3] == (b"Ada", b"ada@example.org")
+            assert unpack_users(client.request(OP_USER_LIST).payload) == [(user_id, b"Ada", b"ada@example.org")]
+            assert client.request(OP_USER_DELETE, USER_ID.pack(user_id)).payload == b""
+            
+            missing = client.request(OP_USER_GET, USER_ID.pack(user_id))
+            assert missing.flags & FLAG_ERROR
+            assert missing.payload == f"ERROR: User {user_id} not found".encode('ascii')
+            assert json.loads(client.request(OP_STATS).payload)['users'] == 0
+            assert list(client.send_many(["a", "b"] * 8, window=4)) == ["A", "B"] * 8
+            client.disconnect()
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+    def test_oversized_response_is_an_error_reply(self):
+        """Test a user list larger than a frame is answered with an error and keeps the connection."""
+        server = SocketServer('localhost', 8108, engine='epoll', protocol='binary', max_frame_size=256)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Binary test server failed to start within timeout")
+            
+        try:
+            client = SocketClient('localhost', 8108, protocol='binary')
+            assert client.connect()
+            for n in range(20):
+                created = client.request(OP_USER_CREATE, pack_user(0, f"user{n}".encode(), b"u@example.com"))
+                assert not created.flags & FLAG_ERROR
+            listed = client.request(OP_USER_LIST)
+            assert listed.flags & FLAG_ERROR
+            assert listed.payload.startswith(b"ERROR: Response of ") and listed.payload.endswith(b"exceeds limit of 256")
+            assert client.request(OP_ECHO, b"still open").payload == b"still open"
+            client.disconnect()
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+            
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="Unix domain sockets are not available")
+class TestUnixSockets:
+    """Tests for serving and connecting over Unix domain sockets."""
+    
+    def test_parse_unix_address(self):
+        """Test unix:// URLs are recognised and need an absolute path."""
+        assert parse_unix_address('unix:///tmp/server.sock') == '/tmp/server.sock'
+        assert parse_unix_address('localhost') is None
+        with pytest.raises(ValueError):
+            parse_unix_address('unix://server.sock')
+        with pytest.raises(ValueError):
+            SocketServer('localhost', 8109, reuse_port=True, unix_socket='unix:///tmp/server.sock')
+            
+    @pytest.mark.parametrize("server_class,engine", [
+        (SocketServer, 'threaded'), (SocketServer, 'epoll'), (AsyncSocketServer, None)
+    ])
+    def test_tcp_and_unix_listeners(self, tmp_path, server_class, engine):
+        """Test one server answers on TCP and on its Unix socket, which is removed on shutdown."""
+        path = str(tmp_path / 'server.sock')
+        options = {'engine': engine} if engine else {}
+        server = server_class('localhost', 8109, unix_socket=f'unix://{path}', unix_mode=0o600, **options)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Unix socket test server failed to start within timeout")
+            
+        try:
+            assert os.stat(path).st_mode & 0o777 == 0o600
+            unix_client = SocketClient(f'unix://{path}')
+            assert unix_client.connect()
+            assert unix_client.send_message("over unix") == "OVER UNIX"
+            assert SocketClient('localhost', 8109).send_single_message("over tcp") == "OVER TCP"
+            assert unix_client.send_message("still open") == "STILL OPEN"
+            unix_client.disconnect()
+            
+            async def async_round_trip():
+                async with AsyncSocketClient(f'unix://{path}') as client:
+                    return await client.send_message("async")
+                    
+            assert asyncio.run(async_round_trip()) == "ASYNC"
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+        assert not os.path.exists(path)
+        
+    def test_stale_socket_files(self, tmp_path):
+        """Test a dead server's socket file is replaced while live sockets and other files are kept."""
+        path = str(tmp_path / 'server.sock')
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+        remove_stale_socket(path)
+        assert not os.path.exists(path)
+        
+        live = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        live.bind(path)
+        live.listen(1)
+        try:
+            with pytest.raises(OSError):
+                remove_stale_socket(path)
+            assert os.path.exists(path)
+        finally:
+            live.close()
+            
+        other = tmp_path / 'notes.txt'
+        other.write_text("keep me")
+        with pytest.raises(OSError):
+            remove_stale_socket(str(other))
+        assert other.read_text() == "keep me"
+        
+    def test_client_reports_missing_socket(self, tmp_path):
+        """Test connecting to a socket path nobody serves fails cleanly."""
+        assert not SocketClient(f"unix://{tmp_path / 'missing.sock'}").connect()
+        
+        
+class TestTuningProfiles:
+    """Tests for socket tuning profiles."""
+    
+    def test_profiles(self):
+        """Test profile lookup and that a profile's backlog replaces the default."""
+        assert get_profile('latency') is PROFILES['latency']
+        with pytest.raises(ValueError):
+            get_profile('fastest')
+        assert SocketServer('localhost', 8110).backlog == 5
+        assert SocketServer('localhost', 8110, tuning='latency').backlog == PROFILES['latency'].backlog
+        custom = PROFILES['latency']._replace(backlog=64)
+        assert SocketServer('localhost', 8110, tuning=custom).backlog == 64
+        
+    @pytest.mark.parametrize("engine", ['threaded', 'epoll'])
+    def test_options_applied_to_connections(self, engine):
+        """Test the latency profile sets TCP_NODELAY and keepalive on both ends."""
+        server = SocketServer('localhost', 8110, engine=engine, protocol='framed', tuning='latency')
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Tuning test server failed to start within timeout")
+            
+        try:
+            client = SocketClient('localhost', 8110, protocol='framed', tuning='latency')
+            assert client.connect()
+            assert list(client.send_many(["quick", "ack"] * 4, window=4)) == ["QUICK", "ACK"] * 4
+            sock = client.client_socket
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+            assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+            if engine == 'epoll':
+                accepted = [key.fileobj for key in server._selector.get_map().values()
+                            if key.data is not None]
+                assert len(accepted) == 1
+                assert accepted[0].getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+                assert accepted[0].getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+            client.disconnect()
+            
+            bulk = SocketClient('localhost', 8110, protocol='framed', tuning='throughput')
+            assert bulk.connect()
+            assert not bulk.client_socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+            assert bulk.send_message("bulk") == "BULK"
+            bulk.disconnect()
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+            
+class TestResultCache:
+    """Tests for the memoizing result cache."""
+    
+    def test_lru_eviction_and_byte_limit(self):
+        """Test the least recently used entry goes first and bytes are accounted."""
+        cache = ResultCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == 1
+        cache.put('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1 and cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+        
+        cache = ResultCache(max_entries=100, max_bytes=250, sizeof=lambda key, value: len(value))
+        cache.put('a', 'x' * 100)
+        cache.put('b', 'x' * 100)
+        cache.put('c', 'x' * 100)
+        assert len(cache) == 2 and cache.bytes == 200
+        assert cache.get('a') is None
+        assert not cache.put('big', 'x' * 300)
+        cache.put('b', 'x' * 10)
+        assert cache.bytes == 110
+        
+    def test_ttl(self):
+        """Test entries expire after their TTL."""
+        now = [0.0]
+        cache = ResultCache(ttl=5.0, clock=lambda: now[0])
+        cache.put('a', 1)
+        now[0] = 4.9
+        assert cache.get('a') == 1
+        now[0] = 5.0
+        assert cache.get('a') is None
+        stats = cache.stats()
+        assert stats['expirations'] == 1 and stats['entries'] == 0 and stats['bytes'] == 0
+        
+    def test_tinylfu_admission(self):
+        """Test one-off keys do not displace a popular entry under tinylfu."""
+        # Integer keys hash the same in every run, unlike strings
+        double = lambda key: 2 * key
+        cache = ResultCache(max_entries=10, policy='tinylfu')
+        for _ in range(5):
+            for key in range(10):
+                cache.get_or_compute(key, double)
+        for key in range(100, 120):
+            cache.get_or_compute(key, double)
+        assert all(cache.get(key) == 2 * key for key in range(10))
+        assert cache.stats()['rejections'] == 20
+        
+        for _ in range(10):
+            cache.get_or_compute(1000, double)
+        assert cache.get(1000) == 2000
+        
+    def test_threaded_engine_needs_lock(self):
+        """Test the threaded engine refuses a cache without a lock."""
+        with pytest.raises(ValueError):
+            SocketServer('localhost', 8111, result_cache=ResultCache())
+        SocketServer('localhost', 8111, engine='epoll', result_cache=ResultCache())
+        SocketServer('localhost', 8111, result_cache=SynchronizedResultCache())
+        
+    @pytest.mark.parametrize("engine", ['threaded', 'epoll', 'asyncio'])
+    def test_repeated_messages_served_from_cache(self, engine):
+        """Test the handler runs once per distinct message and counters reach the stats."""
+        calls = []
+        
+        def counting_server(server_class):
+            class CountingServer(server_class):
+                def _process_message(self, message):
+                    calls.append(message)
+                    return super()._process_message(message)
+            return CountingServer
+            
+        if engine == 'asyncio':
+            server = counting_server(AsyncSocketServer)('localhost', 8111, protocol='framed',
+                                                        result_cache=ResultCache(max_entries=8))
+        else:
+            cache = SynchronizedResultCache(8) if engine == 'threaded' else ResultCache(8)
+            server = counting_server(SocketServer)('localhost', 8111, engine=engine, protocol='framed',
+                                                   result_cache=cache)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Cache test server failed to start within timeout")
+            
+        try:
+            client = SocketClient('localhost', 8111, protocol='framed')
+            assert client.connect()
+            assert list(client.send_many(["cache", "me"] * 5, window=4)) == ["CACHE", "ME"] * 5
+            client.disconnect()
+            assert sorted(calls) == ["cache", "me"]
+            stats = json.loads(server._stats_payload(b""))
+            assert stats['cache_hits'] == 8 and stats['cache_misses'] == 2
+            assert stats['cache_entries'] == 2 and stats['cache_bytes'] > 0
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+            
+class TestRateLimits:
+    """Tests for per-connection and per-IP rate limits."""
+    
+    def test_token_bucket_debt(self):
+        """Test a bucket can be overdrawn and reports when its debt is paid."""
+        bucket = TokenBucket(rate=10, burst=5, now=0.0)
+        bucket.charge(3, 0.0)
+        assert bucket.delay(0.0) == 0
+        bucket.charge(7, 0.0)
+        assert bucket.delay(0.0) == pytest.approx(0.5)
+        assert bucket.delay(0.5) == 0
+        assert bucket.delay(100.0) == 0 and bucket.tokens == 5
+        
+    def test_ip_buckets_are_shared(self):
+        """Test connections of one IP share its buckets and others do not."""
+        now = [0.0]
+        limiter = RateLimiter(ip_messages=10, clock=lambda: now[0])
+        first = limiter.open(('10.0.0.1', 5000))
+        second = limiter.open(('10.0.0.1', 5001))
+        other = limiter.open(('10.0.0.2', 5000))
+        first.charge(15, 0)
+        assert second.delay() == pytest.approx(0.5)
+        assert other.delay() == 0
+        
+        # The debt outlives the connections, so reconnecting does not clear it
+        limiter.close(first)
+        limiter.close(second)
+        assert limiter.open(('10.0.0.1', 5002)).delay() == pytest.approx(0.5)
+        with pytest.raises(ValueError):
+            RateLimiter()
+            
+    def test_idle_sources_in_debt_are_swept(self):
+        """Test an IP that left in debt is forgotten once its buckets have refilled."""
+        now = [0.0]
+        limiter = RateLimiter(ip_messages=10, clock=lambda: now[0])
+        throttle = limiter.open(('10.0.0.1', 5000))
+        throttle.charge(15, 0)
+        limiter.close(throttle)
+        assert len(limiter) == 0
+        assert '10.0.0.1' in limiter._sources
+        
+        # Out of debt but not yet refilled: the sweep keeps it
+        now[0] = 1.2
+        limiter.close(limiter.open(('10.0.0.2', 5000)))
+        assert '10.0.0.1' in limiter._sources
+        
+        now[0] = 3.0
+        limiter.close(limiter.open(('10.0.0.2', 5001)))
+        assert len(limiter) == 0
+        assert limiter._sources == {}
+            
+    @pytest.mark.parametrize("engine", ['threaded', 'epoll', 'asyncio'])
+    def test_reads_deferred_over_limit(self, engine):
+        """Test a client over its limit is slowed down, not dropped, while others are served."""
+        limiter = RateLimiter(connection_messages=40, burst=0.25)
+        if engine == 'asyncio':
+            server = AsyncSocketServer('localhost', 8112, protocol='framed', rate_limiter=limiter)
+        else:
+            server = SocketServer('localhost', 8112, engine=engine, protocol='framed', rate_limiter=limiter)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Rate limit test server failed to start within timeout")
+            
+        try:
+            noisy = SocketClient('localhost', 8112, protocol='framed')
+            assert noisy.connect()
+            start = time.perf_counter()
+            for _ in range(3):
+                assert list(noisy.send_many(["noise"] * 20, window=20)) == ["NOISE"] * 20
+            # Each batch of 20 is read at once; the later two wait out the debt
+            assert time.perf_counter() - start >= 0.6
+            
+            polite = SocketClient('localhost', 8112, protocol='framed')
+            assert polite.connect()
+            start = time.perf_counter()
+            assert polite.send_message("polite") == "POLITE"
+            assert time.perf_counter() - start < 0.3
+            polite.disconnect()
+            noisy.disconnect()
+            assert server.stats['reads_deferred'] >= 2
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+    def test_deferred_reads_while_replies_wait_for_batch(self):
+        """Test epoll stops reading an over-limit connection whose replies are held for a micro-batch."""
+        # 5 tokens, so a burst of 15 messages leaves a debt of one second
+        limiter = RateLimiter(connection_messages=10, burst=0.5)
+        server = SocketServer('localhost', 8112, engine='epoll', protocol='framed', rate_limiter=limiter,
+                              batch_handler='upper', batch_delay=0.4)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Rate limit test server failed to start within timeout")
+            
+        try:
+            with socket.create_connection(('localhost', 8112), timeout=5.0) as sock:
+                burst = b"".join(encode_frame(f"m{n}".encode()) for n in range(15))
+                start = time.perf_counter()
+                sock.sendall(burst)
+                time.sleep(0.1)
+                # Sent while the first burst's replies are held: must wait out the debt
+                sock.sendall(burst)
+                decoder = FrameDecoder()
+                replies = []
+                arrivals = []
+                while len(replies) < 30:
+                    received = decoder.feed(sock.recv(65536))
+                    replies.extend(received)
+                    arrivals.extend([time.perf_counter() - start] * len(received))
+            assert replies == [f"M{n}".encode() for n in range(15)] * 2
+            assert arrivals[15] >= 0.8
+            assert server.stats['batches'] == 2
+            assert server.stats['reads_deferred'] >= 1
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+            
+class TestStreaming:
+    """Tests for streamed messages sent as a sequence of chunks."""
+    
+    def test_decoder_chunks(self):
+        """Test flagged chunks decode as stream pieces and the first plain frame after them ends the stream."""
+        decoder = FrameDecoder(max_frame_size=16, max_chunk_size=64)
+        stream = (b''.join(chunk_parts(b"x" * 40, False, 64)) + b''.join(chunk_parts(b"yz", True, 64))
+                  + encode_frame(b"next"))
+        assert decoder.feed(stream) == [StreamChunk(b"x" * 40, False), StreamChunk(b"yz", True), b"next"]
+        
+        # Chunks above their own limit, and chunks where streams are not accepted, are rejected
+        with pytest.raises(FrameTooLargeError):
+            decoder.feed(b''.join(chunk_parts(b"x" * 65, False, 128)))
+        with pytest.raises(FrameTooLargeError):
+            FrameDecoder(max_frame_size=16).feed(b''.join(chunk_parts(b"x" * 8, False, 16)))
+            
+    def test_utf8_boundary(self):
+        """Test a character split across chunks is cut off whole."""
+        data = "aé€😀".encode('utf-8')
+        assert utf8_boundary(data) == len(data)
+        for cut in range(1, 4):
+            assert utf8_boundary(data[:-cut]) == len(data) - 4
+        assert utf8_boundary(b"") == 0
+        
+    @pytest.mark.parametrize("engine", ['threaded', 'epoll', 'asyncio'])
+    def test_stream_round_trip(self, engine):
+        """Test a multi-megabyte stream is processed chunk by chunk within the memory cap."""
+        if engine == 'asyncio':
+            server = AsyncSocketServer('localhost', 8113, protocol='framed', max_buffered=64 * 1024)
+        else:
+            server = SocketServer('localhost', 8113, engine=engine, protocol='framed', max_buffered=64 * 1024)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Streaming test server failed to start within timeout")
+            
+        try:
+            client = SocketClient('localhost', 8113, protocol='framed')
+            assert client.connect()
+            # Pieces of 10001 bytes split the two-byte characters
+            text = "straße über " * 300000
+            pieces = (text[i:i + 10001].encode('utf-8') for i in range(0, len(text), 10001))
+            response = b''.join(client.send_stream(pieces, chunk_size=32 * 1024))
+            assert response == text.upper().encode('utf-8')
+            assert client.send_message("after the stream") == "AFTER THE STREAM"
+            
+            
+            # A chunk above the cap is refused and the connection closed; a
+            # reset can overtake the error reply while the chunk is still being sent
+            try:
+                assert list(client.send_stream([b"x" * 100 * 1024], chunk_size=100 * 1024)) == [
+                    b"ERROR: Frame too large"]
+            except ConnectionError:
+                pass
+            client.disconnect()
+            assert server.stats['streams_completed'] == 1
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+            
+class TestBatching:
+    """Tests for batch handlers and micro-batching across connections."""
+    
+    def test_bulk_upper_matches_scalar(self):
+        """Test the one-call uppercase gives the replies of the per-message transform."""
+        server = SocketServer()
+        for messages in (["héllo", "straße", ""], ["a\x00b", "c"], []):
+            assert bulk_upper(messages) == [server._process_message(message) for message in messages]
+            assert scalar_batch(server._process_message)(messages) == bulk_upper(messages)
+            
+    def test_micro_batchers_group_submissions(self):
+        """Test concurrent submissions are answered by one handler call, each with its own replies."""
+        calls = []
+        
+        def handler(messages):
+            calls.append(len(messages))
+            return [message.upper() for message in messages]
+            
+        batcher = MicroBatcher(handler, max_size=100, max_delay=0.2)
+        results = {}
+        threads = [threading.Thread(target=lambda i=i: results.update({i: batcher.submit([f"m{i}", f"n{i}"])}))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == {i: [f"M{i}", f"N{i}"] for i in range(4)}
+        assert calls == [8]
+        
+        # A full batch is handled without waiting out the delay
+        batcher = MicroBatcher(handler, max_size=2, max_delay=5.0)
+        start = time.perf_counter()
+        assert batcher.submit(["a", "b"]) == ["A", "B"]
+        assert time.perf_counter() - start < 1.0
+        
+        async def submit_all():
+            batcher = AsyncMicroBatcher(handler)
+            return await asyncio.gather(batcher.submit(["x"]), batcher.submit(["y", "z"]))
+        calls.clear()
+        assert asyncio.run(submit_all()) == [["X"], ["Y", "Z"]]
+        assert calls == [3]
+        
+    @pytest.mark.parametrize("engine", ['threaded', 'epoll', 'asyncio'])
+    def test_batches_across_connections(self, engine):
+        """Test messages of several connections share handler calls and replies keep their order."""
+        calls = []
+        
+        def handler(messages):
+            calls.append(len(messages))
+            if "fail" in messages:
+                raise RuntimeError("handler failed")
+            return [message[::-1] for message in messages]
+            
+        options = dict(protocol='framed', batch_handler=handler, batch_delay=0.05)
+        if engine == 'asyncio':
+            server = AsyncSocketServer('localhost', 8114, **options)
+        else:
+            server = SocketServer('localhost', 8114, engine=engine, **options)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Batching test server failed to start within timeout")
+            
+        try:
+            clients = [SocketClient('localhost', 8114, protocol='framed') for _ in range(3)]
+            for client in clients:
+                assert client.connect()
+            results = {}
+            threads = [threading.Thread(target=lambda i=i: results.update(
+                {i: list(clients[i].send_many([f"{i}-{n}" for n in range(20)], window=20))})) for i in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert results == {i: [f"{i}-{n}"[::-1] for n in range(20)] for i in range(3)}
+            assert server.stats['batched_messages'] == 60
+            # The delay lets one call take messages from more than one connection
+            assert max(calls) > 20
+            
+            # A failing handler answers its batch with errors and keeps the connection
+            assert clients[0].send_message("fail") == "ERROR: Batch failed"
+            assert clients[0].send_message("ok") == "ko"
+            for client in clients:
+                client.disconnect()
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+            
+class TestBatchClient:
+    """Tests for streaming stdin through the client in batch mode."""
+    
+    @pytest.fixture
+    def server(self):
+        """Run an epoll server with the framed protocol on the batch test port."""
+        server = SocketServer('localhost', 8115, engine='epoll', protocol='framed')
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("Batch client test server failed to start within timeout")
+        yield server
+        server.shutdown()
+        server_thread.join(timeout=3.0)
+        
+    def test_run_batch_keeps_line_order(self, server):
+        """Test every input line is answered by the output line with the same number."""
+        lines = (f"line {n}\n" for n in range(5000))
+        output, progress = io.StringIO(), io.StringIO()
+        client = SocketClient('localhost', 8115, protocol='framed')
+        assert client.connect()
+        stats = run_batch(client, itertools.chain(lines, ["\r\n", "last"]), output, window=16,
+                          progress=progress, interval=0.0)
+        client.disconnect()
+        
+        assert output.getvalue().split("\n")[:-1] == [f"LINE {n}" for n in range(5000)] + [
+            "ERROR: Empty message", "LAST"]
+        assert (stats.sent, stats.answered, stats.errors, stats.unanswered) == (5002, 5002, 1, 0)
+        assert "in flight" in progress.getvalue()
+        
+    def test_run_batch_skips_oversized_lines(self, server):
+        """Test a line too large to frame is answered with an error and the batch carries on."""
+        lines = ["first", "x" * 2000, "second", "y" * 2000]
+        output = io.StringIO()
+        client = SocketClient('localhost', 8115, protocol='framed', max_frame_size=1000)
+        assert client.connect()
+        stats = run_batch(client, lines, output, window=2)
+        assert client.send_message("after") == "AFTER"
+        client.disconnect()
+        
+        assert output.getvalue().split("\n")[:-1] == [
+            "FIRST", "ERROR: Frame too large", "SECOND", "ERROR: Frame too large"]
+        assert (stats.sent, stats.answered, stats.errors, stats.unanswered) == (4, 4, 2, 0)
+        
+    def test_batch_cli(self, server):
+        """Test --batch pipes stdin to stdout over one connection and reports on stderr."""
+        result = subprocess.run(
+            [sys.executable, os.path.join(socket_dir, 'client.py'), '--port', '8115', '--protocol', 'framed',
+             '--batch', '--window', '8'],
+            input="first\nsecond ü\n\nthird".encode('utf-8'), capture_output=True, timeout=30
+        )
+        assert result.returncode == 0
+        assert result.stdout.decode('utf-8').splitlines() == ["FIRST", "SECOND Ü", "ERROR: Empty message", "THIRD"]
+        assert "4 of 4 lines answered" in result.stderr.decode()
+        assert "1 error responses, 0 unanswered" in result.stderr.decode()
+        
+        
+class TestTLS:
+    """Tests for TLS on both ends, with session resumption."""
+    
+    @pytest.fixture
+    def certificate(self, tmp_path):
+        """Generate a self-signed certificate for localhost."""
+        if not HAS_OPENSSL_CLI:
+            pytest.skip("The openssl command is needed to generate a test certificate")
+        return generate_self_signed(str(tmp_path))
+        
+    def start_server(self, engine, certificate, **options):
+        """Start a framed TLS server of the given engine on the TLS test port."""
+        options.update(protocol='framed', ssl_context=server_context(*certificate))
+        if engine == 'asyncio':
+            server = AsyncSocketServer('localhost', 8116, **options)
+        else:
+            server = SocketServer('localhost', 8116, engine=engine, **options)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        for _ in range(40):
+            if server.running:
+                break
+            time.sleep(0.05)
+        else:
+            server.shutdown()
+            pytest.skip("TLS test server failed to start within timeout")
+        return server, server_thread
+        
+    @pytest.mark.parametrize("engine", ['threaded', 'epoll', 'asyncio'])
+    def test_round_trips_and_resumption(self, engine, certificate):
+        """Test requests, pipelines and streams over TLS, and that reconnecting resumes the session."""
+        server, server_thread = self.start_server(engine, certificate)
+        try:
+            client = SocketClient('localhost', 8116, protocol='framed', ssl_context=client_context(certificate[0]))
+            assert client.send_single_message("hello") == "HELLO"
+            assert not client.tls_resumed
+            assert client.tls_session is not None
+            
+            assert client.connect()
+            assert client.tls_resumed
+            assert isinstance(client.client_socket, ssl.SSLSocket)
+            # Larger than a TLS record, so replies span several reads
+            large = "ü" * 100000
+            assert client.send_message(large) == large.upper()
+            assert list(client.send_many([f"m{n}" for n in range(200)], window=50)) == [
+                f"M{n}" for n in range(200)]
+            assert b"".join(client.send_stream([b"x" * 300000], 16384)) == b"X" * 300000
+            assert client.is_alive()
+            client.disconnect()
+            
+            time.sleep(0.1)
+            assert server.stats['tls_handshakes'] == 2
+            assert server.stats['tls_resumed'] == 1
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+    def test_pool_resumes_new_connections(self, certificate):
+        """Test pooled connections reuse one handshake, and later connections resume its session."""
+        server, server_thread = self.start_server('epoll', certificate)
+        try:
+            with SocketClientPool(max_size=2, protocol='framed', ssl_context=client_context(certificate[0])) as pool:
+                for n in range(5):
+                    assert pool.send_message('localhost', 8116, f"call {n}") == f"CALL {n}"
+                first = pool.acquire('localhost', 8116)
+                second = pool.acquire('localhost', 8116)
+                assert second.send_message("second") == "SECOND"
+                pool.release(first)
+                pool.release(second)
+                assert pool.stats['created'] == 2
+                assert pool.stats['tls_resumed'] == 1
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+    def test_busy_rejection_closes_before_handshake(self, certificate, caplog):
+        """Test a saturated TLS pool closes new connections instead of writing plaintext into the handshake."""
+        server, server_thread = self.start_server('threaded', certificate, max_workers=1, overflow='reject')
+        try:
+            context = client_context(certificate[0])
+            busy = SocketClient('localhost', 8116, protocol='framed', ssl_context=context)
+            assert busy.connect()
+            assert busy.send_message("hold") == "HOLD"
+            
+            rejected = SocketClient('localhost', 8116, protocol='framed', ssl_context=context, timeout=2.0)
+            with caplog.at_level(logging.ERROR):
+                assert not rejected.connect()
+            # Closed, not answered with plaintext the handshake cannot parse
+            assert "WRONG_VERSION_NUMBER" not in caplog.text
+            assert server.stats['connections_rejected'] == 1
+            
+            # The worker is free again once its client leaves
+            busy.disconnect()
+            time.sleep(0.2)
+            assert rejected.send_single_message("again") == "AGAIN"
+            assert server.stats['tls_handshake_failures'] == 0
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+    def test_untrusted_certificate_rejected(self, certificate):
+        """Test a client that does not trust the certificate fails to connect, and the server keeps serving."""
+        server, server_thread = self.start_server('threaded', certificate)
+        try:
+            untrusted = SocketClient('localhost', 8116, protocol='framed', ssl_context=client_context())
+            assert not untrusted.connect()
+            plaintext = SocketClient('localhost', 8116, protocol='framed', timeout=2.0)
+            assert plaintext.send_single_message("hello") is None
+            
+            client = SocketClient('localhost', 8116, protocol='framed', ssl_context=client_context(certificate[0]))
+            assert client.send_single_message("hello") == "HELLO"
+            time.sleep(0.1)
+            assert server.stats['tls_handshake_failures'] == 2
+        finally:
+            server.shutdown()
+            server_thread.join(timeout=3.0)
+            
+            
+class TestErrorConditions:
+    """Tests for various error conditions."""
+    
+    def test_invalid_host(self):
+        """Test client behavior with invalid host."""
+        client = SocketClient('invalid.host.name', 8080)
+        
+        assert client.connect() is False
+        response = client.send_single_message("test")
+        assert response is None
+        
+    def test_invalid_port(self):
+        """Test client behavior with invalid port."""
+        client = SocketClient('localhost', 99999)  # Invalid port
+        
+        assert client.connect() is False
+        
+    def test_connection_timeout(self):
+        """Test client timeout behavior."""
+        # Use a non-routable IP to simulate timeout
+        client = SocketClient('10.255.255.1', 8080, timeout=1.0)
+        
+        start_time = time.time()
+        result = client.connect()
+        end_time = time.time()
+        
+        assert result is False
+        assert end_time - start_time >= 1.0  # Should timeout after 1 second
+        
+    @pytest.fixture
+    def mock_server(self):
+        """Fixture for a server that closes connections immediately."""
+        server_socket = None
+        server_running = threading.Event()
+        
+        def mock_server_func():
+            nonlocal server_socket
+            try:
+                server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                server_socket.bind(('localhost', 8084))
+                server_socket.listen(1)
+                server_socket.settimeout(0.5)  # Add timeout to prevent hanging
+                server_running.set()
+                
+                # Accept and immediately close a few connections
+                for _ in range(3):
+                    try:
+                        client_socket, _ = server_socket.accept()
+                        client_socket.close()  # Immediately close without processing
+                    except socket.timeout:
+                        continue
+                    except:
+                        break
+                        
+            except Exception:
+                pass
+            finally:
+                if server_socket:
+                    try:
+                        server_socket.close()
+                    except:
+                        pass
+                        
+        thread = threading.Thread(target=mock_server_func, daemon=True)
+        thread.start()
+        
+        # Wait for server to start or timeout
+        if not server_running.wait(timeout=2.0):
+            pytest.skip("Mock server failed to start")
+        
+        time.sleep(0.1)  # Small delay to ensure server is ready
+        yield
+        
+        # Cleanup
+        if server_socket:
+            try:
+                server_socket.close()
+            except:
+                pass
+        
+    def test_connection_closed_by_server(self, mock_server):
+        """Test client behavior when server closes connection."""
+        client = SocketClient('localhost', 8084)
+        
+        # Connection should succeed initially
+        assert client.connect() is True
+        
+        # But sending message should fail due to closed connection
+        response = client.send_message("test")
+        assert response is None
+        
+    def test_malformed_input_handling(self):
+        """Test server handling of malformed input."""
+        server = SocketServer('localhost', 8085)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        
+        # Wait for server to start
+        max_retries = 10
+        for _ in range(max_retries):
+            try:
+                test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                test_socket.settimeout(1.0)
+                test_socket.connect(('localhost', 8085))
+                test_socket.close()
+                break
+            except (ConnectionRefusedError, socket.timeout):
+                time.sleep(0.1)
+        else:
+            pytest.skip("Server failed to start for malformed input test")
+        
+        raw_socket = None
+        try:
+            # Test with raw socket to send malformed data
+            raw_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            raw_socket.settimeout(2.0)  # Set timeout to prevent hanging
+            raw_socket.connect(('localhost', 8085))
+            
+            # Send invalid UTF-8 bytes
+            raw_socket.send(b'\xff\xfe\xfd')
+            
+            # Should receive error response
+            response = raw_socket.recv(1024)
+            assert b"ERROR" in response
+            
+        except socket.timeout:
+            # If timeout occurs, test passes as server handled malformed input
+            pass
+        except Exception as e:
+            # Log the exception but don't fail the test
+            print(f"Expected exception during malformed input test: {e}")
+        finally:
+            if raw_socket:
+                try:
+                    raw_socket.close()
+                except:
+                    pass
+            server.shutdown()
+            time.sleep(0.1)
+
+
+class TestCLIInterface:
+    """Tests for command-line interface."""
+    
+    def test_server_cli_arguments(self):
+        """Test server command-line argument parsing."""
+        # This would require mocking sys.argv and testing main()
+        # For simplicity, we'll test the core functionality
+        pass
+        
+    def test_client_cli_arguments(self):
+        """Test client command-line argument parsing."""
+        # This would require mocking sys.argv and testing main()
+        # For simplicity, we'll test the core functionality
+        pass
+        
+    def test_asyncio_rejects_worker_pool_options(self):
+        """Test the asyncio engine refuses threaded-only options instead of ignoring them."""
+        result = subprocess.run(
+            [sys.executable, os.path.join(socket_dir, 'server.py'), '--engine', 'asyncio',
+             '--max-workers', '4', '--buffer-pool'],
+            capture_output=True, timeout=30
+        )
+        assert result.returncode == 2
+        assert "--max-workers, --buffer-pool cannot be combined with --engine asyncio" in result.stderr.decode()
+
+
+# Performance and Load Tests
+class TestPerformance:
+    """Basic performance tests."""
+    
+    @pytest.fixture
+    def performance_server(self):
+        """Server fixture for performance testing."""
+        server = SocketServer('localhost', 8086)
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        
+        # Wait for server to start
+        max_retries = 10
+        for _ in range(max_retries):
+            try:
+                test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                test_socket.settimeout(1.0)
+                test_socket.connect(('localhost', 8086))
+                test_socket.close()
+                break
+            except (ConnectionRefusedError, socket.timeout):
+                time.sleep(0.1)
+        else:
+            pytest.skip("Performance server failed to start")
+        
+        yield server
+        
+        server.shutdown()
+        time.sleep(0.1)
+        
+    def test_message_throughput(self, performance_server):
+        """Test message throughput under normal load."""
+        client = SocketClient('localhost', 8086, timeout=10.0)  # Longer timeout for performance test
+        
+        # Connect once and send multiple messages
+        assert client.connect() is True
+        
+        start_time = time.time()
+        message_count = 50  # Reduced count for more reliable testing
+        successful_messages = 0
+        
+        for i in range(message_count):
+            try:
+                response = client.send_message(f"message_{i}")
+                if response == f"MESSAGE_{i}":
+                    successful_messages += 1
+            except Exception as e:
+                print(f"Message {i} failed: {e}")
+                continue
+                
+        end_time = time.time()
+        duration = end_time - start_time
+        
+        client.disconnect()
         
         # Check that most messages were successful
         success_rate = successful_messages / message_count
@@ -447,6 +2663,67 @@ class TestPerformance:
             throughput = successful_messages / duration
             print(f"Throughput: {throughput:.2f} messages/second")
             assert throughput > 5  # Should handle at least 5 messages per second
+            
+    @pytest.fixture
+    def framed_performance_server(self):
+        """Framed-protocol server fixture with per-message logging silenced."""
+        server_logger = logging.getLogger('python_socket.server')
+        previous_level = server_logger.level
+        server_logger.setLevel(logging.WARNING)
+        
+        server = SocketServer('localhost', 8091, protocol='framed')
+        server_thread = threading.Thread(target=server.start, daemon=True)
+        server_thread.start()
+        
+        for _ in range(10):
+            try:
+                test_socket = socket.create_connection(('localhost', 8091), timeout=1.0)
+                test_socket.close()
+                break
+            except (ConnectionRefusedError, socket.timeout, OSError):
+                time.sleep(0.1)
+        else:
+            server_logger.setLevel(previous_level)
+            pytest.skip("Framed performance server failed to start")
+            
+        yield server
+        
+        server.shutdown()
+        server_logger.setLevel(previous_level)
+        time.sleep(0.1)
+        
+    def test_pipelined_throughput(self, framed_performance_server):
+        """Test send_many() and pipeline() beat one-at-a-time round trips."""
+        client = SocketClient('localhost', 8091, timeout=10.0, protocol='framed')
+        assert client.connect() is True
+        message_count = 2000
+        messages = [f"message_{i}" for i in range(message_count)]
+        expected = [m.upper() for m in messages]
+        
+        try:
+            start_time = time.perf_counter()
+            sequential = [client.send_message(m) for m in messages]
+            sequential_duration = time.perf_counter() - start_time
+            
+            start_time = time.perf_counter()
+            pipelined = list(client.send_many(messages, window=128))
+            pipelined_duration = time.perf_counter() - start_time
+            
+            with client.pipeline() as pipe:
+                for message in messages[:10]:
+                    pipe.send(message)
+        finally:
+            client.disconnect()
+            
+        assert sequential == expected
+        assert pipelined == expected
+        assert pipe.responses == expected[:10]
+        
+        speedup = sequential_duration / pipelined_duration
+        print(f"Sequential: {message_count / sequential_duration:.0f} msg/s, "
+              f"pipelined: {message_count / pipelined_duration:.0f} msg/s ({speedup:.1f}x)")
+        # Client and server share one interpreter here, so keep the bound conservative
+        assert speedup > 2
 
 
 if __name__ == '__main__':